@@ -1,7 +1,15 @@
 import pygame
 from agent import Agent
 import heapq
+import os
+import numpy as np
 from simulation.environment import Environment
+from utils.landmarks import LandmarkHeuristic
+from utils.hierarchical import HierarchicalPlanner
+from utils.anytime import AnytimeSearch
+from utils.shortcut_index import ContractionHierarchy
+from utils.flow_field import FlowFieldService
+from utils.reward_function import MOVE_COST, NO_FLY_COST, OBSTACLE_COST
 
 pygame.init()
 
@@ -12,6 +20,9 @@ CELL_SIZE = WINDOW_SIZE // GRID_SIZE
 TIME_STEP = 10  # Each drone move advances time by 10 minutes
 ZONE_CHANGE_INTERVAL = 120  # Zones change every 2 hours (120 minutes)
 STEPS_BEFORE_RECALCULATE = 12 # Moves this many times along the ideal path until recalculating.
+NUM_LANDMARKS = 4 # Landmark cells used by the ALT heuristic.
+CLUSTER_SIZE = 10 # Cluster side length for the hierarchical (HPA*) planner.
+ANYTIME_TIME_BUDGET = 0.005 # Seconds the anytime planner may spend per decision.
 
 # Global variable to keep track of the steps.
 count = 0
@@ -30,9 +41,30 @@ COLORS = {
 }
 
 class AStar(Agent):
-    def __init__(self, grid_size = GRID_SIZE, cell_size = CELL_SIZE, colors = COLORS):
+    def __init__(self, grid_size = GRID_SIZE, cell_size = CELL_SIZE, colors = COLORS, heuristic_mode = "manhattan", planner = "a_star"):
         # Base class initializer.
         super().__init__(grid_size = GRID_SIZE, cell_size = CELL_SIZE, colors = COLORS)
+        # "manhattan" or "landmark" (ALT lower bounds, rebuilt once per zone epoch).
+        self.heuristic_mode = heuristic_mode
+        self.landmark_heuristic = None
+        self.landmark_epoch = None
+        # Number of nodes expanded by the most recent search.
+        self.last_expansions = 0
+        # "a_star" (flat search), "hierarchical" (HPA* over clusters, refined lazily),
+        # "anytime" (ARA* bounded by ANYTIME_TIME_BUDGET per decision), "indexed"
+        # (contraction hierarchy per zone slot, falling back to A* for slots not preprocessed)
+        # or "flow_field" (follow a cached per-goal distance field, no per-drone search).
+        self.planner = planner
+        self.hierarchical_planner = None
+        self.hierarchical_epoch = None
+        self.hierarchical_zones = (set(), set())
+        self.anytime_search = None
+        self.anytime_key = None
+        # Suboptimality bound of the most recent anytime path.
+        self.last_bound = None
+        # Zone slot -> (ContractionHierarchy, slot obstacles, slot no-fly zones).
+        self.slot_indexes = {}
+        self.flow_fields = FlowFieldService(self.environment)
 
     # Find path to next goal (pick-up/drop-off). Return computed path, or None if no goal
     # available.
@@ -56,20 +88,108 @@ class AStar(Agent):
             return None
         
         # Use A* to calculate the path to the goal
+        if self.planner == "hierarchical":
+            return self.hierarchical_path(self.environment.drone_pos, goal)
+        elif self.planner == "indexed":
+            return self.indexed_path(self.environment.drone_pos, goal)
+        elif self.planner == "flow_field":
+            return self.flow_fields.path(self.environment.drone_pos, goal)
+        elif self.planner == "anytime":
+            # An empty path makes run() ask again, which resumes the same search.
+            path, _ = self.anytime_path(self.environment.drone_pos, goal, time_budget=ANYTIME_TIME_BUDGET)
+            return path if path is not None else []
         path = self.a_star_algorithm(self.environment.drone_pos, goal)
         return path
 
+    # Plan with ARA* under a wall-clock and/or expansion budget. Repeated calls for the same
+    # start, goal and zone epoch keep improving the previous answer instead of restarting.
+    # Returns (best path so far or None, suboptimality bound).
+    def anytime_path(self, start, goal, time_budget = None, expansion_budget = None):
+        key = (start, goal, self.environment.zone_epoch)
+        if self.anytime_key != key:
+            self.anytime_search = AnytimeSearch(
+                start, goal,
+                successors = lambda node, g: [(n, self.get_movement_cost(n)) for n in self.get_neighbors(node)],
+                heuristic = self.get_search_heuristic(goal),
+            )
+            self.anytime_key = key
+        path, self.last_bound = self.anytime_search.search(time_budget = time_budget, expansion_budget = expansion_budget)
+        return path, self.last_bound
+
+    # Answer from the current slot's contraction hierarchy when it matches the live zones,
+    # otherwise fall back to regular A*.
+    def indexed_path(self, start, goal):
+        entry = self.slot_indexes.get(self.environment.get_zone_slot())
+        if entry is not None:
+            index, obstacles, no_fly_zones = entry
+            protected = self.environment.grid_with_priority("pickup") | self.environment.grid_with_priority("dropoff")
+            if (set(self.environment.obstacles) == obstacles - protected
+                    and set(self.environment.no_fly_zones) == no_fly_zones - protected):
+                path, _ = index.query(start, goal, self.get_cost_grid())
+                return path
+        return self.a_star_algorithm(start, goal)
+
+    # Build (or load from cache_dir) the contraction hierarchy for one zone slot. Pickup and
+    # drop-off cells stay uncontracted, so completed deliveries do not invalidate the index.
+    def preprocess_slot(self, slot, cache_dir = None):
+        obstacle_mask, no_fly_mask = self.environment.get_slot_zone_masks(slot, apply_priority = False)
+        cost_grid = self.costs_from_masks(obstacle_mask, no_fly_mask)
+        task_cells = set()
+        for task in self.locations_manager.delivery_tasks:
+            task_cells.update((tuple(task["pick_up"]), tuple(task["drop_off"])))
+
+        index = None
+        cache_path = None
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok = True)
+            cache_path = os.path.join(cache_dir, f"slot_{slot}.npz")
+            index = ContractionHierarchy.load(cache_path, cost_grid, task_cells)
+        if index is None:
+            index = ContractionHierarchy(cost_grid, task_cells)
+            if cache_path is not None:
+                index.save(cache_path)
+
+        obstacles = {tuple(int(v) for v in cell) for cell in np.argwhere(obstacle_mask)}
+        no_fly_zones = {tuple(int(v) for v in cell) for cell in np.argwhere(no_fly_mask)}
+        self.slot_indexes[slot] = (index, obstacles, no_fly_zones)
+        return index
+
+    # Preprocess every zone slot of the day.
+    def preprocess_day(self, cache_dir = None):
+        for slot in range(len(self.event_simulator.event_patterns)):
+            self.preprocess_slot(slot, cache_dir)
+
+    # Plan with HPA*. The returned path is a generator, so only the steps actually
+    # followed before the next replan are refined.
+    def hierarchical_path(self, start, goal):
+        planner = self.get_hierarchical_planner()
+        abstract_path, _ = planner.abstract_path(start, goal)
+        if abstract_path is None:
+            return None
+        return planner.iter_path(abstract_path)
+
+    # Keep the HPA* graph in sync with the zones, rebuilding only the clusters touched
+    # by cells that entered or left an event zone since the last sync.
+    def get_hierarchical_planner(self):
+        zones = (set(self.environment.obstacles), set(self.environment.no_fly_zones))
+        if self.hierarchical_planner is None:
+            self.hierarchical_planner = HierarchicalPlanner(self.get_cost_grid(), CLUSTER_SIZE)
+        elif self.hierarchical_epoch != self.environment.zone_epoch:
+            changed = (zones[0] ^ self.hierarchical_zones[0]) | (zones[1] ^ self.hierarchical_zones[1])
+            self.hierarchical_planner.update(self.get_cost_grid(), changed)
+        self.hierarchical_epoch = self.environment.zone_epoch
+        self.hierarchical_zones = zones
+        return self.hierarchical_planner
+
     # Get the closest pick-up point.
     def get_closest_pick_up_point(self):
-        pick_up_points = self.locations_manager.get_pick_up_points()
-        return self.get_closest_point(self.environment.drone_pos, pick_up_points)
+        closest = self.locations_manager.nearest_pick_up_points(self.environment.drone_pos)
+        return closest[0] if closest else None
     
     # Get the closest drop-off point matching given package ID.
     def get_closest_drop_off_point(self, package_id):
-        drop_off_points = self.locations_manager.get_drop_off_points()
-        valid_drop_offs = {point: id for point, id in drop_off_points.items() if id == package_id}
-
-        return self.get_closest_point(self.environment.drone_pos, valid_drop_offs)
+        closest = self.locations_manager.nearest_drop_off_points(self.environment.drone_pos, task_id = package_id)
+        return closest[0] if closest else None
     
     # Get closest point from a set of points.
     # Points are expected to be a dictionary of position:id
@@ -93,11 +213,14 @@ class AStar(Agent):
         heapq.heappush(open_set, (0, start))
 
         came_from = {}
+        estimate = self.get_search_heuristic(goal)
         g_score = {start: 0}
-        f_score = {start: self.heuristic(start, goal)}
+        f_score = {start: estimate(start)}
+        self.last_expansions = 0
 
         while open_set:
             _, current = heapq.heappop(open_set)
+            self.last_expansions += 1
 
             # If goal is reached, reconstruct and return the path.
             if current == goal:
@@ -111,7 +234,7 @@ class AStar(Agent):
                 if neighbor not in g_score or tentative_g_score < g_score[neighbor]:
                     came_from[neighbor] = current
                     g_score[neighbor] = tentative_g_score
-                    f_score[neighbor] = g_score[neighbor] + self.heuristic(neighbor, goal)
+                    f_score[neighbor] = g_score[neighbor] + estimate(neighbor)
 
                     # Push the neighbor to the heap with updated f_score.
                     heapq.heappush(open_set, (f_score[neighbor], neighbor))
@@ -123,6 +246,44 @@ class AStar(Agent):
     # Use Manhattan distance as heuristic funtion.
     def heuristic(self, position, goal):
         return abs(position[0] - goal[0]) + abs(position[1] - goal[1])
+
+    # Return the heuristic A* should use towards goal, as a position -> estimate callable.
+    def get_search_heuristic(self, goal):
+        if self.heuristic_mode == "manhattan":
+            return lambda position: self.heuristic(position, goal)
+        elif self.heuristic_mode == "landmark":
+            field = self.get_landmark_heuristic().heuristic_field(goal).tolist()
+            return lambda position: field[position[0]][position[1]]
+        raise ValueError(f"Invalid heuristic mode: {self.heuristic_mode}")
+
+    # Landmarks and their distance arrays are only valid for one zone layout.
+    def get_landmark_heuristic(self):
+        if self.landmark_epoch != self.environment.zone_epoch:
+            self.landmark_heuristic = LandmarkHeuristic(self.get_cost_grid(), NUM_LANDMARKS)
+            self.landmark_epoch = self.environment.zone_epoch
+        return self.landmark_heuristic
+
+    # Movement costs of the whole grid as a NumPy array indexed [x, y].
+    def get_cost_grid(self):
+        return self.costs_from_masks(*self.environment.get_zone_masks())
+
+    # Same costs as get_movement_cost, for whole zone masks at once.
+    def costs_from_masks(self, obstacle_mask, no_fly_mask):
+        return np.where(obstacle_mask, float(OBSTACLE_COST), np.where(no_fly_mask, float(NO_FLY_COST), float(MOVE_COST)))
+
+    # Run A* once per heuristic and report the number of expanded nodes for each.
+    def compare_heuristics(self, start, goal, modes = ("manhattan", "landmark")):
+        original_mode = self.heuristic_mode
+        results = {}
+        try:
+            for mode in modes:
+                self.heuristic_mode = mode
+                path = self.a_star_algorithm(start, goal)
+                cost = sum(self.get_movement_cost(step) for step in path) if path is not None else None
+                results[mode] = {"expansions": self.last_expansions, "cost": cost}
+        finally:
+            self.heuristic_mode = original_mode
+        return results
     
     # Obtain all valid neighbors for current position.
     def get_neighbors(self, position):
@@ -139,13 +300,13 @@ class AStar(Agent):
     def get_movement_cost(self, position):
         # No-fly zone.
         if position in self.environment.obstacles:
-            return 10
+            return OBSTACLE_COST
         # Obstacle zone.
         elif position in self.environment.no_fly_zones:
-            return 20
+            return NO_FLY_COST
         # General movement cost.
         else:
-            return 1
+            return MOVE_COST
 
     # Reconstruct the path taken from start to goal.
     def reconstruct_path(self, came_from, current):
@@ -190,4 +351,4 @@ if __name__ == "__main__":
     game = AStar()
     game.run()
     print("Total reward: ", game.reward_function.total_reward)
-    pygame.quit()
\ No newline at end of file
+    pygame.quit()
\ No newline at end of file
@@ -105,7 +105,7 @@ class Agent:
         pick_up_points = self.locations_manager.get_pick_up_points()
         if not self.environment.is_carrying_package and new_pos in pick_up_points:
             task_id = pick_up_points[new_pos]
-            self.locations_manager.pick_up_points.pop(new_pos)
+            self.locations_manager.pick_up(new_pos)
             self.environment.is_carrying_package = True
             self.environment.current_delivery = task_id
             action_result.update({"type": "pick-up", "success": True, "target": task_id})
@@ -121,7 +121,7 @@ class Agent:
                 and drop_off_points[new_pos] == self.environment.current_delivery
         ):
             task_id = drop_off_points[new_pos]
-            self.locations_manager.drop_off_points.pop(new_pos)
+            self.locations_manager.drop_off(new_pos)
             self.environment.is_carrying_package = False
             self.environment.current_delivery = None
             action_result.update({"type": "drop-off", "success": True, "target": task_id})
@@ -136,7 +136,7 @@ class Agent:
         if self.environment.is_carrying_package:
             if new_pos in drop_off_points and drop_off_points[new_pos] == self.environment.current_delivery:
                 task_id = drop_off_points[new_pos]
-                self.locations_manager.drop_off_points.pop(new_pos)
+                self.locations_manager.drop_off(new_pos)
                 self.environment.is_carrying_package = False
                 self.environment.package_count -= 1
                 self.environment.current_delivery = None
@@ -146,7 +146,7 @@ class Agent:
         elif not self.environment.is_carrying_package:
             if new_pos in pick_up_points:
                 task_id = pick_up_points[new_pos]
-                self.locations_manager.pick_up_points.pop(new_pos)
+                self.locations_manager.pick_up(new_pos)
                 self.environment.is_carrying_package = True
                 self.environment.package_count += 1
                 self.environment.current_delivery = task_id
@@ -0,0 +1,135 @@
+import json
+import os
+import queue
+import threading
+import numpy as np
+from src.agent.q_table import QTable
+from src.utils.atomic_io import atomic_write_json
+
+CHECKPOINT_VERSION = 1
+
+
+class CheckpointWriter:
+    def __init__(self, path, q_table):
+        """
+        Periodic checkpoints of a Q-table and the training state beside it, written by a
+        background thread.
+
+        The table is double-buffered in two files, `<path>.0.qtable` and `<path>.1.qtable`,
+        which are written alternately. Each checkpoint only copies the rows changed since
+        that file was last written and patches them into the memory-mapped file. The state
+        file `<path>.json` is replaced atomically after the table is flushed and names the
+        buffer it belongs to, so a crash mid-write leaves the previous checkpoint intact.
+        Args:
+            path (str): Common prefix of the checkpoint files.
+            q_table (QTable): Table being trained; its changed rows are tracked from now on.
+        """
+        self.path = path
+        self.q_table = q_table
+        q_table.track_dirty()
+        num_rows = len(q_table.values)
+        # Rows each buffer file is missing; both start out needing a full write
+        self.pending = [np.ones(num_rows, dtype=bool), np.ones(num_rows, dtype=bool)]
+        self.buffer = 0  # file written by the next checkpoint
+        self.error = None
+        self.jobs = queue.Queue(maxsize=1)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def table_path(self, buffer):
+        return f"{self.path}.{buffer}.qtable"
+
+    @property
+    def state_path(self):
+        return self.path + ".json"
+
+    @staticmethod
+    def read_state(path):
+        """Return the state of the last complete checkpoint under `path`, or None if there is none."""
+        try:
+            with open(path + ".json") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def restore(self):
+        """
+        Load the last complete checkpoint into the table.
+        Returns:
+            dict: Training state saved with it, or None if there is no checkpoint.
+        """
+        state = self.read_state(self.path)
+        if state is None:
+            return None
+        table = QTable.load(self.table_path(state["buffer"]), mmap=True)
+        if table.values.shape != self.q_table.values.shape or table.encoder.config() != self.q_table.encoder.config():
+            raise ValueError(f"Checkpoint {self.path} was written for a different Q-table")
+        self.q_table.values[:] = table.values
+        del table
+        # The restored buffer matches the table; the other one may be stale or half-written
+        self.q_table.dirty[:] = False
+        self.pending[state["buffer"]][:] = False
+        self.pending[1 - state["buffer"]][:] = True
+        self.buffer = 1 - state["buffer"]
+        return state["training"]
+
+    def checkpoint(self, training_state):
+        """
+        Snapshot the changed rows and queue them for the writer thread. Only the rows are
+        copied here; the disk writes happen in the background.
+        Args:
+            training_state (dict): JSON-serializable state saved with the table.
+        Returns:
+            bool: False if the writer is still busy with earlier checkpoints (nothing is lost;
+                the rows are written with the next one).
+        """
+        if self.error is not None:
+            raise RuntimeError("Checkpoint writer failed") from self.error
+        if self.jobs.full():
+            return False
+        dirty = self.q_table.dirty
+        self.pending[0] |= dirty
+        self.pending[1] |= dirty
+        dirty[:] = False
+        target = self.buffer
+        rows = np.flatnonzero(self.pending[target])
+        if len(rows) == len(self.pending[target]) or not os.path.exists(self.table_path(target)):
+            rows, values = None, self.q_table.values.copy()
+        else:
+            values = self.q_table.values[rows]
+        self.pending[target][:] = False
+        self.buffer = 1 - target
+        self.jobs.put((target, rows, values, training_state))
+        return True
+
+    def close(self):
+        """Wait for queued checkpoints to be written and stop the writer thread."""
+        self.jobs.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise RuntimeError("Checkpoint writer failed") from self.error
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            try:
+                self._write(*job)
+            except Exception as error:  # Surfaced to the training thread by checkpoint()/close()
+                self.error = error
+
+    def _write(self, target, rows, values, training_state):
+        path = self.table_path(target)
+        if rows is None:
+            QTable(self.q_table.encoder, self.q_table.actions, values).save(path)
+        else:
+            table = QTable.load(path, mmap=True, writable=True)
+            table.values[rows] = values
+            table.values.flush()
+            del table
+        atomic_write_json(self.state_path, {
+            "version": CHECKPOINT_VERSION,
+            "buffer": target,
+            "training": training_state,
+        })
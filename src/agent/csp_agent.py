@@ -4,6 +4,9 @@ from src.simulation.event_simulator import EventSimulator
 from src.simulation.locations_manager import LocationsManager
 from src.utils.reward_function import RewardFunction
 from src.simulation.render import Renderer
+from src.simulation.safe_intervals import SafeIntervalTable
+from src.agent.delivery_scheduler import DeliveryScheduler
+from src.utils.anytime import AnytimeSearch
 from heapq import heappop, heappush
 
 pygame.init()
@@ -30,8 +33,18 @@ COLORS = {
 
 
 class CSPAgent:
-    def __init__(self, render=True):
-        """Initialize the CSP agent environment."""
+    def __init__(self, render=True, time_budget=None, expansion_budget=None, search_mode="filtered"):
+        """
+        Initialize the CSP agent environment.
+        Args:
+            render (bool): Whether to draw each step.
+            time_budget (float): If set, plan with the anytime search and spend at most this many
+                wall-clock seconds per decision.
+            expansion_budget (int): If set, plan with the anytime search and expand at most this
+                many nodes per decision.
+            search_mode (str): "filtered" (A* that avoids current and upcoming zones) or "sipp"
+                (safe-interval planning over the whole day timeline, waiting included).
+        """
         self.environment = Environment(grid_size=GRID_SIZE, cell_size=CELL_SIZE)
         self.event_simulator = EventSimulator(grid_size=GRID_SIZE, config_path="src/configs/event_patterns.json")
         self.environment.set_event_simulator(self.event_simulator)
@@ -42,10 +55,32 @@ class CSPAgent:
         self.reward_function = RewardFunction()
         self.renderer = Renderer(grid_size=GRID_SIZE, cell_size=CELL_SIZE, colors=COLORS, window_size=WINDOW_SIZE)
         self.render = render
+        self.time_budget = time_budget
+        self.expansion_budget = expansion_budget
+        self.anytime_search = None
+        self.anytime_key = None
+        self.search_mode = search_mode
+        self.future_zones = set()
+        self.safe_intervals = None
+        self.safe_intervals_key = None  # Open pickup and dropoff points the table was built for
 
     def find_path(self, start, target):
-        """Find a path from start to target."""
+        """
+        Find a path from start to target.
+        Returns:
+            list: The positions after each move, or [] if the search proved there is none.
+            None when an anytime budget ran out before the first path was found; calling
+            again at the same time resumes that search.
+        """
         self.environment.update_dynamic_events()  # Ensure dynamic zones are up-to-date
+        if self.search_mode == "sipp":
+            return self.find_path_sipp(start, target)
+        self.refresh_future_zones()
+        if self.time_budget is not None or self.expansion_budget is not None:
+            path, _ = self.find_path_anytime(start, target, self.time_budget, self.expansion_budget)
+            if path is None and not self.anytime_search.done:
+                return None
+            return path or []
 
         # Priority queue for CSP-based search
         queue = [(0, start)]  # (cost, position)
@@ -74,6 +109,95 @@ class CSPAgent:
 
         return []  # No valid path found
 
+    def find_path_anytime(self, start, target, time_budget=None, expansion_budget=None):
+        """
+        Anytime (ARA*) version of find_path with a bounded per-call cost.
+        Calling again with the same start, target and time resumes and improves the search.
+        Args:
+            start (tuple): Start position.
+            target (tuple): Target position.
+            time_budget (float): Wall-clock seconds this call may spend.
+            expansion_budget (int): Node expansions this call may perform.
+        Returns:
+            tuple: (best path found so far or None, suboptimality bound).
+        """
+        self.refresh_future_zones()
+        key = (start, target, self.environment.current_time)
+        if self.anytime_key != key:
+            self.anytime_search = AnytimeSearch(
+                start, target,
+                successors=lambda node, cost: [(n, 1) for n in self.get_neighbors(node, cost)],
+                heuristic=lambda node: self.helper(node, target),
+            )
+            self.anytime_key = key
+        return self.anytime_search.search(time_budget=time_budget, expansion_budget=expansion_budget)
+
+    def find_path_sipp(self, start, target):
+        """
+        Safe-interval path planning: search over (cell, safe interval) states, where each
+        transition waits in place as long as needed before moving. One search gives the
+        earliest arrival, waiting included.
+        Returns:
+            list: The position after each time step (a repeated position means waiting), or []
+            if target cannot be reached within the safe-interval horizon.
+        """
+        table = self.get_safe_interval_table()
+        start_time = self.environment.current_time
+        if not table.intervals(start, start_time, occupied=True):
+            return []
+
+        start_state = (start, 0)
+        arrival = {start_state: start_time}
+        came_from = {}
+        queue = [(start_time + self.helper(start, target) * TIME_STEP, start_time, start_state)]
+        while queue:
+            _, time, state = heappop(queue)
+            if time > arrival[state]:
+                continue
+            cell, index = state
+            if cell == target:
+                # Expand the transitions into one position per time step
+                path = []
+                while state in came_from:
+                    previous, depart = came_from[state]
+                    path.append(state[0])
+                    path += [previous[0]] * ((depart - arrival[previous]) // TIME_STEP)
+                    state = previous
+                path.reverse()
+                return path
+
+            interval_end = table.intervals(cell, start_time, occupied=cell == start)[index][1]
+            x, y = cell
+            for neighbor in [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)]:
+                if not (0 <= neighbor[0] < self.environment.grid_size and 0 <= neighbor[1] < self.environment.grid_size):
+                    continue
+                safe_intervals = table.intervals(neighbor, start_time, occupied=neighbor == start)
+                for next_index, (safe_start, safe_end) in enumerate(safe_intervals):
+                    # Leave as soon as possible, but not before the neighbour becomes safe
+                    depart = max(time, safe_start - TIME_STEP)
+                    if depart >= interval_end:
+                        break
+                    arrive = depart + TIME_STEP
+                    if arrive >= safe_end:
+                        continue
+                    next_state = (neighbor, next_index)
+                    if arrive < arrival.get(next_state, float("inf")):
+                        arrival[next_state] = arrive
+                        came_from[next_state] = (state, depart)
+                        heappush(queue, (arrive + self.helper(neighbor, target) * TIME_STEP, arrive, next_state))
+        return []
+
+    def get_safe_interval_table(self):
+        """The safe-interval table of the open points, rebuilt only once a delivery changes them."""
+        key = (
+            frozenset(self.environment.grid_with_priority("pickup")),
+            frozenset(self.environment.grid_with_priority("dropoff")),
+        )
+        if self.safe_intervals is None or key != self.safe_intervals_key:
+            self.safe_intervals = SafeIntervalTable(self.environment)
+            self.safe_intervals_key = key
+        return self.safe_intervals
+
     def get_neighbors(self, position, current_cost):
         """
         Get valid neighboring positions, excluding zones that will be active
@@ -99,8 +223,7 @@ class CSPAgent:
         """
         Check if a position will be part of an active zone by the estimated time.
         """
-        future_zones = self.environment.future_obstacles | self.environment.future_no_fly_zones
-        if position not in future_zones:
+        if position not in self.future_zones:
             return False
 
         # Calculate when the future zone becomes active
@@ -110,6 +233,10 @@ class CSPAgent:
         # If the zone will be active by the time the drone reaches it, return True
         return estimated_time >= activation_time
 
+    def refresh_future_zones(self):
+        """Merge the upcoming zones once per search instead of once per neighbour check."""
+        self.future_zones = self.environment.future_obstacles.keys() | self.environment.future_no_fly_zones.keys()
+
     def helper(self, position, target):
         """Helper function to help calculate target distance."""
         return abs(position[0] - target[0]) + abs(position[1] - target[1])
@@ -117,10 +244,14 @@ class CSPAgent:
     def move_to_target(self, path, target):
         """Move along the path step by step, retrying or waiting when necessary."""
         for current_pos in path:
+            # Safe-interval plans repeat a position to wait in place for a zone to clear
+            waiting = current_pos == self.environment.drone_pos
             self.environment.drone_pos = current_pos
 
             # Determine the current tile type
-            if current_pos in self.environment.obstacles:
+            if waiting:
+                action_type = None
+            elif current_pos in self.environment.obstacles:
                 action_type = "obstacle"
             elif current_pos in self.environment.no_fly_zones:
                 action_type = "no-fly-zone"
@@ -132,9 +263,10 @@ class CSPAgent:
                 action_type = "move"
 
             # Apply rewards/penalties
-            self.reward_function.calculate_reward(
-                current_pos, self.environment, {"type": action_type, "success": True}
-            )
+            if not waiting:
+                self.reward_function.calculate_reward(
+                    current_pos, self.environment, {"type": action_type, "success": True}
+                )
 
             # Update time and dynamic events
             self.environment.advance_time()
@@ -155,35 +287,81 @@ class CSPAgent:
             return False  # Indicate failure to reach target
         return True  # Successfully reached target
 
-    def run(self):
-        """Run the CSP agent to complete all deliveries."""
+    def schedule_deliveries(self, num_drones=1, deadlines=None, precedence=(), horizon_days=1, time_limit=10.0):
+        """
+        Solve the open deliveries as a constraint satisfaction problem over drones and start times.
+        Args:
+            num_drones (int): Number of drones available.
+            deadlines (dict): Optional task ID -> latest finishing minute.
+            precedence (iterable): Optional (before ID, after ID) pairs.
+            horizon_days (int): Number of days start times may fall in.
+            time_limit (float): Wall-clock seconds the solver may spend.
+        Returns:
+            tuple: (schedule, status) from DeliveryScheduler.solve(): entries {"id", "drone",
+            "start", "end"} sorted by start (None if no schedule was found), and "solved",
+            "infeasible" or "timeout".
+        """
+        self.environment.update_dynamic_events()
+        open_points = self.locations_manager.get_pick_up_points()
+        tasks = [task for task in self.locations_manager.delivery_tasks if tuple(task["pick_up"]) in open_points]
+        scheduler = DeliveryScheduler(
+            self.environment, tasks, num_drones=num_drones, time_step=TIME_STEP,
+            horizon_days=horizon_days, deadlines=deadlines, precedence=precedence,
+        )
+        return scheduler.solve(time_limit=time_limit)
+
+    def run(self, scheduled=False):
+        """
+        Run the CSP agent to complete all deliveries.
+        Args:
+            scheduled (bool): Serve the deliveries in the order and at the start times of
+                schedule_deliveries() instead of always heading to the nearest pick-up point.
+        """
         self.environment.reset()
         self.reward_function.reset()
         self.locations_manager.reset()
 
+        schedule = None
+        if scheduled:
+            schedule, status = self.schedule_deliveries()
+            if schedule is None:
+                print(f"No delivery schedule found ({status}), serving the nearest pick-up point first.")
+        pick_ups = {task["id"]: tuple(task["pick_up"]) for task in self.locations_manager.delivery_tasks}
+
         while self.locations_manager.get_pick_up_points():
             current_pos = self.environment.drone_pos
-            pick_up_points = list(self.locations_manager.get_pick_up_points().keys())
             drop_off_points = {v: k for k, v in self.locations_manager.get_drop_off_points().items()}
 
-            # Find the closest pick-up point
-            closest_pickup = self.find_closest(current_pos, pick_up_points)
+            if schedule:
+                # Next scheduled delivery, held back until its start time
+                entry = schedule.pop(0)
+                closest_pickup = pick_ups[entry["id"]]
+                if self.environment.current_time < entry["start"]:
+                    self.environment.advance_to(entry["start"])
+            else:
+                # Find the closest pick-up point
+                closest_pickup = self.locations_manager.nearest_pick_up_points(current_pos)[0]
 
             # Keep trying to reach the pick-up point
             print(f"Heading to pick-up point: {closest_pickup}")
             success = False
             while not success:
+                if not self.wait_until_reachable(current_pos, closest_pickup):
+                    print(f"Pick-up point {closest_pickup} cannot be reached at any time of day.")
+                    return
                 path_to_pickup = self.find_path(current_pos, closest_pickup)
+                if path_to_pickup is None:
+                    continue  # Out of search budget; resume the same search without moving the clock
                 if not path_to_pickup:
-                    self.environment.advance_time()
-                    self.environment.update_dynamic_events()
+                    # Proven unreachable for now; nothing improves until the zones change
+                    self.environment.advance_to_next_change()
                 else:
                     success = self.move_to_target(path_to_pickup, closest_pickup)
 
             # Perform pick-up
             self.environment.is_carrying_package = True
             task_id = self.locations_manager.get_pick_up_points()[closest_pickup]
-            self.locations_manager.pick_up_points.pop(closest_pickup)
+            self.locations_manager.pick_up(closest_pickup)
             reward = self.reward_function.calculate_reward(
                 closest_pickup, self.environment, {"type": "pick-up", "success": True}
             )
@@ -192,16 +370,20 @@ class CSPAgent:
             drop_off_pos = drop_off_points[task_id]
             success = False
             while not success:
+                if not self.wait_until_reachable(self.environment.drone_pos, drop_off_pos):
+                    print(f"Drop-off point {drop_off_pos} cannot be reached at any time of day.")
+                    return
                 path_to_dropoff = self.find_path(self.environment.drone_pos, drop_off_pos)
+                if path_to_dropoff is None:
+                    continue
                 if not path_to_dropoff:
-                    self.environment.advance_time()
-                    self.environment.update_dynamic_events()
+                    self.environment.advance_to_next_change()
                 else:
                     success = self.move_to_target(path_to_dropoff, drop_off_pos)
 
             # Perform drop-off
             self.environment.is_carrying_package = False
-            self.locations_manager.drop_off_points.pop(drop_off_pos)
+            self.locations_manager.drop_off(drop_off_pos)
             reward = self.reward_function.calculate_reward(
                 drop_off_pos, self.environment, {"type": "drop-off", "success": True}
             )
@@ -210,6 +392,19 @@ class CSPAgent:
         print("All deliveries completed!")
         print(f"Final Total Reward: {self.reward_function.total_reward}")
 
+    def wait_until_reachable(self, start, target):
+        """
+        Skip the clock ahead while no zone-free route from start to target exists.
+        Returns:
+            bool: False if target is enclosed in every zone slot of the day.
+        """
+        self.environment.update_dynamic_events()
+        ready_time = self.environment.next_reachable_time(start, target)
+        if ready_time is None:
+            return False
+        self.environment.advance_to(ready_time)
+        return True
+
     def find_closest(self, current_pos, points):
         """Find the closest point to the current position."""
         return min(points, key=lambda p: abs(p[0] - current_pos[0]) + abs(p[1] - current_pos[1]))
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import numpy as np
+from src.utils.atomic_io import atomic_write_json
+from src.utils.reward_function import MOVE_COST, NO_FLY_COST, OBSTACLE_COST
+
+DAY_MINUTES = 24 * 60
+# Move order shared with MDP_AGENT.get_avail_action, and the (dx, dy) of each move
+ACTIONS = ["RIGHT", "UP", "LEFT", "DOWN"]
+ACTION_OFFSETS = [(1, 0), (0, -1), (-1, 0), (0, 1)]
+NO_ACTION = -1
+# Value of a leg still unfinished when the look-ahead runs out
+UNFINISHED_PENALTY = -1000.0
+# Bump when the on-disk layout changes so stale policy files are re-solved
+POLICY_FORMAT_VERSION = 1
+
+
+class DayPolicy:
+    def __init__(self, actions, targets, time_step=10, header=None):
+        """
+        Finite-horizon delivery policy over the whole day, looked up per step.
+        Args:
+            actions (np.ndarray): int8 (targets x ticks x grid x grid) action table holding
+                indices into ACTIONS, NO_ACTION at the target itself.
+            targets (list): (x, y) target cell of each row of the table.
+            time_step (int): Minutes per tick.
+            header (dict): What the policy was solved for (see header()), saved with it.
+        """
+        self.actions = actions
+        self.targets = [tuple(target) for target in targets]
+        self.target_index = {target: i for i, target in enumerate(self.targets)}
+        self.time_step = time_step
+        self.header = header
+
+    @staticmethod
+    def header(environment, targets, obstacle_cost=OBSTACLE_COST, no_fly_cost=NO_FLY_COST, move_cost=MOVE_COST,
+               days=2):
+        """
+        Describe the inputs of solve(), so a saved policy can be checked against the live setup.
+        Returns:
+            dict: JSON-serializable targets, grid size, time step, step costs and a hash of
+                the event patterns.
+        """
+        simulator = environment.event_simulator
+        patterns = json.dumps(simulator.event_patterns if simulator else None, sort_keys=True)
+        return {
+            "version": POLICY_FORMAT_VERSION,
+            "targets": sorted([int(v) for v in target] for target in {tuple(target) for target in targets}),
+            "grid_size": environment.grid_size,
+            "time_step": environment.time_step,
+            "costs": [obstacle_cost, no_fly_cost, move_cost],
+            "days": days,
+            "patterns": hashlib.sha256(patterns.encode("utf-8")).hexdigest(),
+        }
+
+    @classmethod
+    def solve(cls, environment, targets, obstacle_cost=OBSTACLE_COST, no_fly_cost=NO_FLY_COST, move_cost=MOVE_COST,
+              days=2):
+        """
+        Backward induction over (target, tick, x, y) using the known event timeline.
+        Step costs mirror RewardFunction: entering a cell costs move_cost, obstacle_cost or
+        no_fly_cost according to the zones active when the move is made. Carrying does not
+        change step costs, so pickup and dropoff legs to the same cell share a row.
+        The induction runs over `days` days and keeps the first, so every tick of the kept
+        day looks at least one full day ahead, across midnight.
+        Args:
+            environment (Environment): Supplies the event patterns and the protected cells.
+            targets (iterable): Every (x, y) pickup or dropoff cell a leg can head to.
+        Returns:
+            DayPolicy: The solved policy.
+        """
+        targets = sorted({tuple(target) for target in targets})
+        size = environment.grid_size
+        time_step = environment.time_step
+        ticks = DAY_MINUTES // time_step
+
+        # Step cost grid of every zone slot, and the slot of every tick of the day
+        simulator = environment.event_simulator
+        slot_costs = {}
+        tick_slots = []
+        for tick in range(ticks):
+            slot = simulator.get_pattern_index(tick * time_step) if simulator else None
+            if slot not in slot_costs:
+                costs = np.full((size, size), float(move_cost))
+                if slot is not None:
+                    obstacle_mask, no_fly_mask = environment.get_slot_zone_masks(slot)
+                    costs[obstacle_mask] = obstacle_cost
+                    costs[no_fly_mask] = no_fly_cost
+                slot_costs[slot] = costs
+            tick_slots.append(slot)
+
+        rows = np.arange(len(targets))
+        target_xs = np.array([target[0] for target in targets], dtype=np.int64)
+        target_ys = np.array([target[1] for target in targets], dtype=np.int64)
+        values = np.full((len(targets), size, size), UNFINISHED_PENALTY)
+        values[rows, target_xs, target_ys] = 0.0
+        actions = np.full((len(targets), ticks, size, size), NO_ACTION, dtype=np.int8)
+
+        for step in reversed(range(days * ticks)):
+            tick = step % ticks
+            # Value of making each move now: minus the cost of the cell entered, plus its value
+            padded = np.pad(values - slot_costs[tick_slots[tick]], ((0, 0), (1, 1), (1, 1)), constant_values=-np.inf)
+            moves = np.stack([padded[:, 1 + dx:1 + dx + size, 1 + dy:1 + dy + size] for dx, dy in ACTION_OFFSETS])
+            best = moves.argmax(axis=0)
+            values = np.take_along_axis(moves, best[None], axis=0)[0]
+            values[rows, target_xs, target_ys] = 0.0
+            if step < ticks:
+                actions[:, tick] = best
+                actions[rows, tick, target_xs, target_ys] = NO_ACTION
+        header = cls.header(environment, targets, obstacle_cost, no_fly_cost, move_cost, days)
+        return cls(actions, targets, time_step, header)
+
+    def action(self, target, position, current_time):
+        """
+        Look up the move to make.
+        Returns:
+            str: One of ACTIONS, or None at the target.
+        Raises:
+            KeyError: If the policy was not solved for the target.
+        """
+        row = self.target_index.get(tuple(target))
+        if row is None:
+            raise KeyError(f"Day policy has no row for target {tuple(target)}")
+        tick = (current_time % DAY_MINUTES) // self.time_step
+        action = int(self.actions[row, tick, position[0], position[1]])
+        return ACTIONS[action] if action != NO_ACTION else None
+
+    def save(self, path):
+        """Write the action table to path (.npy), and the targets and header next to it."""
+        base, _ = os.path.splitext(path)
+        np.save(base + ".npy", self.actions)
+        np.save(base + "_targets.npy", np.array(self.targets, dtype=np.int64).reshape(-1, 2))
+        # Written last, so a policy interrupted mid-save is never taken as valid
+        atomic_write_json(base + "_header.json", self.header)
+
+    @classmethod
+    def load(cls, path, mmap=False, header=None):
+        """
+        Read a policy written by save().
+        Args:
+            path (str): The .npy file of the action table.
+            mmap (bool): Memory-map the action table instead of reading it into memory.
+            header (dict): If given, the policy is rejected unless it was solved for it.
+        Returns:
+            DayPolicy: The policy, or None if its files are missing or stale.
+        """
+        base, _ = os.path.splitext(path)
+        try:
+            with open(base + "_header.json") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return None
+        if saved.get("version") != POLICY_FORMAT_VERSION or (header is not None and saved != header):
+            return None
+        actions = np.load(base + ".npy", mmap_mode="r" if mmap else None)
+        targets = np.load(base + "_targets.npy")
+        return cls(actions, [tuple(int(v) for v in target) for target in targets], saved["time_step"], saved)
@@ -0,0 +1,272 @@
+import time
+from collections import OrderedDict
+import numpy as np
+from src.utils.grid_search import bfs_grid_pairs
+
+DAY_MINUTES = 24 * 60
+# Only this many of a task's earliest values are ranked by least-constraining value;
+# the rest follow in time order
+LCV_CANDIDATES = 8
+# Number of (task, start) conflict masks kept before the least recently used is evicted
+CONFLICT_CACHE_SIZE = 1024
+
+
+class DeliveryScheduler:
+    def __init__(self, environment, tasks, num_drones=1, time_step=10, horizon_days=1,
+                 deadlines=None, precedence=()):
+        """
+        Constraint model assigning every delivery a start time and a drone.
+        Variables are tasks; a value is (drone, start tick). A delivery must fly pickup to
+        dropoff along a route clear of every zone it lives through, finish by its deadline,
+        respect precedence, and not overlap other deliveries of the same drone (including
+        the flight from one dropoff to the next pickup).
+        Args:
+            environment (Environment): Supplies the clock, event patterns and grid size.
+            tasks (list): Delivery dicts with "id", "pick_up" and "drop_off" (and optionally
+                "deadline" in minutes and "after", a list of task IDs that must finish first).
+            num_drones (int): Number of drones that can carry deliveries in parallel.
+            time_step (int): Minutes per tick (one move).
+            horizon_days (int): Number of days start times may fall in.
+            deadlines (dict): Optional task ID -> latest finishing minute, overriding the tasks.
+            precedence (iterable): Optional (before ID, after ID) pairs, added to the tasks'.
+        """
+        self.environment = environment
+        self.tasks = list(tasks)
+        self.ids = [task["id"] for task in self.tasks]
+        self.num_drones = num_drones
+        self.time_step = time_step
+        self.num_ticks = horizon_days * DAY_MINUTES // time_step
+        self.nodes = 0
+        self.timed_out = False
+        self._conflict_cache = OrderedDict()  # (task, start tick) -> conflict masks
+
+        index = {task_id: i for i, task_id in enumerate(self.ids)}
+        deadlines = dict(deadlines or {})
+        self.deadlines = [deadlines.get(task["id"], task.get("deadline")) for task in self.tasks]
+        self.before = [set() for _ in self.tasks]  # i -> tasks that must finish before i starts
+        self.after = [set() for _ in self.tasks]  # i -> tasks that may only start after i ends
+        pairs = list(precedence) + [(first, task["id"]) for task in self.tasks for first in task.get("after", [])]
+        for first, second in pairs:
+            self.before[index[second]].add(index[first])
+            self.after[index[first]].add(index[second])
+        self.degree = np.array([len(self.before[i]) + len(self.after[i]) for i in range(len(self.tasks))], dtype=np.int64)
+
+        self.durations = self._durations()  # (tasks, ticks), ticks of flight or -1 if infeasible
+        # Start times are counted from midnight, so nothing may start before the current time
+        self.durations[:, :environment.current_time // time_step] = -1
+        pick_ups = np.array([task["pick_up"] for task in self.tasks]).reshape(-1, 2)
+        drop_offs = np.array([task["drop_off"] for task in self.tasks]).reshape(-1, 2)
+        # Lower bound on the ticks needed to fly from dropoff i to pickup j
+        self.travel = np.abs(drop_offs[:, None, :] - pick_ups[None, :, :]).sum(axis=2)
+
+    def _durations(self):
+        """
+        Flight time of each delivery for every start tick (the unary zone and deadline
+        constraints), -1 where the delivery cannot start.
+        A delivery that runs into later slots must avoid every zone of those slots, so the
+        route length is taken over the union of their zones.
+        """
+        patterns = self.environment.event_simulator.event_patterns
+        slot_blocked = []
+        for slot in range(len(patterns)):
+            obstacle_mask, no_fly_mask = self.environment.get_slot_zone_masks(slot)
+            slot_blocked.append(obstacle_mask | no_fly_mask)
+
+        # Slot segments of the horizon plus a spare day to finish late deliveries in
+        segments = []  # (first tick, end tick, slot)
+        for day in range(self.num_ticks * self.time_step // DAY_MINUTES + 2):
+            for slot, pattern in enumerate(patterns):
+                start, end = pattern.get("time_range", (0, 0))
+                segments.append(((day * DAY_MINUTES + start) // self.time_step, (day * DAY_MINUTES + end) // self.time_step, slot))
+        segments.sort()
+
+        pick_ups = np.array([task["pick_up"] for task in self.tasks], dtype=np.int64).reshape(-1, 2)
+        drop_offs = np.array([task["drop_off"] for task in self.tasks], dtype=np.int64).reshape(-1, 2)
+        # Slots spanned -> (tasks,) route lengths, shared by every start segment and day; each
+        # route is only searched once some start still needs it (NaN until then)
+        window_lengths = {}
+
+        durations = np.full((len(self.tasks), self.num_ticks), -1, dtype=np.int64)
+        for a, (first_tick, end_tick, _) in enumerate(segments):
+            if first_tick >= self.num_ticks:
+                break
+            ticks = np.arange(first_tick, min(end_tick, self.num_ticks))
+            pending = np.ones((len(self.tasks), len(ticks)), dtype=bool)
+            for b in range(a, len(segments)):
+                slots = tuple(sorted({slot for _, _, slot in segments[a:b + 1]}))
+                lengths = window_lengths.setdefault(slots, np.full(len(self.tasks), np.nan))
+                needed = pending.any(axis=1) & np.isnan(lengths)
+                if needed.any():
+                    blocked = np.logical_or.reduce([slot_blocked[slot] for slot in slots])
+                    lengths[needed] = bfs_grid_pairs(blocked, pick_ups[needed], drop_offs[needed])
+                # Longer windows only add zones, so a route that is cut off stays cut off
+                pending &= np.isfinite(lengths)[:, None]
+                lengths = np.where(np.isfinite(lengths), lengths, 0).astype(np.int64)
+                # Deliveries that land within segment b
+                fits = pending & (ticks[None, :] + lengths[:, None] <= segments[b][1])
+                durations[:, first_tick:first_tick + len(ticks)][fits] = np.broadcast_to(lengths[:, None], fits.shape)[fits]
+                pending &= ~fits
+                if not pending.any():
+                    break
+
+        ticks = np.arange(self.num_ticks)
+        for i, deadline in enumerate(self.deadlines):
+            if deadline is not None:
+                durations[i, ticks + durations[i] > deadline // self.time_step] = -1
+        return durations
+
+    def _conflicts(self, i, start):
+        """
+        Values of every task ruled out by starting task i at the given tick, cached per (i, start)
+        since the drone only selects which row the overlap applies to.
+        Returns:
+            tuple: (overlap, order) bool (tasks x ticks) masks; overlap applies on the same
+            drone only, order (precedence, None if task i has none) on every drone.
+        """
+        key = (i, start)
+        if key in self._conflict_cache:
+            self._conflict_cache.move_to_end(key)
+            return self._conflict_cache[key]
+
+        end = start + self.durations[i, start]
+        ticks = np.arange(self.num_ticks)
+        ends = ticks[None, :] + self.durations
+        # The same drone cannot fly both deliveries (and the hop between them) at once
+        overlap = (ticks[None, :] < end + self.travel[i, :, None]) & (ends + self.travel[:, i, None] > start)
+        order = None
+        if self.before[i] or self.after[i]:
+            order = np.zeros((len(self.tasks), self.num_ticks), dtype=bool)
+            for j in self.after[i]:
+                order[j] = ticks < end
+            for j in self.before[i]:
+                order[j] = ends[j] > start
+
+        self._conflict_cache[key] = (overlap, order)
+        if len(self._conflict_cache) > CONFLICT_CACHE_SIZE:
+            self._conflict_cache.popitem(last=False)
+        return overlap, order
+
+    def _revise_precedence(self, domains, first, second):
+        """AC-3 revision of "first finishes before second starts". Returns True if pruned."""
+        ticks = np.arange(self.num_ticks)
+        ends = np.where(domains[first].any(axis=0), ticks + self.durations[first], np.iinfo(np.int64).max)
+        starts = np.where(domains[second].any(axis=0), ticks, -1)
+        earliest_end, latest_start = ends.min(), starts.max()
+        keep_second = ticks >= earliest_end
+        keep_first = ticks + self.durations[first] <= latest_start
+        pruned = (domains[second] & ~keep_second).any() or (domains[first] & ~keep_first).any()
+        domains[second] &= keep_second
+        domains[first] &= keep_first
+        return pruned
+
+    def _ac3(self, domains):
+        """Enforce arc consistency on the precedence constraints. Returns False on a wipe-out."""
+        queue = [(first, second) for second in range(len(self.tasks)) for first in self.before[second]]
+        while queue:
+            first, second = queue.pop()
+            if self._revise_precedence(domains, first, second):
+                if not domains[first].any() or not domains[second].any():
+                    return False
+                queue += [(other, first) for other in self.before[first]]
+                queue += [(second, other) for other in self.after[second]]
+        return True
+
+    def _order_values(self, i, domains, free):
+        """
+        Every (drone, start) value of task i: the earliest LCV_CANDIDATES ranked by how few
+        values they remove (LCV), then the rest in time order so the search stays complete.
+        """
+        starts, drones = np.nonzero(domains[i].T)
+        scores = []
+        for start, drone in zip(starts[:LCV_CANDIDATES].tolist(), drones[:LCV_CANDIDATES].tolist()):
+            overlap, order = self._conflicts(i, start)
+            removed = int((domains[free, drone, :] & overlap[free]).sum())
+            if order is not None:
+                removed += int((domains[free] & order[free][:, None, :]).sum())
+            scores.append((removed, start, drone))
+        rest = zip(drones[LCV_CANDIDATES:].tolist(), starts[LCV_CANDIDATES:].tolist())
+        return [(drone, start) for _, start, drone in sorted(scores)] + list(rest)
+
+    def solve(self, time_limit=10.0):
+        """
+        Backtracking search with forward checking, MRV/degree variable ordering and LCV values.
+        Args:
+            time_limit (float): Wall-clock seconds before giving up.
+        Returns:
+            tuple: (schedule, status). The schedule lists entries {"id", "drone", "start",
+            "end"} (minutes) sorted by start, or is None if none was found. The status is
+            "solved", "infeasible" (proven: a domain wiped out, the drones lack the flight
+            time, or the search was exhausted) or "timeout" (time_limit ran out first).
+        """
+        self.nodes = 0
+        self.timed_out = False
+        if not self.tasks:
+            return [], "solved"
+        # domains[task, drone, tick]: whether the task may still start at tick on that drone
+        domains = np.repeat((self.durations >= 0)[:, None, :], self.num_drones, axis=1)
+        if not domains.any(axis=(1, 2)).all() or not self._ac3(domains):
+            return None, "infeasible"
+        # Even back to back, the drones cannot fly more than their ticks; every delivery but
+        # the first of each drone also needs a hop from some other dropoff
+        shortest = np.where(self.durations >= 0, self.durations, np.iinfo(np.int64).max).min(axis=1)
+        hops = np.where(np.eye(len(self.tasks), dtype=bool), np.iinfo(np.int64).max, self.travel).min(axis=0)
+        hops = np.sort(np.minimum(hops, self.num_ticks))[:max(len(self.tasks) - self.num_drones, 0)]
+        if shortest.sum() + hops.sum() > self.num_drones * self.num_ticks:
+            return None, "infeasible"
+
+        assignment = self._backtrack({}, domains, np.ones(len(self.tasks), dtype=bool), time.perf_counter() + time_limit)
+        if assignment is None:
+            return None, "timeout" if self.timed_out else "infeasible"
+        schedule = [
+            {
+                "id": self.ids[i],
+                "drone": drone,
+                "start": start * self.time_step,
+                "end": (start + int(self.durations[i, start])) * self.time_step,
+            }
+            for i, (drone, start) in assignment.items()
+        ]
+        return sorted(schedule, key=lambda entry: (entry["start"], entry["drone"])), "solved"
+
+    def _backtrack(self, assignment, domains, free, deadline):
+        """
+        Recursive step of solve(). Domains are pruned in place and restored from a trail on
+        the way back, so only the touched rows are copied per level.
+        """
+        if not free.any():
+            return assignment
+        if time.perf_counter() > deadline:
+            self.timed_out = True
+            return None
+
+        # MRV, ties broken by the number of precedence constraints
+        candidates = np.flatnonzero(free)
+        sizes = domains[candidates].sum(axis=(1, 2))
+        i = int(candidates[np.argmin(sizes * (self.degree.max() + 1) - self.degree[candidates])])
+        free[i] = False
+        related = sorted(self.before[i] | self.after[i])
+        for drone, start in self._order_values(i, domains, free):
+            self.nodes += 1
+            overlap, order = self._conflicts(i, start)
+            trail = (domains[:, drone, :].copy(), domains[related].copy(), domains[i].copy())
+
+            # Forward checking: prune every unassigned task against the new assignment
+            domains[:, drone, :] &= ~overlap
+            if order is not None:
+                domains[related] &= ~order[related][:, None, :]
+            domains[i] = False
+            domains[i, drone, start] = True
+            if domains[free].any(axis=(1, 2)).all():
+                assignment[i] = (drone, start)
+                if self._backtrack(assignment, domains, free, deadline) is not None:
+                    return assignment
+                del assignment[i]
+
+            domains[:, drone, :] = trail[0]
+            domains[related] = trail[1]
+            domains[i] = trail[2]
+            if time.perf_counter() > deadline:
+                self.timed_out = True
+                break
+        free[i] = True
+        return None
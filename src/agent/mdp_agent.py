@@ -1,9 +1,14 @@
 import pygame
+from collections import OrderedDict
+import numpy as np
 from src.simulation.environment import Environment
 from src.simulation.event_simulator import EventSimulator
 from src.simulation.locations_manager import LocationsManager
 from src.utils.reward_function import RewardFunction
 from src.simulation.render import Renderer
+from src.agent.day_policy import DayPolicy
+from src.agent.mdp_solvers import solve
+from src.utils.transition_model import TransitionModelCache
 
 pygame.init()
 
@@ -12,6 +17,8 @@ WINDOW_SIZE = 600
 GRID_SIZE = 20
 CELL_SIZE = WINDOW_SIZE // GRID_SIZE
 EPS = 0.1
+MOVES = ["RIGHT", "UP", "LEFT", "DOWN"]  # get_avail_action() order
+UTIL_CACHE_SIZE = 32  # Converged utility tables kept before the least recently used is evicted
 
 # Colors
 COLORS = {
@@ -28,8 +35,23 @@ COLORS = {
 
 
 class MDP_AGENT:
-    def __init__(self, render=True):
-        """Initialize the bad agent environment."""
+    def __init__(self, render=True, day_policy=False, policy_path=None, mmap=False, solver="value_iteration",
+                 batched=False, slip=0.0, wind=None):
+        """
+        Initialize the bad agent environment.
+        Args:
+            render (bool): Whether to draw each step.
+            day_policy (bool): Follow a finite-horizon policy solved once for the whole day
+                instead of re-solving value iteration as the zones change.
+            policy_path (str): Optional .npy file the day policy is loaded from, or saved to
+                after solving if it does not exist yet.
+            mmap (bool): Memory-map a loaded day policy.
+            solver (str): Name of the solver in mdp_solvers.SOLVERS used by value_iter().
+            batched (bool): Solve the utilities of every open pickup and dropoff leg together,
+                once per zone epoch, and read the current leg's slice.
+            slip (float): Probability that a move slides sideways, for the solved utilities.
+            wind (tuple): Optional ((dx, dy), probability) drift, for the solved utilities.
+        """
         self.environment = Environment(grid_size=GRID_SIZE, cell_size=CELL_SIZE)
         self.event_simulator = EventSimulator(grid_size=GRID_SIZE, config_path="src/configs/event_patterns.json")
         self.environment.set_event_simulator(self.event_simulator)
@@ -43,16 +65,23 @@ class MDP_AGENT:
         self.util = None
         self.pick_up = None
         self.drop_off = None
+        self.util_key = None
+        self.util_cache = OrderedDict()  # (pick_up, drop_off, carrying, zone epoch) -> utilities
+        self.util_hits = 0
+        self.util_misses = 0
+        self.use_day_policy = day_policy
+        self.policy_path = policy_path
+        self.mmap = mmap
+        self.day_policy = None
+        self.solver = solver
+        self.solver_stats = None
+        self.batched = batched
+        self.transition_models = TransitionModelCache(self.environment, MOVES, slip=slip, wind=wind)
 
     def _init_util(self):
         """Initialize the utility of the map"""
-        util = {}
-        for x in range(GRID_SIZE):
-            for y in range(GRID_SIZE):
-                state = (x,y)
-                util[state] = float('-inf')
-        self.util = util 
-    
+        self.util = np.full((self.environment.grid_size, self.environment.grid_size), float('-inf'))
+
     def get_transition(self, state, action):
         """The transition function between two states"""
         x, y = state
@@ -109,32 +138,127 @@ class MDP_AGENT:
         
         return reward 
 
+    def reward_grid(self, hasPackage):
+        """Vectorized reward(): the reward of every state as a (grid x grid) array indexed [x, y]"""
+        size = self.environment.grid_size
+        target = self.drop_off if hasPackage else self.pick_up
+        xs, ys = np.indices((size, size))
+        rewards = np.maximum(1, 25 - 0.5 * (np.abs(target[0] - xs) + np.abs(target[1] - ys)))
+        # Applied from lowest to highest precedence, mirroring the checks in reward()
+        if self.pick_up is not None:
+            rewards[self.pick_up] = 0 if hasPackage else 30
+        if self.drop_off is not None:
+            rewards[self.drop_off] = 30 if hasPackage else 0
+        obstacle_mask, no_fly_mask = self.environment.get_zone_masks()
+        rewards[obstacle_mask] = -10
+        rewards[no_fly_mask] = -20
+        return rewards
+
+    def reward_grids(self, legs):
+        """
+        reward() of every leg at once as a (legs x grid x grid) array.
+        Args:
+            legs (tuple): (pick_up, drop_off, hasPackage) per leg.
+        """
+        size = self.environment.grid_size
+        rows = np.arange(len(legs))
+        pick_ups = np.array([leg[0] for leg in legs], dtype=np.int64).reshape(-1, 2)
+        drop_offs = np.array([leg[1] for leg in legs], dtype=np.int64).reshape(-1, 2)
+        carrying = np.array([leg[2] for leg in legs], dtype=bool)
+        targets = np.where(carrying[:, None], drop_offs, pick_ups)
+        xs, ys = np.indices((size, size))
+        manhattan = np.abs(targets[:, 0, None, None] - xs) + np.abs(targets[:, 1, None, None] - ys)
+        rewards = np.maximum(1, 25 - 0.5 * manhattan)
+        rewards[rows, pick_ups[:, 0], pick_ups[:, 1]] = np.where(carrying, 0, 30)
+        rewards[rows, drop_offs[:, 0], drop_offs[:, 1]] = np.where(carrying, 30, 0)
+        obstacle_mask, no_fly_mask = self.environment.get_zone_masks()
+        rewards[:, obstacle_mask] = -10
+        rewards[:, no_fly_mask] = -20
+        return rewards
+
+    def goal_legs(self):
+        """(pick_up, drop_off, hasPackage) of every leg still to fly: open pickups and open dropoffs"""
+        pick_up_points = self.locations_manager.get_pick_up_points()
+        drop_off_points = self.locations_manager.get_drop_off_points()
+        legs = []
+        for task in self.locations_manager.delivery_tasks:
+            pick_up, drop_off = tuple(task["pick_up"]), tuple(task["drop_off"])
+            if pick_up in pick_up_points:
+                legs.append((pick_up, drop_off, False))
+            if drop_off in drop_off_points:
+                legs.append((pick_up, drop_off, True))
+        return tuple(legs)
+
+    def solve_batched_util(self):
+        """
+        Make self.util the current leg's slice of the utilities of all legs, solved together in
+        one (legs x grid x grid) solve per zone epoch and warm-started across epochs.
+        """
+        legs = self.goal_legs()
+        key = ("batched", legs, self.environment.zone_epoch)
+        if key in self.util_cache:
+            self.util_hits += 1
+            self.util_cache.move_to_end(key)
+            tables = self.util_cache[key]
+        else:
+            self.util_misses += 1
+            size = self.environment.grid_size
+            previous = self.util_cache.get(self.util_key) if self.util_key and self.util_key[:2] == key[:2] else None
+            tables = previous if previous is not None else np.full((len(legs), size, size), float('-inf'))
+            model, prob = self.action_grids()
+            tables, self.solver_stats = solve(self.solver, self.reward_grids(legs), model, prob, tables, EPS)
+            self.util_cache[key] = tables
+            if len(self.util_cache) > UTIL_CACHE_SIZE:
+                self.util_cache.popitem(last=False)
+        self.util_key = key
+
+        carrying = self.environment.is_carrying_package
+        target = self.drop_off if carrying else self.pick_up
+        row = next(i for i, leg in enumerate(legs) if leg[2] == carrying and leg[1 if carrying else 0] == target)
+        self.util = tables[row]
+
+    def action_grids(self):
+        """
+        Transition structure for the Bellman backups, in get_avail_action() order.
+        Returns:
+            tuple: (model, prob) where model holds the per-action sparse transition matrices
+            and prob is 1 / (number of available actions) of every state.
+        """
+        model = self.transition_models.get()
+        return model, 1 / model.valid.sum(axis=0)
+
     def value_iter(self):
-        """Value iteration to get the utility for the map"""
-        max_change = 1 + EPS 
-        while max_change > EPS:
-            max_change = 0  
-            util_pre = self.util.copy()  # Copy current utility values
-            for x in range(GRID_SIZE):
-                for y in range(GRID_SIZE):
-                    state = (x, y)
-                    # Immediate reward for the current state
-                    util = self.reward(state, self.environment.is_carrying_package)
-                    action_avail = self.get_avail_action(state)
-                    if not action_avail:
-                        self.util[state] = util
-                        continue
-                    
-                    # Calculate the best utility over all available actions
-                    bestUtil = util
-                    prob = 1 / len(action_avail) 
-                    for action in action_avail:
-                        next_state = self.get_transition(state, action)
-                        actUtil = prob * util_pre[next_state]
-                        bestUtil = max(bestUtil, actUtil)
-                    
-                    self.util[state] = bestUtil
-                    max_change = max(max_change, abs(self.util[state] - util_pre[state]))
+        """Solve for the utility of the map with the configured solver, recording its stats"""
+        rewards = self.reward_grid(self.environment.is_carrying_package)
+        model, prob = self.action_grids()
+        self.util, self.solver_stats = solve(self.solver, rewards, model, prob, self.util, EPS)
+
+    def solve_util(self):
+        """
+        Make self.util the converged utilities for the current targets, carrying state and zones.
+        Tables are cached per zone epoch, so a step without a zone change is a lookup; after a
+        change, value iteration is warm-started from the utilities of the previous epoch.
+        """
+        if self.batched:
+            self.solve_batched_util()
+            return
+        carrying = self.environment.is_carrying_package
+        key = (self.pick_up, self.drop_off, carrying, self.environment.zone_epoch)
+        if key in self.util_cache:
+            self.util_hits += 1
+            self.util_cache.move_to_end(key)
+            self.util = self.util_cache[key]
+            self.util_key = key
+            return
+
+        self.util_misses += 1
+        if self.util_key is None or self.util_key[:3] != key[:3]:
+            self._init_util()
+        self.value_iter()
+        self.util_cache[key] = self.util
+        self.util_key = key
+        if len(self.util_cache) > UTIL_CACHE_SIZE:
+            self.util_cache.popitem(last=False)
 
     def select_best_action(self, current_pos):
         """Select the best action based on utility values."""
@@ -151,6 +275,20 @@ class MDP_AGENT:
 
         return best_action
 
+    def get_day_policy(self):
+        """Load or solve the day policy for every pickup and dropoff target."""
+        if self.day_policy is None:
+            targets = list(self.locations_manager.get_pick_up_points()) + list(self.locations_manager.get_drop_off_points())
+            if self.policy_path:
+                # A policy saved for other targets, patterns or grid is stale and re-solved
+                header = DayPolicy.header(self.environment, targets)
+                self.day_policy = DayPolicy.load(self.policy_path, mmap=self.mmap, header=header)
+            if self.day_policy is None:
+                self.day_policy = DayPolicy.solve(self.environment, targets)
+                if self.policy_path:
+                    self.day_policy.save(self.policy_path)
+        return self.day_policy
+
     def find_closest(self, current_pos, points):
         """Find the closest point to the current position."""
         return min(points, key=lambda p: abs(p[0] - current_pos[0]) + abs(p[1] - current_pos[1]))
@@ -159,7 +297,10 @@ class MDP_AGENT:
         """Move step by step to the target position."""
         path = []
         while current_pos != target_pos:
-            action = self.select_best_action(current_pos)
+            if self.use_day_policy:
+                action = self.get_day_policy().action(target_pos, current_pos, self.environment.current_time)
+            else:
+                action = self.select_best_action(current_pos)
             current_pos = self.get_transition(current_pos, action)
 
             path.append(current_pos)
@@ -183,9 +324,8 @@ class MDP_AGENT:
             self.environment.advance_time()
             self.environment.update_dynamic_events()  # Ensure dynamic zones are updated
             #need to recopute the utilitiy
-            if self.environment.event_simulator:
-                self._init_util()
-                self.value_iter()
+            if self.environment.event_simulator and not self.use_day_policy:
+                self.solve_util()
 
 
             if self.render:
@@ -208,26 +348,25 @@ class MDP_AGENT:
 
         while self.locations_manager.get_pick_up_points():
             current_pos = self.environment.drone_pos
-            pick_up_points = list(self.locations_manager.get_pick_up_points().keys())
             drop_off_points = {v: k for k, v in self.locations_manager.get_drop_off_points().items()}
             pick_up_ppoints = self.locations_manager.get_pick_up_points().copy()
             drop_off_ppoints = self.locations_manager.get_drop_off_points().copy()
 
             # Find the closest pick-up point
-            closest_pickup = self.find_closest(current_pos, pick_up_points)
+            closest_pickup = self.locations_manager.nearest_pick_up_points(current_pos)[0]
 
             # Move to the pick-up point
             print(f"Heading to pick-up point: {closest_pickup}")
             task_id = self.locations_manager.get_pick_up_points()[closest_pickup]
-            self._init_util() #compute the the utility for the picking for specific task_id
             self.pick_up = next(key for key, value in pick_up_ppoints.items() if value == task_id)
-            self.value_iter()
+            if not self.use_day_policy:
+                self.solve_util() #compute the the utility for the picking for specific task_id
             self.move_to_target(current_pos, closest_pickup)
 
             # Perform pick-up
             self.environment.is_carrying_package = True
             task_id = self.locations_manager.get_pick_up_points()[closest_pickup]
-            self.locations_manager.pick_up_points.pop(closest_pickup)
+            self.locations_manager.pick_up(closest_pickup)
             reward = self.reward_function.calculate_reward(
                 closest_pickup, self.environment, {"type": "pick-up", "success": True}
             )
@@ -235,15 +374,15 @@ class MDP_AGENT:
 
             # Move to the corresponding drop-off point
             drop_off_pos = drop_off_points[task_id]
-            self._init_util() #recompute the utility for the dropoff for specific task_id
             self.drop_off = next(key for key, value in drop_off_ppoints.items() if value == task_id)
-            self.value_iter()
+            if not self.use_day_policy:
+                self.solve_util() #recompute the utility for the dropoff for specific task_id
             print(f"Heading to drop-off point: {drop_off_pos}")
             self.move_to_target(self.environment.drone_pos, drop_off_pos)
 
             # Perform drop-off
             self.environment.is_carrying_package = False
-            self.locations_manager.drop_off_points.pop(drop_off_pos)
+            self.locations_manager.drop_off(drop_off_pos)
             reward = self.reward_function.calculate_reward(
                 drop_off_pos, self.environment, {"type": "drop-off", "success": True}
             )
@@ -0,0 +1,189 @@
+import heapq
+import time
+import numpy as np
+
+# Sweeps of policy evaluation between improvements in modified policy iteration
+EVALUATION_SWEEPS = 5
+
+
+class SolverStats:
+    def __init__(self, name):
+        """
+        Convergence record of one solve.
+        Attributes:
+            sweeps (int): Full passes over the states (for prioritized sweeping, every
+                grid-size worth of backups counts as one).
+            backups (int): Single-state Bellman backups performed.
+            wall_time (float): Seconds spent in the solver.
+            residuals (list): Largest utility change of each sweep (for prioritized sweeping,
+                the largest Bellman error left after it).
+        """
+        self.name = name
+        self.sweeps = 0
+        self.backups = 0
+        self.wall_time = 0.0
+        self.residuals = []
+
+    def __repr__(self):
+        residual = self.residuals[-1] if self.residuals else float("nan")
+        return (f"{self.name}: {self.sweeps} sweeps, {self.backups} backups, "
+                f"{self.wall_time * 1000:.2f} ms, final residual {residual:.4g}")
+
+
+def bellman(util, rewards, model, prob):
+    """One synchronous backup U(s) = max(R(s), max_a p(s) * E[U(s') | s, a])."""
+    return np.maximum(rewards, (prob * model.expected(util)).max(axis=0))
+
+
+def value_iteration(rewards, model, prob, util, eps):
+    """Synchronous (Jacobi) sweeps until the largest change is at most eps."""
+    stats = SolverStats("value_iteration")
+    max_change = 1 + eps
+    while max_change > eps:
+        util_pre = util
+        util = bellman(util_pre, rewards, model, prob)
+        max_change = np.abs(util - util_pre).max()
+        stats.sweeps += 1
+        stats.backups += util.size
+        stats.residuals.append(float(max_change))
+    return util, stats
+
+
+def gauss_seidel(rewards, model, prob, util, eps):
+    """
+    In-place sweeps in red-black order: the two checkerboard colours only neighbour each
+    other, so each half-sweep already sees the values updated by the previous one.
+    """
+    stats = SolverStats("gauss_seidel")
+    xs, ys = np.indices(rewards.shape[-2:])
+    colours = [(xs + ys) % 2 == 0, (xs + ys) % 2 == 1]
+    util = util.copy()
+    max_change = 1 + eps
+    while max_change > eps:
+        max_change = 0.0
+        for colour in colours:
+            updated = bellman(util, rewards, model, prob)
+            change = np.abs(updated - util)[..., colour].max()
+            max_change = max(max_change, change)
+            util[..., colour] = updated[..., colour]
+        stats.sweeps += 1
+        stats.backups += util.size
+        stats.residuals.append(float(max_change))
+    return util, stats
+
+
+def prioritized_sweeping(rewards, model, prob, util, eps):
+    """
+    Back up one state at a time, always the one with the largest Bellman error, and re-queue
+    its predecessors (the states whose backups read it).
+    """
+    stats = SolverStats("prioritized_sweeping")
+    num_states = rewards.size
+    reward_list = rewards.ravel().tolist()
+    prob_list = prob.ravel().tolist()
+    util = np.maximum(util, rewards)
+    shape = util.shape
+    util = util.ravel().tolist()
+    successors, predecessors = model.adjacency()
+
+    def backup(state):
+        p = prob_list[state]
+        return max([reward_list[state]] + [p * sum(w * util[n] for n, w in outcomes) for outcomes in successors[state]])
+
+    errors = np.abs(bellman(np.reshape(util, shape), rewards, model, prob) - np.reshape(util, shape)).ravel()
+    queue = [(-errors[state], state) for state in np.flatnonzero(errors > eps).tolist()]
+    heapq.heapify(queue)
+    while queue:
+        _, state = heapq.heappop(queue)
+        value = backup(state)
+        stats.backups += 1
+        if value != util[state]:
+            util[state] = value
+            for predecessor in predecessors[state]:
+                error = abs(backup(predecessor) - util[predecessor])
+                if error > eps:
+                    heapq.heappush(queue, (-error, predecessor))
+        if stats.backups % num_states == 0 or not queue:
+            # The Bellman error left, comparable with the other solvers' final change
+            table = np.reshape(util, shape)
+            stats.sweeps += 1
+            stats.residuals.append(float(np.abs(bellman(table, rewards, model, prob) - table).max()))
+    return np.reshape(util, shape), stats
+
+
+def modified_policy_iteration(rewards, model, prob, util, eps, evaluation_sweeps=EVALUATION_SWEEPS):
+    """
+    Alternate one greedy improvement backup with a few cheap evaluation sweeps of the fixed
+    policy (one gather instead of a max over actions). Choosing the reward R(s) over moving
+    is treated as a fifth action.
+    """
+    stats = SolverStats("modified_policy_iteration")
+    util = np.maximum(util, rewards)
+    while True:
+        # Improvement: greedy action per state and its backed-up value
+        choices = np.concatenate([prob * model.expected(util), rewards[None]])
+        policy = choices.argmax(axis=0)
+        improved = np.take_along_axis(choices, policy[None], axis=0)[0]
+        residual = np.abs(improved - util).max()
+        util = improved
+        stats.sweeps += 1
+        stats.backups += util.size
+        stats.residuals.append(float(residual))
+        if residual <= eps:
+            return util, stats
+
+        # Partial evaluation of the fixed policy
+        moving = policy < len(model.actions)
+        chosen = np.minimum(policy, len(model.actions) - 1)[None]
+        for _ in range(evaluation_sweeps):
+            expected = np.take_along_axis(model.expected(util), chosen, axis=0)[0]
+            evaluated = np.where(moving, prob * expected, rewards)
+            residual = np.abs(evaluated - util).max()
+            util = evaluated
+            stats.sweeps += 1
+            stats.backups += util.size
+            stats.residuals.append(float(residual))
+            if residual <= eps:
+                break
+
+
+SOLVERS = {
+    "value_iteration": value_iteration,
+    "gauss_seidel": gauss_seidel,
+    "prioritized_sweeping": prioritized_sweeping,
+    "modified_policy_iteration": modified_policy_iteration,
+}
+
+
+def solve(name, rewards, model, prob, util, eps):
+    """
+    Run a solver from SOLVERS on the MDP_AGENT Bellman equation.
+    Args:
+        name (str): Key of SOLVERS.
+        rewards (np.ndarray): (grid x grid) immediate rewards, or (goals x grid x grid) to solve
+            several goals at once on the shared transition structure.
+        model (TransitionModel): Per-action transition matrices of the grid.
+        prob (np.ndarray): (grid x grid) weight of each move.
+        util (np.ndarray): Starting utilities shaped like rewards (-inf for a cold start).
+        eps (float): Convergence threshold on the largest change per sweep.
+    Returns:
+        tuple: (utilities, SolverStats).
+    """
+    if name not in SOLVERS:
+        raise ValueError(f"Unknown MDP solver {name!r}, expected one of {sorted(SOLVERS)}")
+    start = time.perf_counter()
+    if name == "prioritized_sweeping" and rewards.ndim == 3:
+        # One queue per goal; the per-state backups do not batch
+        stats = SolverStats(name)
+        tables = []
+        for goal_rewards, goal_util in zip(rewards, util):
+            table, goal_stats = prioritized_sweeping(goal_rewards, model, prob, goal_util, eps)
+            tables.append(table)
+            stats.sweeps += goal_stats.sweeps
+            stats.backups += goal_stats.backups
+            stats.residuals += goal_stats.residuals
+        util = np.stack(tables) if tables else util
+    else:
+        util, stats = SOLVERS[name](rewards, model, prob, util, eps)
+    stats.wall_time = time.perf_counter() - start
+    return util, stats
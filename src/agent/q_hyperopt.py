@@ -1,12 +1,21 @@
+import argparse
+import multiprocessing
+import os
 import pygame
-import pickle
 import random
-from collections import defaultdict
+import shutil
 from src.simulation.environment import Environment
 from src.simulation.event_simulator import EventSimulator
 from src.simulation.locations_manager import LocationsManager
 from src.utils.reward_function import RewardFunction
-import optuna
+from src.utils.transition_model import TransitionModelCache
+from src.agent.q_table import QTable, PositionEncoder
+from src.utils.atomic_io import atomic_write_json
+try:
+    import optuna
+    from optuna.trial import TrialState
+except ImportError:  # Only the search needs optuna; q_pbt reuses QLearningHyperopt without it
+    optuna = None
 
 pygame.init()
 
@@ -16,7 +25,20 @@ GRID_SIZE = 20
 CELL_SIZE = WINDOW_SIZE // GRID_SIZE
 TIME_STEP = 10
 ZONE_CHANGE_INTERVAL = 120
-Q_TABLE_FILE = "q_table.pkl"
+TRAINING_EPISODES = 2000
+# Episodes per intermediate value reported to the pruner
+REPORT_EVERY = 100
+STUDY_NAME = "q_learning"
+STORAGE_FILE = "q_hyperopt.db"
+# Running trials record a heartbeat this often (seconds); one silent for the grace period is
+# marked failed when a worker next starts a trial, and re-queued up to MAX_TRIAL_RETRIES times
+HEARTBEAT_INTERVAL = 30
+HEARTBEAT_GRACE_PERIOD = 120
+MAX_TRIAL_RETRIES = 3
+# Tables of trials that were the best when they finished (the winner is copied to BEST_Q_TABLE_FILE)
+TRIAL_TABLE_DIR = "q_hyperopt_tables"
+BEST_PARAMS_FILE = "q_hyperopt_best_params.json"
+BEST_Q_TABLE_FILE = "q_hyperopt_best.qtable"
 
 class QLearningHyperopt:
     def __init__(self, alpha, gamma, initial_epsilon, min_epsilon, epsilon_decay, training_episodes=5000):
@@ -30,8 +52,9 @@ class QLearningHyperopt:
 
         self.reward_function = RewardFunction()
 
-        self.q_table = defaultdict(lambda: defaultdict(float))  # Q-table
         self.actions = ["UP", "DOWN", "LEFT", "RIGHT"]
+        self.q_table = QTable(PositionEncoder(GRID_SIZE), self.actions)
+        self.transition_models = TransitionModelCache(self.environment, self.actions, block_zones=True)
 
         # Hyperparameters
         self.alpha = alpha
@@ -44,21 +67,7 @@ class QLearningHyperopt:
 
     def get_neighbors(self, state):
         """Determine valid neighboring states."""
-        x, y = state
-        neighbors = {
-            "UP": (x, y - 1),
-            "DOWN": (x, y + 1),
-            "LEFT": (x - 1, y),
-            "RIGHT": (x + 1, y)
-        }
-        valid_neighbors = {}
-        for action, neighbor in neighbors.items():
-            if (0 <= neighbor[0] < GRID_SIZE
-                and 0 <= neighbor[1] < GRID_SIZE
-                and neighbor not in self.environment.obstacles
-                and neighbor not in self.environment.no_fly_zones):
-                valid_neighbors[action] = neighbor
-        return valid_neighbors
+        return self.transition_models.get().neighbors(state)
 
     def choose_action(self, state):
         """Choose an action using an epsilon-greedy policy."""
@@ -67,17 +76,23 @@ class QLearningHyperopt:
             return None
         if random.uniform(0, 1) < self.epsilon:
             return random.choice(list(valid_neighbors.keys()))
-        return max(valid_neighbors.keys(), key=lambda action: self.q_table[state][action])
+        return self.q_table.best_action(state, list(valid_neighbors))
 
     def update_q_value(self, state, action, reward, next_state):
         """Update the Q-value for a state-action pair."""
-        next_valid_actions = self.get_neighbors(next_state).keys()
-        next_best_action = max(next_valid_actions, key=lambda a: self.q_table[next_state][a], default=None)
-        next_q_value = self.q_table[next_state][next_best_action] if next_best_action else 0
-        self.q_table[state][action] += self.alpha * (reward + self.gamma * next_q_value - self.q_table[state][action])
+        next_q_value = self.q_table.best_value(next_state, list(self.get_neighbors(next_state)))
+        self.q_table.update(state, action, reward + self.gamma * next_q_value, self.alpha)
 
-    def train(self):
-        """Train the Q-Learning agent."""
+    def train(self, trial=None, report_every=REPORT_EVERY):
+        """
+        Train the Q-Learning agent.
+        Args:
+            trial (optuna.Trial): Trial to report the mean reward of every block of episodes to;
+                raises optuna.TrialPruned when its pruner stops it.
+            report_every (int): Episodes per reported block.
+        Returns:
+            float: Average reward over all episodes.
+        """
         total_rewards = []
 
         for episode in range(self.training_episodes):
@@ -111,7 +126,7 @@ class QLearningHyperopt:
                     and not self.environment.is_carrying_package
                 ):
                     task_id = self.locations_manager.get_pick_up_points()[next_state]
-                    self.locations_manager.pick_up_points.pop(next_state)
+                    self.locations_manager.pick_up(next_state)
                     self.environment.is_carrying_package = True
                     self.environment.current_delivery = task_id
                     action_type = "pick-up"
@@ -122,7 +137,7 @@ class QLearningHyperopt:
                     and self.locations_manager.get_drop_off_points()[next_state] == self.environment.current_delivery
                 ):
                     task_id = self.locations_manager.get_drop_off_points()[next_state]
-                    self.locations_manager.drop_off_points.pop(next_state)
+                    self.locations_manager.drop_off(next_state)
                     self.environment.is_carrying_package = False
                     self.environment.current_delivery = None
                     action_type = "drop-off"
@@ -156,6 +171,11 @@ class QLearningHyperopt:
             self.epsilon = max(self.min_epsilon, self.epsilon * self.epsilon_decay)
             total_rewards.append(total_reward)
 
+            if trial is not None and (episode + 1) % report_every == 0:
+                trial.report(sum(total_rewards[-report_every:]) / report_every, episode + 1)
+                if trial.should_prune():
+                    raise optuna.TrialPruned()
+
         return sum(total_rewards) / len(total_rewards)  # Average reward
 
 
@@ -173,23 +193,130 @@ def objective(trial):
         initial_epsilon=initial_epsilon,
         min_epsilon=min_epsilon,
         epsilon_decay=epsilon_decay,
-        training_episodes=2000
+        training_episodes=TRAINING_EPISODES
     )
 
-    average_reward = agent.train()
+    average_reward = agent.train(trial)
+    save_if_best(trial, agent.q_table, average_reward)
     return average_reward
 
 
+def save_if_best(trial, q_table, value):
+    """Keep the table of a trial that beats every trial finished so far."""
+    try:
+        best_value = trial.study.best_value
+    except ValueError:  # No trial has finished yet
+        best_value = float("-inf")
+    if value > best_value:
+        path = os.path.join(TRIAL_TABLE_DIR, f"trial_{trial.number}.qtable")
+        q_table.save(path)
+        trial.set_user_attr("q_table", path)
+
+
+def make_pruner(name):
+    """Pruner for the reported block rewards ("median", "hyperband" or "none")."""
+    if name == "median":
+        return optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=REPORT_EVERY * 3)
+    if name == "hyperband":
+        return optuna.pruners.HyperbandPruner(
+            min_resource=REPORT_EVERY, max_resource=TRAINING_EPISODES, reduction_factor=3)
+    if name == "none":
+        return optuna.pruners.NopPruner()
+    raise ValueError(f"Unknown pruner: {name}")
+
+
+def make_storage(path):
+    # SQLite serializes writers; wait for the lock instead of failing under parallel workers.
+    # Heartbeats let a resumed search fail and retry the trials an interrupted run left RUNNING.
+    if hasattr(optuna.storages, "RetryHeartbeatStaleTrialCallback"):  # Optuna >= 4.9 renamed the retry hook
+        retry = {"heartbeat_stale_trial_callback": optuna.storages.RetryHeartbeatStaleTrialCallback(MAX_TRIAL_RETRIES)}
+    else:
+        retry = {"failed_trial_callback": optuna.storages.RetryFailedTrialCallback(MAX_TRIAL_RETRIES)}
+    return optuna.storages.RDBStorage(
+        f"sqlite:///{path}",
+        engine_kwargs={"connect_args": {"timeout": 60}},
+        heartbeat_interval=HEARTBEAT_INTERVAL,
+        grace_period=HEARTBEAT_GRACE_PERIOD,
+        **retry,
+    )
+
+
+def _search_worker(storage_path, pruner, n_trials, seed):
+    """Worker process of run_search(): runs trials until the study holds n_trials finished ones."""
+    random.seed(seed)
+    study = optuna.load_study(
+        study_name=STUDY_NAME,
+        storage=make_storage(storage_path),
+        sampler=optuna.samplers.TPESampler(seed=seed),
+        pruner=make_pruner(pruner),
+    )
+    study.optimize(
+        objective,
+        callbacks=[optuna.study.MaxTrialsCallback(n_trials, states=(TrialState.COMPLETE, TrialState.PRUNED))],
+    )
+
+
+def run_search(n_trials=50, num_workers=None, pruner="median", storage_path=STORAGE_FILE, seed=None):
+    """
+    Search hyperparameters with parallel worker processes sharing one SQLite study.
+    Rerunning with the same storage resumes the study until it holds n_trials finished trials;
+    trials left running by an interrupted run are failed and retried once their heartbeat is stale.
+    Args:
+        n_trials (int): Finished (complete or pruned) trials the study should end with.
+        num_workers (int): Worker processes (defaults to the CPU count).
+        pruner (str): "median", "hyperband" or "none".
+        storage_path (str): SQLite file holding the study.
+        seed (int): Base seed of the workers' samplers and training RNGs, offset on resume.
+    Returns:
+        optuna.Study: The finished study.
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    os.makedirs(TRIAL_TABLE_DIR, exist_ok=True)
+    # Create the study (and its schema) once, before the workers open it
+    storage = make_storage(storage_path)
+    study = optuna.create_study(study_name=STUDY_NAME, storage=storage, direction="maximize", load_if_exists=True)
+    # Retry the trials an interrupted run left behind here: workers racing to fail them over
+    # SQLite can each succeed and queue the same retry twice
+    optuna.storages.fail_stale_trials(study)
+    # Offset by the trials already stored, so a resumed run does not replay the samples of the last one
+    offset = len(study.trials) * num_workers
+    storage.engine.dispose()  # Don't carry open SQLite connections into the forked workers
+    base_seed = (random.randrange(2 ** 31) if seed is None else seed) + offset
+    workers = [
+        multiprocessing.Process(target=_search_worker, args=(storage_path, pruner, n_trials, base_seed + i), daemon=True)
+        for i in range(num_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return optuna.load_study(study_name=STUDY_NAME, storage=make_storage(storage_path))
+
+
+def save_best(study):
+    """Write the best parameters and the best trial's Q-table as separate artifacts."""
+    best = study.best_trial
+    atomic_write_json(BEST_PARAMS_FILE, {"trial": best.number, "value": best.value, "params": best.params}, indent=2)
+    print(f"Best hyperparameters saved to {BEST_PARAMS_FILE}")
+    if "q_table" in best.user_attrs:
+        shutil.copyfile(best.user_attrs["q_table"], BEST_Q_TABLE_FILE)
+        print(f"Best Q-table saved to {BEST_Q_TABLE_FILE}")
+
+
 if __name__ == "__main__":
-    study = optuna.create_study(direction="maximize")
-    study.optimize(objective, n_trials=50)
+    parser = argparse.ArgumentParser(description="Search Q-learning hyperparameters with Optuna.")
+    parser.add_argument("--trials", type=int, default=50, help="Finished trials the study should hold.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--pruner", choices=("median", "hyperband", "none"), default="median")
+    parser.add_argument("--storage", default=STORAGE_FILE, help="SQLite file of the (resumable) study.")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    study = run_search(args.trials, args.workers, args.pruner, args.storage, args.seed)
 
     print("Best hyperparameters:")
     print(study.best_params)
     print(f"Best average reward: {study.best_value}")
-
-    # Save the best Q-table
-    with open(Q_TABLE_FILE, "wb") as f:
-        pickle.dump(study.best_params, f)
+    save_best(study)
 
     pygame.quit()
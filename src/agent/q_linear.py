@@ -0,0 +1,219 @@
+import json
+import os
+import numpy as np
+
+DAY_MINUTES = 24 * 60
+
+
+class TileFeatureEncoder:
+    def __init__(self, tilings=8, tile_width=4, tile_range=32, window_radius=3, time_buckets=12):
+        """
+        Sparse binary features of a drone state whose count does not depend on the grid size,
+        for linear Q-learning on large maps. A state activates:
+            - one tile per tiling of the offset to the current target (the nearest open pickup,
+              or the dropoff of the package being carried), clipped to +-tile_range; the
+              tilings are shifted against each other so nearby offsets share tiles
+            - every blocked cell of a (2 * window_radius + 1)^2 window around the drone, once
+              for the active zones and once for the next pattern's (cells off the grid count
+              as blocked)
+            - the number of steps until the zones next change, capped at time_buckets - 1
+            - whether a package is carried, and a bias feature
+        Args:
+            tilings (int): Offset tilings.
+            tile_width (int): Cells per tile side.
+            tile_range (int): Largest target offset told apart, per axis.
+            window_radius (int): Cells seen in each direction.
+            time_buckets (int): Steps-until-change values told apart.
+        """
+        self.tilings = tilings
+        self.tile_width = tile_width
+        self.tile_range = tile_range
+        self.window_radius = window_radius
+        self.time_buckets = time_buckets
+
+        self.tiles_per_axis = 2 * tile_range // tile_width + 2
+        self.window_side = 2 * window_radius + 1
+        sizes = [
+            tilings * self.tiles_per_axis ** 2,  # target offset tiles
+            self.window_side ** 2,  # active zones around the drone
+            self.window_side ** 2,  # next pattern's zones around the drone
+            time_buckets,
+            2,  # carrying
+            1,  # bias
+        ]
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        self.num_features = int(sum(sizes))
+        # Asymmetric (1, 3) displacement of the tilings, in fractions of a tile
+        shifts = np.arange(tilings) * tile_width / tilings
+        self._tile_shift_x = shifts
+        self._tile_shift_y = (3 * shifts) % tile_width
+        self._tile_base = self.offsets[0] + np.arange(tilings) * self.tiles_per_axis ** 2
+        self._windows = {}  # zone layout key -> padded blocked mask
+        self._steps_to_change = {}  # minute of the day -> time feature
+
+    def observe(self, environment, position):
+        """
+        State of the drone at `position` in the environment's current situation.
+        Returns:
+            tuple: (x, y, active feature indices); the position comes first like the tabular states.
+        """
+        x, y = position
+        target = self._target(environment, position)
+        dx = min(max(target[0] - x, -self.tile_range), self.tile_range) + self.tile_range
+        dy = min(max(target[1] - y, -self.tile_range), self.tile_range) + self.tile_range
+        tile_x = ((dx + self._tile_shift_x) // self.tile_width).astype(np.int64)
+        tile_y = ((dy + self._tile_shift_y) // self.tile_width).astype(np.int64)
+        side = self.window_side
+        current = self._window(environment, "current")[x:x + side, y:y + side]
+        upcoming = self._window(environment, "next")[x:x + side, y:y + side]
+        return (x, y, np.concatenate([
+            self._tile_base + tile_x * self.tiles_per_axis + tile_y,
+            self.offsets[1] + np.flatnonzero(current),
+            self.offsets[2] + np.flatnonzero(upcoming),
+            [
+                self.offsets[3] + self._time_feature(environment),
+                self.offsets[4] + int(environment.is_carrying_package),
+                self.offsets[5],
+            ],
+        ]))
+
+    def _target(self, environment, position):
+        """Cell the drone is heading for, or its own cell once nothing is left."""
+        locations = environment.locations_manager
+        if environment.is_carrying_package:
+            closest = locations.nearest_drop_off_points(position, 1, environment.current_delivery)
+        else:
+            closest = locations.nearest_pick_up_points(position)
+        return closest[0] if closest else position
+
+    def _window(self, environment, which):
+        """Blocked mask padded by window_radius (off-grid counts as blocked), cached per layout."""
+        if which == "current":
+            key = ("current", id(environment), environment.zone_epoch)
+        else:
+            slot = environment.get_zone_slot()
+            num_slots = len(environment.event_simulator.event_patterns) if environment.event_simulator else 0
+            key = ("next", id(environment), None if slot is None else (slot + 1) % num_slots)
+        if key not in self._windows:
+            if len(self._windows) > 64:
+                self._windows.clear()
+            if which == "current":
+                obstacle_mask, no_fly_mask = environment.get_zone_masks()
+            elif key[2] is None:
+                obstacle_mask = no_fly_mask = np.zeros((environment.grid_size, environment.grid_size), dtype=bool)
+            else:
+                obstacle_mask, no_fly_mask = environment.get_slot_zone_masks(key[2], apply_priority=False)
+            self._windows[key] = np.pad(obstacle_mask | no_fly_mask, self.window_radius, constant_values=True)
+        return self._windows[key]
+
+    def _time_feature(self, environment):
+        """Steps until the next zone change, capped at time_buckets - 1."""
+        now = environment.current_time
+        if now not in self._steps_to_change:
+            waits = [(change - now) % DAY_MINUTES for change in environment.get_zone_change_times()]
+            waits = [wait for wait in waits if wait > 0]
+            steps = -(-min(waits) // environment.time_step) - 1 if waits else self.time_buckets
+            self._steps_to_change[now] = min(max(steps, 0), self.time_buckets - 1)
+        return self._steps_to_change[now]
+
+    def describe(self, num_actions):
+        """One-line summary of the weights the encoder needs (fixed for any grid size)."""
+        megabytes = self.num_features * num_actions * np.dtype(np.float32).itemsize / 2 ** 20
+        return (f"{self.num_features} features ({self.tilings} target tilings, {self.window_side}x"
+                f"{self.window_side} zone windows, time, carrying) x {num_actions} actions, {megabytes:.2f} MiB")
+
+    def config(self):
+        """JSON-serializable description, stored with the weights."""
+        return {
+            "type": "tiles",
+            "tilings": self.tilings,
+            "tile_width": self.tile_width,
+            "tile_range": self.tile_range,
+            "window_radius": self.window_radius,
+            "time_buckets": self.time_buckets,
+        }
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config["tilings"], config["tile_width"], config["tile_range"],
+                   config["window_radius"], config["time_buckets"])
+
+
+class LinearQFunction:
+    def __init__(self, encoder, actions, weights=None):
+        """
+        Linear Q-function over sparse binary features: Q(s, a) is the sum of the weights of
+        the features active in s, in the column of a. Offers the QTable methods the trainer
+        loop uses, over states from TileFeatureEncoder.observe().
+        Args:
+            encoder (TileFeatureEncoder): Feature layout.
+            actions (list): Action names, one column each.
+            weights (np.ndarray): Optional existing (features x actions) weights.
+        """
+        self.encoder = encoder
+        self.actions = list(actions)
+        self.action_index = {action: i for i, action in enumerate(self.actions)}
+        if weights is None:
+            weights = np.zeros((encoder.num_features, len(self.actions)), dtype=np.float32)
+        self.weights = weights
+
+    @property
+    def nbytes(self):
+        """Memory taken by the weights."""
+        return self.weights.nbytes
+
+    def q_values(self, state):
+        """Q-values of every action in a state."""
+        return self.weights[state[2]].sum(axis=0)
+
+    def value(self, state, action):
+        """Q-value of one state-action pair."""
+        return float(self.q_values(state)[self.action_index[action]])
+
+    def best_action(self, state, actions):
+        """The action among `actions` with the highest Q-value (the first one on ties)."""
+        columns = [self.action_index[action] for action in actions]
+        return actions[int(np.argmax(self.q_values(state)[columns]))] if columns else None
+
+    def best_value(self, state, actions):
+        """The highest Q-value among `actions`, or 0 if there are none."""
+        columns = [self.action_index[action] for action in actions]
+        return float(self.q_values(state)[columns].max()) if columns else 0
+
+    def update(self, state, action, target, alpha):
+        """Semi-gradient step of Q(state, action) towards target, alpha shared by the active features."""
+        active, column = state[2], self.action_index[action]
+        error = target - self.weights[active, column].sum()
+        self.weights[active, column] += np.float32(alpha * error / len(active))
+
+    def update_batch(self, features, columns, targets, alpha):
+        """
+        Semi-gradient steps of many transitions at once, all measured against the current weights.
+        Args:
+            features (list): Active feature indices of each transition's state.
+            columns (np.ndarray): (N,) action columns.
+            targets (np.ndarray): (N,) TD targets.
+            alpha (float): Step size, shared by the active features of a state.
+        """
+        lengths = np.array([len(active) for active in features])
+        rows = np.repeat(np.arange(len(features)), lengths)
+        flat = np.concatenate(features)
+        flat_columns = np.asarray(columns)[rows]
+        q_values = np.bincount(rows, weights=self.weights[flat, flat_columns], minlength=len(features))
+        steps = alpha * (np.asarray(targets) - q_values) / lengths
+        np.add.at(self.weights, (flat, flat_columns), steps[rows].astype(np.float32))
+
+    def save(self, path):
+        """Write the weights and their feature layout atomically (NumPy .npz)."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, weights=self.weights, actions=np.array(self.actions),
+                     encoder=np.array(json.dumps(self.encoder.config())))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read weights written by save()."""
+        with np.load(path) as data:
+            encoder = TileFeatureEncoder.from_config(json.loads(str(data["encoder"])))
+            return cls(encoder, [str(action) for action in data["actions"]], data["weights"])
@@ -0,0 +1,144 @@
+import argparse
+import pygame
+import time
+import numpy as np
+from src.agent.q_linear import LinearQFunction, TileFeatureEncoder
+from src.agent.q_train_agent import GAMMA, QLearningTrainer
+from src.utils.map_generator import generate_map, load_map
+from src.utils.transition_model import ACTION_OFFSETS
+
+# Constants
+LARGE_GRID_SIZE = 256
+# Step size shared by the active features of a state
+LINEAR_ALPHA = 0.1
+# Transitions per batched weight update
+UPDATE_BATCH_SIZE = 32
+LINEAR_Q_FILE = "q_linear.npz"
+
+
+class LinearQTrainer(QLearningTrainer):
+    def __init__(self, map_data, batch_size=UPDATE_BATCH_SIZE, encoder=None):
+        """
+        Q-learning with a linear function over TileFeatureEncoder features instead of a table,
+        so memory stays fixed whatever the grid size. Runs QLearningTrainer's episode loop;
+        the TD updates are queued and applied batch_size at a time.
+        Args:
+            map_data (dict): Map from src.utils.map_generator (grid_size, event_patterns,
+                delivery_tasks).
+            batch_size (int): Transitions per weight update.
+            encoder (TileFeatureEncoder): Feature layout (default settings if omitted).
+        """
+        self.feature_encoder = encoder or TileFeatureEncoder()
+        super().__init__((), map_data["grid_size"], map_data["event_patterns"], map_data["delivery_tasks"])
+        self.batch_size = batch_size
+        self.pending = []  # (active features, action column, TD target) awaiting the next batch
+        self._blocked = None
+        self._blocked_epoch = None
+
+    def build_q_function(self, state_features):
+        """Linear Q-function over the tile features (state_features is unused)."""
+        return self.feature_encoder, LinearQFunction(self.feature_encoder, self.actions)
+
+    def get_neighbors(self, state):
+        """
+        Valid neighboring positions of a state, read straight off the zone masks: building
+        a full transition model per zone layout does not pay off on large grids.
+        """
+        if self._blocked_epoch != self.environment.zone_epoch:
+            obstacle_mask, no_fly_mask = self.environment.get_zone_masks()
+            self._blocked, self._blocked_epoch = obstacle_mask | no_fly_mask, self.environment.zone_epoch
+        x, y = state[:2]
+        size = self.environment.grid_size
+        neighbors = {}
+        for action in self.actions:
+            dx, dy = ACTION_OFFSETS[action]
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < size and 0 <= ny < size and not self._blocked[nx, ny]:
+                neighbors[action] = (nx, ny)
+        return neighbors
+
+    def get_goal(self):
+        """
+        The features' target: the base lookup keys the position-keyed dropoffs by task id and
+        so finds no goal while carrying, which leaves long carries on large maps unshaped.
+        """
+        if self.environment.is_carrying_package:
+            closest = self.locations_manager.nearest_drop_off_points(
+                self.environment.drone_pos, 1, self.environment.current_delivery)
+            return closest[0] if closest else None
+        return self.get_closest_pick_up_point()
+
+    def update_q_value(self, state, action, reward, next_state):
+        """Queue the TD update of a transition, bootstrapped from the current weights."""
+        next_q_value = self.q_table.best_value(next_state, list(self.get_neighbors(next_state)))
+        self.pending.append((state[2], self.q_table.action_index[action], reward + GAMMA * next_q_value))
+        if len(self.pending) >= self.batch_size:
+            self.flush_updates()
+
+    def flush_updates(self):
+        """Apply the queued updates as one vectorized batch."""
+        if self.pending:
+            features, columns, targets = zip(*self.pending)
+            self.q_table.update_batch(list(features), np.array(columns), np.array(targets), LINEAR_ALPHA)
+            self.pending = []
+
+    def train_batched(self, *args, **kwargs):
+        raise TypeError("LinearQTrainer has no dense Q-table to train in lock-step; use train()")
+
+    def train_dyna(self, *args, **kwargs):
+        raise TypeError("LinearQTrainer has no dense Q-table to replay into; use train()")
+
+    def train_parallel(self, *args, **kwargs):
+        raise TypeError("LinearQTrainer has no dense Q-table to share between workers; use train()")
+
+    def run_episode(self, learn=True, max_steps=None):
+        result = super().run_episode(learn, max_steps)
+        self.flush_updates()
+        return result
+
+    def train(self, max_episode_steps=None, report_every=100):
+        """
+        Train the linear agent and save its weights to LINEAR_Q_FILE.
+        Args:
+            max_episode_steps (int): Move cap per episode (defaults to 4 grid widths per task).
+            report_every (int): Episodes per progress line.
+        Returns:
+            list: (total reward, delivered, moves) of every episode.
+        """
+        tasks = max(len(self.locations_manager.delivery_tasks), 1)
+        max_episode_steps = max_episode_steps or 4 * self.environment.grid_size * tasks
+        grid_size = self.environment.grid_size
+        print(f"Linear Q on a {grid_size}x{grid_size} grid: {self.encoder.describe(len(self.actions))}")
+        history = []
+        steps = 0
+        start_time = time.perf_counter()
+        for episode in range(self.training_episodes):
+            history.append(self.run_episode(max_steps=max_episode_steps))
+            steps += history[-1][2]
+            if (episode + 1) % report_every == 0 or episode + 1 == self.training_episodes:
+                recent = history[-report_every:]
+                elapsed = time.perf_counter() - start_time
+                print(f"Episode {episode + 1}/{self.training_episodes}: "
+                      f"Mean Reward: {sum(r for r, _, _ in recent) / len(recent):.1f}, "
+                      f"Delivered: {sum(d for _, d, _ in recent) / len(recent):.0%}, "
+                      f"{steps / elapsed:.0f} steps/s")
+
+        self.q_table.save(LINEAR_Q_FILE)
+        print(f"Linear Q weights saved to {LINEAR_Q_FILE}")
+        return history
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the linear Q-learning agent on a generated map.")
+    parser.add_argument("--map", default=None, help="Map saved by src.utils.map_generator (default: generate one).")
+    parser.add_argument("--grid-size", type=int, default=LARGE_GRID_SIZE, help="Cells per side of a generated map.")
+    parser.add_argument("--tasks", type=int, default=8, help="Delivery tasks of a generated map.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of a generated map.")
+    parser.add_argument("--episodes", type=int, default=1000, help="Training episodes.")
+    args = parser.parse_args()
+
+    map_data = load_map(args.map) if args.map else generate_map(args.grid_size, args.tasks, seed=args.seed)
+    trainer = LinearQTrainer(map_data)
+    trainer.training_episodes = args.episodes
+    trainer.train()
+    pygame.quit()
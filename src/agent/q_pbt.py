@@ -0,0 +1,196 @@
+import argparse
+import math
+import multiprocessing
+import os
+import pygame
+import random
+import numpy as np
+from multiprocessing import shared_memory
+from src.agent.q_hyperopt import QLearningHyperopt
+from src.agent.q_table import QTable
+from src.utils.atomic_io import atomic_write_json
+
+# Constants
+# Search space of the population (the ranges q_hyperopt's objective samples from)
+PARAM_RANGES = {
+    "alpha": (0.001, 0.1),
+    "gamma": (0.5, 0.99),
+    "initial_epsilon": (0.1, 1.0),
+    "min_epsilon": (0.01, 0.1),
+    "epsilon_decay": (0.95, 0.9999),
+}
+LOG_SCALE_PARAMS = ("alpha",)
+# initial_epsilon only matters at the start; afterwards each member's live epsilon is inherited
+EXPLORED_PARAMS = ("alpha", "gamma", "min_epsilon", "epsilon_decay")
+PERTURB_FACTORS = (0.8, 1.2)
+PBT_Q_TABLE_FILE = "q_pbt.qtable"
+PBT_PARAMS_FILE = "q_pbt_params.json"
+
+# Per-process state of the pool workers
+_worker = {}
+
+
+def _init_worker(shm_name, shape):
+    """Attach a pool worker to the population's shared Q-tables."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker["shm"] = shm
+    _worker["tables"] = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+    _worker["agent"] = None
+
+
+def _train_member(member, params, epsilon, episodes, seed):
+    """
+    Train one member for a generation, in place on its slice of the shared tables.
+    Returns:
+        tuple: (member, average reward, epsilon after the generation).
+    """
+    random.seed(seed)
+    agent = _worker["agent"]
+    if agent is None:  # The environment is built once per worker and reused by every member
+        agent = _worker["agent"] = QLearningHyperopt(**params)
+    for name, value in params.items():
+        setattr(agent, name, value)
+    agent.training_episodes = episodes
+    agent.epsilon = epsilon
+    agent.q_table = QTable(agent.q_table.encoder, agent.actions, _worker["tables"][member])
+    return member, agent.train(), agent.epsilon
+
+
+def sample_params(rng):
+    """Draw hyperparameters uniformly from PARAM_RANGES (log-uniformly for LOG_SCALE_PARAMS)."""
+    params = {}
+    for name, (low, high) in PARAM_RANGES.items():
+        if name in LOG_SCALE_PARAMS:
+            params[name] = math.exp(rng.uniform(math.log(low), math.log(high)))
+        else:
+            params[name] = rng.uniform(low, high)
+    return params
+
+
+def perturb_params(params, rng):
+    """Scale each explored hyperparameter by a random PERTURB_FACTORS entry, within PARAM_RANGES."""
+    params = dict(params)
+    for name in EXPLORED_PARAMS:
+        low, high = PARAM_RANGES[name]
+        params[name] = min(high, max(low, params[name] * rng.choice(PERTURB_FACTORS)))
+    return params
+
+
+class PopulationTrainer:
+    def __init__(self, population_size=8, seed=None):
+        """
+        Population-based training: members with different hyperparameters train in parallel,
+        and after every generation the weakest copy the Q-table and epsilon of a strong member
+        (exploit) and perturb its hyperparameters (explore).
+        Args:
+            population_size (int): Number of members.
+            seed (int): Seed of the initial hyperparameters, the exploit/explore choices and
+                the members' training RNGs.
+        """
+        self.rng = random.Random(seed)
+        self.seed = self.rng.randrange(2 ** 31)
+        template = QLearningHyperopt(**sample_params(self.rng))
+        self.encoder = template.q_table.encoder
+        self.actions = template.actions
+        self.members = []
+        for _ in range(population_size):
+            params = sample_params(self.rng)
+            self.members.append({"params": params, "epsilon": params["initial_epsilon"], "score": None})
+        self.history = []
+
+    def train(self, generations=20, episodes_per_generation=100, num_workers=None, exploit_fraction=0.25):
+        """
+        Train the population and save the best member's table and hyperparameters.
+        Args:
+            generations (int): Exploit/explore rounds.
+            episodes_per_generation (int): Episodes each member trains between rounds.
+            num_workers (int): Worker processes (defaults to the CPU count).
+            exploit_fraction (float): Share of the population replaced each round, and share
+                of top members they copy from.
+        Returns:
+            dict: The best member.
+        """
+        if generations < 1:
+            raise ValueError(f"PBT needs at least one generation, got {generations}")
+        num_workers = num_workers or os.cpu_count() or 1
+        population_size = len(self.members)
+        shape = (population_size, self.encoder.num_states, len(self.actions))
+        print(f"Population of {population_size}, {generations} generations of {episodes_per_generation} "
+              f"episodes, {num_workers} workers")
+
+        shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 4)
+        tables = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        tables[:] = 0.0
+        # Closed and joined rather than terminated: pygame's SDL handles SIGTERM in the workers
+        pool = multiprocessing.Pool(num_workers, initializer=_init_worker, initargs=(shm.name, shape))
+        try:
+            for generation in range(generations):
+                jobs = [
+                    (i, member["params"], member["epsilon"], episodes_per_generation,
+                     self.seed + generation * population_size + i)
+                    for i, member in enumerate(self.members)
+                ]
+                for i, score, epsilon in pool.starmap(_train_member, jobs):
+                    self.members[i]["score"] = score
+                    self.members[i]["epsilon"] = epsilon
+                scores = [member["score"] for member in self.members]
+                self.history.append({"best": max(scores), "mean": sum(scores) / len(scores)})
+                print(f"Generation {generation + 1}/{generations}: Best Reward: {max(scores):.1f}, "
+                      f"Mean Reward: {sum(scores) / len(scores):.1f}")
+                if generation < generations - 1:
+                    self.exploit_and_explore(tables, exploit_fraction)
+            best = max(range(population_size), key=lambda i: self.members[i]["score"])
+            QTable(self.encoder, self.actions, tables[best].copy()).save(PBT_Q_TABLE_FILE)
+        finally:
+            pool.close()
+            pool.join()
+            del tables
+            shm.close()
+            shm.unlink()
+
+        print(f"Best Q-table saved to {PBT_Q_TABLE_FILE}")
+        self.save_params(best)
+        return self.members[best]
+
+    def exploit_and_explore(self, tables, exploit_fraction):
+        """Replace the weakest members with perturbed copies of randomly chosen strong ones."""
+        ranked = sorted(range(len(self.members)), key=lambda i: self.members[i]["score"])
+        count = max(1, int(len(ranked) * exploit_fraction))
+        losers, winners = ranked[:count], ranked[-count:]
+        for loser in losers:
+            winner = self.rng.choice(winners)
+            tables[loser] = tables[winner]
+            self.members[loser] = {
+                "params": perturb_params(self.members[winner]["params"], self.rng),
+                "epsilon": self.members[winner]["epsilon"],
+                "score": self.members[winner]["score"],
+            }
+
+    def save_params(self, best):
+        """Write the best member's hyperparameters and the population's progress."""
+        member = self.members[best]
+        atomic_write_json(PBT_PARAMS_FILE, {
+            "member": best,
+            "score": member["score"],
+            "epsilon": member["epsilon"],
+            "params": member["params"],
+            "history": self.history,
+        }, indent=2)
+        print(f"Best hyperparameters saved to {PBT_PARAMS_FILE}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Population-based training of the Q-learning agent.")
+    parser.add_argument("--population", type=int, default=8, help="Number of members.")
+    parser.add_argument("--generations", type=int, default=20, help="Exploit/explore rounds.")
+    parser.add_argument("--episodes", type=int, default=100, help="Episodes per member and generation.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    if args.generations < 1:
+        parser.error("--generations must be at least 1")
+
+    trainer = PopulationTrainer(args.population, args.seed)
+    best_member = trainer.train(args.generations, args.episodes, args.workers)
+    print(f"Best hyperparameters: {best_member['params']}")
+    pygame.quit()
@@ -0,0 +1,292 @@
+import json
+import os
+import pickle
+import struct
+import numpy as np
+
+# On-disk layout: MAGIC, uint32 format version, uint32 header length, JSON header, padding to
+# DATA_ALIGNMENT, then the float32 values in C order (so the values can be memory-mapped)
+MAGIC = b"QTABLE\x00\x00"
+FORMAT_VERSION = 1
+DATA_ALIGNMENT = 64
+
+
+class PositionEncoder:
+    def __init__(self, grid_size):
+        """
+        Map drone positions to dense row indices (x * grid_size + y).
+        Args:
+            grid_size (int): Side length of the grid.
+        """
+        self.grid_size = grid_size
+        self.num_states = grid_size * grid_size
+
+    def encode(self, state):
+        """Row index of an (x, y) state."""
+        return state[0] * self.grid_size + state[1]
+
+    def decode(self, index):
+        """(x, y) state of a row index."""
+        return divmod(int(index), self.grid_size)
+
+    def observe(self, environment, position):
+        """The state of the drone at position: just the position."""
+        return tuple(position)
+
+    def encode_batch(self, xs, ys, features):
+        """Row indices of many positions at once (features are ignored)."""
+        return np.asarray(xs, dtype=np.int64) * self.grid_size + ys
+
+    def config(self):
+        """JSON-serializable description, stored in the file header."""
+        return {"type": "position", "grid_size": self.grid_size}
+
+    @classmethod
+    def from_config(cls, config):
+        """Rebuild an encoder from config()."""
+        return cls(config["grid_size"])
+
+
+class StateEncoder:
+    def __init__(self, grid_size, features=(), task_ids=(), num_slots=1):
+        """
+        Pack the drone position and optional task/time features into one dense row index.
+        States are tuples (x, y, feature values...) in the order of `features`.
+        Args:
+            grid_size (int): Side length of the grid.
+            features (tuple): Any of "carrying" (0/1), "delivery" (current task, 0 for none),
+                "remaining" (bitmask of tasks not picked up yet), "next_target" (task of the
+                next target, 0 for none) and "time_slot" (index of the zone pattern).
+            task_ids (list): IDs of the delivery tasks, in the order their bits/indices use.
+            num_slots (int): Number of zone patterns in a day.
+        """
+        self.grid_size = grid_size
+        self.features = tuple(features)
+        self.task_ids = list(task_ids)
+        self.task_index = {task_id: i for i, task_id in enumerate(self.task_ids)}
+        self.num_slots = num_slots
+        sizes = {
+            "carrying": 2,
+            "delivery": len(self.task_ids) + 1,
+            "remaining": 2 ** len(self.task_ids),
+            "next_target": len(self.task_ids) + 1,
+            "time_slot": num_slots,
+        }
+        unknown = [feature for feature in self.features if feature not in sizes]
+        if unknown:
+            raise ValueError(f"Unknown state features {unknown}, expected some of {sorted(sizes)}")
+        self.radices = [grid_size, grid_size] + [sizes[feature] for feature in self.features]
+        self.num_states = int(np.prod(self.radices, dtype=np.int64))
+
+    def observe(self, environment, position):
+        """The state tuple of the drone at position, read from the environment."""
+        if not self.features:
+            return tuple(position)
+        locations_manager = environment.locations_manager
+        open_tasks = set(locations_manager.get_pick_up_points().values())
+        values = []
+        for feature in self.features:
+            if feature == "carrying":
+                values.append(int(environment.is_carrying_package))
+            elif feature == "delivery":
+                values.append(self.task_index.get(environment.current_delivery, -1) + 1)
+            elif feature == "remaining":
+                values.append(sum(1 << i for i, task_id in enumerate(self.task_ids) if task_id in open_tasks))
+            elif feature == "next_target":
+                task_id = environment.current_delivery
+                if not environment.is_carrying_package:
+                    nearest = locations_manager.nearest_pick_up_points(position)
+                    task_id = locations_manager.get_pick_up_points()[nearest[0]] if nearest else None
+                values.append(self.task_index.get(task_id, -1) + 1)
+            elif feature == "time_slot":
+                slot = environment.get_zone_slot()
+                values.append(slot if slot is not None else 0)
+        return tuple(position) + tuple(values)
+
+    def encode(self, state):
+        """Row index of a state tuple (mixed-radix packing)."""
+        index = 0
+        for value, radix in zip(state, self.radices):
+            index = index * radix + value
+        return index
+
+    def encode_batch(self, xs, ys, features):
+        """
+        Row indices of many states at once.
+        Args:
+            xs (np.ndarray): (N,) x coordinates.
+            ys (np.ndarray): (N,) y coordinates.
+            features (dict): Feature name -> (N,) values, for every enabled feature.
+        """
+        index = np.asarray(xs, dtype=np.int64) * self.grid_size + ys
+        for feature, radix in zip(self.features, self.radices[2:]):
+            index = index * radix + features[feature]
+        return index
+
+    def decode(self, index):
+        """State tuple of a row index."""
+        values = []
+        for radix in reversed(self.radices):
+            index, value = divmod(int(index), radix)
+            values.append(value)
+        return tuple(reversed(values))
+
+    def describe(self, num_actions):
+        """One-line summary of the table size an encoder needs, for sizing runs."""
+        megabytes = self.num_states * num_actions * np.dtype(np.float32).itemsize / 2 ** 20
+        features = ", ".join(("position",) + self.features)
+        return f"{self.num_states} states ({features}) x {num_actions} actions, {megabytes:.1f} MiB"
+
+    def config(self):
+        """JSON-serializable description, stored in the file header."""
+        return {
+            "type": "state",
+            "grid_size": self.grid_size,
+            "features": list(self.features),
+            "task_ids": self.task_ids,
+            "num_slots": self.num_slots,
+        }
+
+    @classmethod
+    def from_config(cls, config):
+        """Rebuild an encoder from config()."""
+        return cls(config["grid_size"], config["features"], config["task_ids"], config["num_slots"])
+
+
+def encoder_from_config(config):
+    """Rebuild whichever encoder wrote a file header."""
+    if config["type"] == "position":
+        return PositionEncoder.from_config(config)
+    return StateEncoder.from_config(config)
+
+
+class QTable:
+    def __init__(self, encoder, actions, values=None):
+        """
+        Dense (states x actions) float32 Q-table; unseen states read as 0, like the old
+        defaultdict table.
+        Args:
+            encoder: Maps states to row indices (PositionEncoder or StateEncoder).
+            actions (list): Action names, one column each.
+            values (np.ndarray): Optional existing (states x actions) values.
+        """
+        self.encoder = encoder
+        self.actions = list(actions)
+        self.action_index = {action: i for i, action in enumerate(self.actions)}
+        if values is None:
+            values = np.zeros((encoder.num_states, len(self.actions)), dtype=np.float32)
+        elif values.shape != (encoder.num_states, len(self.actions)):
+            raise ValueError(
+                f"Q-values of shape {values.shape} do not fit {encoder.num_states} states x {len(self.actions)} actions")
+        self.values = values
+        self.dirty = None  # rows changed since the last checkpoint, once tracked
+
+    def track_dirty(self):
+        """Start recording which rows change (for incremental checkpoints)."""
+        if self.dirty is None:
+            self.dirty = np.zeros(len(self.values), dtype=bool)
+
+    def mark_dirty(self, indices):
+        """Record rows changed outside update()."""
+        if self.dirty is not None:
+            self.dirty[indices] = True
+
+    @property
+    def nbytes(self):
+        """Memory taken by the values."""
+        return self.values.nbytes
+
+    def value(self, state, action):
+        """Q-value of one state-action pair."""
+        return float(self.values[self.encoder.encode(state), self.action_index[action]])
+
+    def best_action(self, state, actions):
+        """The action among `actions` with the highest Q-value (the first one on ties)."""
+        row = self.values[self.encoder.encode(state)]
+        columns = [self.action_index[action] for action in actions]
+        return actions[int(np.argmax(row[columns]))] if columns else None
+
+    def best_value(self, state, actions):
+        """The highest Q-value among `actions`, or 0 if there are none."""
+        columns = [self.action_index[action] for action in actions]
+        return float(self.values[self.encoder.encode(state), columns].max()) if columns else 0
+
+    def update(self, state, action, target, alpha):
+        """Move Q(state, action) a step of size alpha towards target."""
+        index, column = self.encoder.encode(state), self.action_index[action]
+        self.values[index, column] += alpha * (target - self.values[index, column])
+        if self.dirty is not None:
+            self.dirty[index] = True
+
+    def greedy(self, indices, valid):
+        """
+        Greedy action columns for many states at once.
+        Args:
+            indices (np.ndarray): (N,) row indices.
+            valid (np.ndarray): (N x actions) bool mask of the actions available.
+        Returns:
+            np.ndarray: (N,) column indices, -1 where no action is available.
+        """
+        masked = np.where(valid, self.values[indices], -np.inf)
+        return np.where(valid.any(axis=1), masked.argmax(axis=1), -1)
+
+    def save(self, path):
+        """Write the table atomically in the versioned binary format."""
+        header = json.dumps({
+            "version": FORMAT_VERSION,
+            "actions": self.actions,
+            "encoder": self.encoder.config(),
+            "shape": list(self.values.shape),
+            "dtype": "float32",
+        }).encode("utf-8")
+        prefix = len(MAGIC) + 8 + len(header)
+        padding = -prefix % DATA_ALIGNMENT
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<II", FORMAT_VERSION, len(header)))
+            f.write(header)
+            f.write(b"\x00" * padding)
+            f.write(np.ascontiguousarray(self.values, dtype=np.float32).tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap=False, grid_size=None, writable=False):
+        """
+        Read a table written by save(), or a legacy pickled {state: {action: value}} table.
+        Args:
+            path (str): File to read.
+            mmap (bool): Memory-map the values (copy-on-write) instead of reading them.
+            grid_size (int): Grid size of a legacy table (inferred from its states if omitted).
+            writable (bool): With mmap, write changes through to the file (flush() to sync).
+        """
+        with open(path, "rb") as f:
+            magic = f.read(len(MAGIC))
+            if magic != MAGIC:
+                return cls.load_legacy(path, grid_size)
+            version, header_length = struct.unpack("<II", f.read(8))
+            if version > FORMAT_VERSION:
+                raise ValueError(f"Q-table format version {version} is newer than supported ({FORMAT_VERSION})")
+            header = json.loads(f.read(header_length).decode("utf-8"))
+        offset = len(MAGIC) + 8 + header_length
+        offset += -offset % DATA_ALIGNMENT
+        shape = tuple(header["shape"])
+        if mmap:
+            values = np.memmap(path, dtype=np.float32, mode="r+" if writable else "c", offset=offset, shape=shape)
+        else:
+            values = np.fromfile(path, dtype=np.float32, offset=offset).reshape(shape)
+        return cls(encoder_from_config(header["encoder"]), header["actions"], values)
+
+    @classmethod
+    def load_legacy(cls, path, grid_size=None, actions=("UP", "DOWN", "LEFT", "RIGHT")):
+        """Convert a pickled {(x, y): {action: value}} table."""
+        with open(path, "rb") as f:
+            legacy = pickle.load(f)
+        if grid_size is None:
+            grid_size = max((max(state) for state in legacy), default=-1) + 1
+        table = cls(PositionEncoder(grid_size), actions)
+        for state, action_values in legacy.items():
+            for action, value in action_values.items():
+                if action in table.action_index:
+                    table.values[table.encoder.encode(state), table.action_index[action]] = value
+        return table
@@ -1,10 +1,11 @@
 import pygame
-import pickle
 import os
 from src.simulation.environment import Environment
 from src.simulation.event_simulator import EventSimulator
 from src.simulation.locations_manager import LocationsManager
 from src.utils.reward_function import RewardFunction
+from src.utils.transition_model import TransitionModelCache
+from src.agent.q_table import QTable
 from src.simulation.render import Renderer
 import random
 
@@ -14,7 +15,8 @@ pygame.init()
 WINDOW_SIZE = 600
 GRID_SIZE = 20
 CELL_SIZE = WINDOW_SIZE // GRID_SIZE
-Q_TABLE_FILE = "q_table.pkl"
+Q_TABLE_FILE = "q_table.qtable"
+LEGACY_Q_TABLE_FILE = "q_table.pkl"
 COLORS = {
     "WHITE": (255, 255, 255),
     "BLACK": (0, 0, 0),
@@ -40,36 +42,37 @@ class QLearningTester:
 
         self.reward_function = RewardFunction()
         self.renderer = Renderer(grid_size=GRID_SIZE, cell_size=CELL_SIZE, colors=COLORS, window_size=WINDOW_SIZE)
+        self.transition_models = TransitionModelCache(self.environment, ["UP", "DOWN", "LEFT", "RIGHT"], block_zones=True)
 
-        # Load the Q-table from a file
+        # Load the Q-table from a file, falling back to the legacy pickle
         q_table_path = os.path.join(os.path.dirname(__file__), "../agent", os.path.basename(Q_TABLE_FILE))
-        with open(q_table_path, "rb") as f:
-            self.q_table = pickle.load(f)
+        if not os.path.exists(q_table_path):
+            q_table_path = os.path.join(os.path.dirname(__file__), "../agent", os.path.basename(LEGACY_Q_TABLE_FILE))
+        self.q_table = QTable.load(q_table_path, mmap=True, grid_size=GRID_SIZE)
+        print(f"Loaded Q-table: {self.q_table.encoder.num_states} states, {self.q_table.nbytes / 2 ** 20:.1f} MiB")
 
     def choose_action(self, state, last_action=None):
         """Choose the best action based on the Q-table."""
         valid_neighbors = self.get_neighbors(state)
         if not valid_neighbors:
             return last_action  # Continue in the last valid direction
-        return max(valid_neighbors.keys(), key=lambda action: self.q_table[state][action])
+        observation = self.q_table.encoder.observe(self.environment, state)
+        return self.q_table.best_action(observation, list(valid_neighbors))
 
     def get_neighbors(self, state):
         """Determine valid neighboring states."""
-        x, y = state
-        neighbors = {
-            "UP": (x, y - 1),
-            "DOWN": (x, y + 1),
-            "LEFT": (x - 1, y),
-            "RIGHT": (x + 1, y)
-        }
-        valid_neighbors = {}
-        for action, neighbor in neighbors.items():
-            if (0 <= neighbor[0] < GRID_SIZE
-                and 0 <= neighbor[1] < GRID_SIZE
-                and neighbor not in self.environment.obstacles
-                and neighbor not in self.environment.no_fly_zones):
-                valid_neighbors[action] = neighbor
-        return valid_neighbors
+        return self.transition_models.get().neighbors(state)
+
+    def has_reachable_target(self, state):
+        """Whether the drone's next target (drop-off if carrying, else any pick-up) is ever reachable."""
+        if self.environment.is_carrying_package:
+            targets = [
+                point for point, task_id in self.locations_manager.get_drop_off_points().items()
+                if task_id == self.environment.current_delivery
+            ]
+        else:
+            targets = list(self.locations_manager.get_pick_up_points())
+        return any(self.environment.next_reachable_time(state, target) is not None for target in targets)
 
     def run(self):
         """Run the Q-Learning agent in the environment."""
@@ -83,6 +86,10 @@ class QLearningTester:
         last_action = random.choice(["UP", "DOWN", "LEFT", "RIGHT"])  # Default starting direction
 
         while self.locations_manager.get_pick_up_points() or self.environment.is_carrying_package:
+            if not self.has_reachable_target(state):
+                print("No remaining target can be reached at any time of day, stopping.")
+                break
+
             valid_neighbors = self.get_neighbors(state)
 
             if not valid_neighbors:
@@ -102,7 +109,7 @@ class QLearningTester:
                 and not self.environment.is_carrying_package
             ):
                 task_id = self.locations_manager.get_pick_up_points()[next_state]
-                self.locations_manager.pick_up_points.pop(next_state)
+                self.locations_manager.pick_up(next_state)
                 self.environment.is_carrying_package = True
                 self.environment.current_delivery = task_id
                 action_type = "pick-up"
@@ -112,7 +119,7 @@ class QLearningTester:
                 and self.locations_manager.get_drop_off_points()[next_state] == self.environment.current_delivery
             ):
                 task_id = self.locations_manager.get_drop_off_points()[next_state]
-                self.locations_manager.drop_off_points.pop(next_state)
+                self.locations_manager.drop_off(next_state)
                 self.environment.is_carrying_package = False
                 self.environment.current_delivery = None
                 action_type = "drop-off"
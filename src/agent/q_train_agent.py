@@ -1,11 +1,21 @@
+import argparse
+import multiprocessing
+import os
 import pygame
+import queue
 import random
-import pickle
-from collections import defaultdict
+import time
+import numpy as np
+from multiprocessing import shared_memory
 from src.simulation.environment import Environment
 from src.simulation.event_simulator import EventSimulator
 from src.simulation.locations_manager import LocationsManager
+from src.simulation.vector_environment import VectorEnvironment
 from src.utils.reward_function import RewardFunction
+from src.utils.transition_model import TransitionModelCache
+from src.agent.checkpoint import CheckpointWriter
+from src.agent.q_table import QTable, StateEncoder
+from src.agent.replay_buffer import ReplayBuffer, TabularModel
 
 pygame.init()
 
@@ -20,42 +30,100 @@ GAMMA = 0.7090138948652172
 INITIAL_EPSILON = 0.8232899215037156
 MIN_EPSILON = 0.016014465144631326
 EPSILON_DECAY = 0.9994591930101796
-Q_TABLE_FILE = "q_table.pkl"
+Q_TABLE_FILE = "q_table.qtable"
+# State features besides the position (see StateEncoder)
+STATE_FEATURES = ("carrying", "delivery", "remaining")
+# Move cap of the parent's greedy evaluation episodes (a greedy policy can loop forever)
+EVAL_MAX_STEPS = 1000
+# Default move cap of train_batched() episodes, so a few wandering lanes cannot keep the
+# batch running nearly empty at the end of training
+BATCHED_MAX_EPISODE_STEPS = 1000
+
+
+def _hogwild_worker(shm_name, shape, trainer_args, epsilon, episode_counter, total_episodes, results, seed):
+    """
+    Worker process of QLearningTrainer.train_parallel(): runs its own environment and updates
+    the shared Q-table in place, without locks. `trainer_args` rebuild the parent's trainer
+    (state features and map), so the table rows mean the same in every process. `epsilon` is
+    shared by every worker and guarded by the episode counter's lock.
+    """
+    random.seed(seed)
+    trainer = QLearningTrainer(*trainer_args)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        trainer.q_table = QTable(trainer.encoder, trainer.actions, np.ndarray(shape, dtype=np.float32, buffer=shm.buf))
+        while True:
+            # Only the episode counter and epsilon are locked; the table updates race, Hogwild-style
+            with episode_counter.get_lock():
+                if episode_counter.value >= total_episodes:
+                    break
+                episode_counter.value += 1
+                trainer.epsilon = epsilon.value
+            total_reward, _, steps = trainer.run_episode()
+            # One decay of the shared epsilon per finished episode, the same schedule as train()
+            with episode_counter.get_lock():
+                trainer.epsilon = epsilon.value
+                trainer.decay_epsilon(total_reward)
+                epsilon.value = trainer.epsilon
+            results.put((total_reward, steps))
+    finally:
+        trainer.q_table = None
+        shm.close()
+
 
 class QLearningTrainer:
-    def __init__(self):
-        """Initialize the Q-Learning training environment."""
-        self.environment = Environment(grid_size=GRID_SIZE, cell_size=CELL_SIZE)
-        self.event_simulator = EventSimulator(grid_size=GRID_SIZE, config_path="src/configs/event_patterns.json")
+    def __init__(self, state_features=STATE_FEATURES, grid_size=GRID_SIZE, event_patterns=None, delivery_tasks=None):
+        """
+        Initialize the Q-Learning training environment.
+        Args:
+            state_features (tuple): Features the Q-table is keyed on besides the position.
+            grid_size (int): Cells per side.
+            event_patterns (list): In-memory event patterns (e.g. a generated map) instead of
+                the config file.
+            delivery_tasks (list): In-memory delivery tasks instead of the config file.
+        """
+        self.environment = Environment(grid_size=grid_size, cell_size=max(WINDOW_SIZE // grid_size, 1))
+        self.event_simulator = EventSimulator(
+            grid_size=grid_size, config_path="src/configs/event_patterns.json", event_patterns=event_patterns)
         self.environment.set_event_simulator(self.event_simulator)
 
-        self.locations_manager = LocationsManager(config_path="src/configs/pick_up_drop_off_config.json")
+        self.locations_manager = LocationsManager(
+            config_path="src/configs/pick_up_drop_off_config.json", delivery_tasks=delivery_tasks)
         self.environment.set_locations_manager(self.locations_manager)
 
         self.reward_function = RewardFunction()
 
-        self.q_table = defaultdict(lambda: defaultdict(float))  # Q-table
         self.actions = ["UP", "DOWN", "LEFT", "RIGHT"]
+        self.encoder, self.q_table = self.build_q_function(state_features)
+        self.transition_models = TransitionModelCache(self.environment, self.actions, block_zones=True)
         self.training_episodes = 10000
         self.epsilon = INITIAL_EPSILON
+        # Dyna-Q state, only set while train_dyna() runs
+        self.replay = None
+        self.model = None
+        self.replay_updates = 0
+        self.planning_updates = 0
+        self.plan_every = 1
+        self.pending = []  # real transitions not yet recorded in the replay buffer and model
+        self.rng = None
+
+    def build_q_function(self, state_features):
+        """
+        Create the state encoder and the Q-function learned over it.
+        Returns:
+            tuple: (encoder, Q-function); a dense QTable here.
+        """
+        encoder = StateEncoder(
+            self.environment.grid_size,
+            state_features,
+            task_ids=[task["id"] for task in self.locations_manager.delivery_tasks],
+            num_slots=max(len(self.event_simulator.event_patterns), 1),
+        )
+        return encoder, QTable(encoder, self.actions)
 
     def get_neighbors(self, state):
-        """Determine valid neighboring states."""
-        x, y = state
-        neighbors = {
-            "UP": (x, y - 1),
-            "DOWN": (x, y + 1),
-            "LEFT": (x - 1, y),
-            "RIGHT": (x + 1, y)
-        }
-        valid_neighbors = {}
-        for action, neighbor in neighbors.items():
-            if (0 <= neighbor[0] < GRID_SIZE
-                and 0 <= neighbor[1] < GRID_SIZE
-                and neighbor not in self.environment.obstacles
-                and neighbor not in self.environment.no_fly_zones):
-                valid_neighbors[action] = neighbor
-        return valid_neighbors
+        """Determine valid neighboring positions of a state."""
+        return self.transition_models.get().neighbors(state[:2])
 
     def choose_action(self, state):
         """Choose an action using an epsilon-greedy policy."""
@@ -64,121 +132,516 @@ class QLearningTrainer:
             return None
         if random.uniform(0, 1) < self.epsilon:
             return random.choice(list(valid_neighbors.keys()))
-        return max(valid_neighbors.keys(), key=lambda action: self.q_table[state][action])
+        return self.q_table.best_action(state, list(valid_neighbors))
 
     def update_q_value(self, state, action, reward, next_state):
         """Update the Q-value for a state-action pair."""
-        next_valid_actions = self.get_neighbors(next_state).keys()
-        next_best_action = max(next_valid_actions, key=lambda a: self.q_table[next_state][a], default=None)
-        next_q_value = self.q_table[next_state][next_best_action] if next_best_action else 0
-        self.q_table[state][action] += ALPHA * (reward + GAMMA * next_q_value - self.q_table[state][action])
-
-    def train(self):
-        """Train the Q-Learning agent."""
-        for episode in range(self.training_episodes):
-            self.environment.reset()
-            self.reward_function.reset()
-            self.locations_manager.reset()
-            self.environment.update_dynamic_events()
+        next_actions = list(self.get_neighbors(next_state))
+        next_q_value = self.q_table.best_value(next_state, next_actions)
+        self.q_table.update(state, action, reward + GAMMA * next_q_value, ALPHA)
+        if self.replay is not None:
+            # train() bootstraps every update, the delivery bonus included, so nothing is done
+            self.pending.append((
+                self.encoder.encode(state),
+                self.q_table.action_index[action],
+                reward,
+                self.encoder.encode(next_state),
+                False,
+                sum(1 << self.q_table.action_index[next_action] for next_action in next_actions),
+            ))
+            if len(self.pending) >= self.plan_every:
+                self._dyna_updates()
 
-            state = self.environment.drone_pos
-            total_reward = 0
+    def _dyna_updates(self):
+        """
+        Record the pending real transitions in the replay buffer and model, then apply one
+        vectorized batch of the replayed and model-simulated updates owed for them.
+        """
+        steps = len(self.pending)
+        dtypes = (np.int64, np.int64, np.float32, np.int64, bool, np.uint8)
+        transitions = [np.array(column, dtype=dtype) for column, dtype in zip(zip(*self.pending), dtypes)]
+        self.pending = []
+        self.replay.add(*transitions)
+        self.model.update(*transitions)
+        batches = []
+        if self.replay_updates and len(self.replay):
+            batches.append(self.replay.sample(self.rng, self.replay_updates * steps))
+        if self.planning_updates and self.model.num_seen:
+            batches.append(self.model.sample(self.rng, self.planning_updates * steps))
+        if not batches:
+            return
+        states, actions, rewards, next_states, dones, next_valid = (np.concatenate(part) for part in zip(*batches))
+        valid = ((next_valid[:, None] >> np.arange(len(self.actions))) & 1).astype(bool)
+        best = np.where(valid, self.q_table.values[next_states], -np.inf).max(axis=1)
+        best = np.where(valid.any(axis=1) & ~dones, best, 0.0)
+        self._scatter_update(states, actions, rewards + GAMMA * best)
 
-            while self.locations_manager.get_pick_up_points() or self.environment.is_carrying_package:
-                valid_neighbors = self.get_neighbors(state)
-                if not valid_neighbors:
-                    break
+    def run_episode(self, learn=True, max_steps=None):
+        """
+        Run one episode from a reset environment.
+        Args:
+            learn (bool): Explore, update the Q-table and decay epsilon; otherwise act greedily
+                without changing anything.
+            max_steps (int): Optional cap on the moves of the episode.
+        Returns:
+            tuple: (total reward, whether everything was delivered, moves made).
+        """
+        self.environment.reset()
+        self.reward_function.reset()
+        self.locations_manager.reset()
+        self.environment.update_dynamic_events()
 
+        state = self.encoder.observe(self.environment, self.environment.drone_pos)
+        total_reward = 0
+        steps = 0
+        while self.locations_manager.get_pick_up_points() or self.environment.is_carrying_package:
+            if max_steps is not None and steps >= max_steps:
+                break
+            valid_neighbors = self.get_neighbors(state)
+            if not valid_neighbors:
+                break
+
+            if learn:
                 action = self.choose_action(state)
-                if not action:
-                    break
+            else:
+                action = self.q_table.best_action(state, list(valid_neighbors))
+            if not action:
+                break
 
-                next_state = valid_neighbors[action]
-                self.environment.drone_pos = next_state
-
-                # Handle pick-up and drop-off logic
-                action_type = "move"
-                reward = 0  # Base reward for the action
-                if (
-                    next_state in self.locations_manager.get_pick_up_points()
-                    and not self.environment.is_carrying_package
-                ):
-                    task_id = self.locations_manager.get_pick_up_points()[next_state]
-                    self.locations_manager.pick_up_points.pop(next_state)
-                    self.environment.is_carrying_package = True
-                    self.environment.current_delivery = task_id
-                    action_type = "pick-up"
-                    reward += 50  # Reward for successfully picking up a package
-                elif (
-                    next_state in self.locations_manager.get_drop_off_points()
-                    and self.environment.is_carrying_package
-                    and self.locations_manager.get_drop_off_points()[next_state] == self.environment.current_delivery
-                ):
-                    task_id = self.locations_manager.get_drop_off_points()[next_state]
-                    self.locations_manager.drop_off_points.pop(next_state)
-                    self.environment.is_carrying_package = False
-                    self.environment.current_delivery = None
-                    action_type = "drop-off"
-                    reward += 100  # Reward for successfully delivering a package
-                elif next_state in self.environment.obstacles:
-                    action_type = "obstacle"
-                elif next_state in self.environment.no_fly_zones:
-                    action_type = "no-fly-zone"
-
-                # Reward for moving closer to the goal
-                if self.environment.is_carrying_package:
-                    goal = self.locations_manager.get_drop_off_points().get(self.environment.current_delivery)
-                else:
-                    goal = self.get_closest_pick_up_point()
+            next_position = valid_neighbors[action]
+            self.environment.drone_pos = next_position
+
+            # Handle pick-up and drop-off logic
+            action_type = "move"
+            reward = 0  # Base reward for the action
+            if (
+                next_position in self.locations_manager.get_pick_up_points()
+                and not self.environment.is_carrying_package
+            ):
+                task_id = self.locations_manager.get_pick_up_points()[next_position]
+                self.locations_manager.pick_up(next_position)
+                self.environment.is_carrying_package = True
+                self.environment.current_delivery = task_id
+                action_type = "pick-up"
+                reward += 50  # Reward for successfully picking up a package
+            elif (
+                next_position in self.locations_manager.get_drop_off_points()
+                and self.environment.is_carrying_package
+                and self.locations_manager.get_drop_off_points()[next_position] == self.environment.current_delivery
+            ):
+                task_id = self.locations_manager.get_drop_off_points()[next_position]
+                self.locations_manager.drop_off(next_position)
+                self.environment.is_carrying_package = False
+                self.environment.current_delivery = None
+                action_type = "drop-off"
+                reward += 100  # Reward for successfully delivering a package
+            elif next_position in self.environment.obstacles:
+                action_type = "obstacle"
+            elif next_position in self.environment.no_fly_zones:
+                action_type = "no-fly-zone"
+
+            next_state = self.encoder.observe(self.environment, next_position)
 
-                if goal:
-                    prev_distance = abs(state[0] - goal[0]) + abs(state[1] - goal[1])
-                    new_distance = abs(next_state[0] - goal[0]) + abs(next_state[1] - goal[1])
-                    if new_distance < prev_distance:
-                        reward += 10  # Reward for moving closer
-                    else:
-                        reward -= 5  # Penalty for moving further away
+            # Reward for moving closer to the goal
+            goal = self.get_goal()
+            if goal:
+                prev_distance = abs(state[0] - goal[0]) + abs(state[1] - goal[1])
+                new_distance = abs(next_position[0] - goal[0]) + abs(next_position[1] - goal[1])
+                if new_distance < prev_distance:
+                    reward += 10  # Reward for moving closer
+                else:
+                    reward -= 5  # Penalty for moving further away
 
-                # Update Q-values and total reward
+            # Update Q-values and total reward
+            if learn:
                 self.update_q_value(state, action, reward, next_state)
-                total_reward += reward
+            total_reward += reward
+            steps += 1
 
-                # Advance time and update environment
-                self.environment.advance_time()
-                self.environment.update_dynamic_events()
-                state = next_state
+            # Advance time and update environment
+            self.environment.advance_time()
+            self.environment.update_dynamic_events()
+            state = next_state
 
-            # Add bonus reward if all packages are delivered
-            if not self.locations_manager.get_pick_up_points() and not self.environment.is_carrying_package:
-                total_reward += 1000
-                print("All packages delivered! Bonus reward added.")
+        # Add bonus reward if all packages are delivered
+        delivered = not self.locations_manager.get_pick_up_points() and not self.environment.is_carrying_package
+        if delivered:
+            total_reward += 1000
+            if learn:
                 self.update_q_value(state, action, 1000, state)
+        if learn:
+            self.decay_epsilon(total_reward)
+        return total_reward, delivered, steps
+
+    def decay_epsilon(self, total_reward):
+        """Dynamic epsilon decay based on the performance of a finished episode."""
+        if total_reward > 0:  # Decay faster for positive rewards
+            self.epsilon = max(MIN_EPSILON, self.epsilon * 0.99)
+        else:
+            self.epsilon = max(MIN_EPSILON, self.epsilon * EPSILON_DECAY)
 
-            # Dynamic epsilon decay based on performance
-            if total_reward > 0:  # Decay faster for positive rewards
-                self.epsilon = max(MIN_EPSILON, self.epsilon * 0.99)
+    def train(self, checkpoint_every=0, checkpoint_path=None, resume=False):
+        """
+        Train the Q-Learning agent.
+        Args:
+            checkpoint_every (int): Episodes between background checkpoints (0 disables them).
+            checkpoint_path (str): Prefix of the checkpoint files (next to Q_TABLE_FILE by default).
+            resume (bool): Continue from the last checkpoint, reproducing the uninterrupted run.
+        """
+        print(f"Q-table: {self.encoder.describe(len(self.actions))}")
+        writer = None
+        start_episode = 0
+        if checkpoint_every or resume:
+            writer = CheckpointWriter(checkpoint_path or Q_TABLE_FILE + ".ckpt", self.q_table)
+        if resume:
+            state = writer.restore()
+            if state is None:
+                print(f"No checkpoint at {writer.path}, starting from scratch")
             else:
-                self.epsilon = max(MIN_EPSILON, self.epsilon * EPSILON_DECAY)
+                start_episode = self.set_training_state(state)
+                print(f"Resumed from {writer.path} after episode {start_episode}")
+        try:
+            for episode in range(start_episode, self.training_episodes):
+                total_reward, delivered, _ = self.run_episode()
+                if delivered:
+                    print("All packages delivered! Bonus reward added.")
 
-            print(f"Episode {episode + 1}/{self.training_episodes}: Total Reward: {total_reward}")
+                print(f"Episode {episode + 1}/{self.training_episodes}: Total Reward: {total_reward}")
+                if checkpoint_every and (episode + 1) % checkpoint_every == 0:
+                    writer.checkpoint(self.training_state(episode + 1))
+        finally:
+            if writer is not None:
+                writer.close()
 
         # Save the Q-table to a file
-        with open(Q_TABLE_FILE, "wb") as f:
-            pickle.dump(dict(self.q_table), f)
+        self.q_table.save(Q_TABLE_FILE)
+        print(f"Q-table saved to {Q_TABLE_FILE}")
+
+    def training_state(self, episode):
+        """JSON-serializable state that, with the Q-table, lets training continue after `episode` episodes."""
+        version, internal, gauss = random.getstate()
+        return {
+            "episode": episode,
+            "epsilon": self.epsilon,
+            "random": [version, list(internal), gauss],
+            "rng": None if self.rng is None else self.rng.bit_generator.state,
+        }
+
+    def set_training_state(self, state):
+        """
+        Restore a state from training_state().
+        Returns:
+            int: Episodes already trained.
+        """
+        self.epsilon = state["epsilon"]
+        version, internal, gauss = state["random"]
+        random.setstate((version, tuple(internal), gauss))
+        if state["rng"] is not None:
+            self.rng = np.random.default_rng()
+            self.rng.bit_generator.state = state["rng"]
+        return state["episode"]
+
+    def train_dyna(self, replay_updates=2, planning_updates=16, buffer_size=100000, plan_every=64,
+                   target_success=None, window=100, seed=None):
+        """
+        Train like train(), but add replay_updates transitions replayed from a ring buffer and
+        planning_updates transitions simulated by a tabular model (Dyna-Q) per real update.
+        Every plan_every real steps, the steps are recorded and their Dyna updates applied as
+        one vectorized batch.
+        Args:
+            replay_updates (int): Replayed updates per real step.
+            planning_updates (int): Model-simulated updates per real step.
+            buffer_size (int): Transitions kept for replay.
+            plan_every (int): Real steps per batch of Dyna updates.
+            target_success (float): Stop once this fraction of the last `window` episodes
+                delivered everything.
+            window (int): Episodes per progress line and success-rate window.
+            seed (int): Seed of the sampling RNG.
+        Returns:
+            list: (total reward, delivered, moves) of every episode.
+        """
+        print(f"Q-table: {self.encoder.describe(len(self.actions))}, {replay_updates} replayed and "
+              f"{planning_updates} planning updates per step")
+        self.replay = ReplayBuffer(buffer_size)
+        self.model = TabularModel(self.encoder.num_states, len(self.actions))
+        self.replay_updates, self.planning_updates = replay_updates, planning_updates
+        self.plan_every, self.pending = plan_every, []
+        self.rng = np.random.default_rng(seed)
+        history = []
+        steps = 0
+        start_time = time.perf_counter()
+        try:
+            for episode in range(self.training_episodes):
+                history.append(self.run_episode())
+                steps += history[-1][2]
+                recent = history[-window:]
+                success = sum(delivered for _, delivered, _ in recent) / len(recent)
+                if (episode + 1) % window == 0 or episode + 1 == self.training_episodes:
+                    print(f"Episode {episode + 1}/{self.training_episodes}: "
+                          f"Mean Reward: {sum(reward for reward, _, _ in recent) / len(recent):.1f}, "
+                          f"Success: {success:.0%}, {steps} steps, {time.perf_counter() - start_time:.1f}s")
+                if target_success is not None and len(recent) == window and success >= target_success:
+                    print(f"Reached {success:.0%} success after {episode + 1} episodes, {steps} steps, "
+                          f"{time.perf_counter() - start_time:.1f}s")
+                    break
+        finally:
+            self.replay = self.model = None
+            self.pending = []
+
+        self.q_table.save(Q_TABLE_FILE)
+        print(f"Q-table saved to {Q_TABLE_FILE}")
+        return history
+
+    def evaluate(self, episodes=1, max_steps=EVAL_MAX_STEPS):
+        """Mean total reward of greedy episodes, without learning."""
+        return sum(self.run_episode(learn=False, max_steps=max_steps)[0] for _ in range(episodes)) / episodes
+
+    def train_parallel(self, num_workers=None, eval_every=500, checkpoint_every=2000,
+                       checkpoint_path=None, seed=None, save=True):
+        """
+        Train with worker processes sharing one Q-table in shared memory, updated lock-free
+        (Hogwild). Each worker runs its own environment; epsilon is shared and decays once per
+        finished episode as in train(), and is kept in self.epsilon afterwards. The parent
+        collects the episode results, evaluates the greedy policy and writes checkpoints.
+        Args:
+            num_workers (int): Worker processes (defaults to the CPU count).
+            eval_every (int): Episodes between greedy evaluations (0 to disable).
+            checkpoint_every (int): Episodes between checkpoints (0 to disable).
+            checkpoint_path (str): Checkpoint file (defaults to Q_TABLE_FILE + ".ckpt").
+            seed (int): Base seed of the workers' RNGs.
+            save (bool): Save the final table to Q_TABLE_FILE.
+        Returns:
+            list: Total reward of every episode, in the order they finished.
+        """
+        num_workers = num_workers or os.cpu_count() or 1
+        checkpoint_path = checkpoint_path or Q_TABLE_FILE + ".ckpt"
+        seed = random.randrange(2 ** 32) if seed is None else seed
+        print(f"Q-table: {self.encoder.describe(len(self.actions))}, {num_workers} workers")
+        trainer_args = (self.encoder.features, self.environment.grid_size,
+                        self.event_simulator.event_patterns, self.locations_manager.delivery_tasks)
+
+        episode_counter = multiprocessing.Value("q", 0)
+        epsilon = multiprocessing.Value("d", self.epsilon, lock=False)  # Guarded by episode_counter's lock
+        results = multiprocessing.Queue()
+        local_table = self.q_table
+        shared = None
+        workers = []
+        rewards = []
+        steps = 0
+        start_time = time.perf_counter()
+        shm = shared_memory.SharedMemory(create=True, size=self.q_table.nbytes)
+        try:
+            shared = np.ndarray(local_table.values.shape, dtype=np.float32, buffer=shm.buf)
+            shared[:] = local_table.values
+            self.q_table = QTable(self.encoder, self.actions, shared)
+            workers = [
+                multiprocessing.Process(
+                    target=_hogwild_worker,
+                    args=(shm.name, shared.shape, trainer_args, epsilon, episode_counter,
+                          self.training_episodes, results, seed + i),
+                    daemon=True,
+                )
+                for i in range(num_workers)
+            ]
+            for worker in workers:
+                worker.start()
+            while len(rewards) < self.training_episodes:
+                try:
+                    total_reward, episode_steps = results.get(timeout=1.0)
+                except queue.Empty:
+                    if not any(worker.is_alive() for worker in workers):
+                        print("All workers exited early.")
+                        break
+                    continue
+                rewards.append(total_reward)
+                steps += episode_steps
+
+                finished = len(rewards)
+                if eval_every and finished % eval_every == 0:
+                    elapsed = time.perf_counter() - start_time
+                    recent = rewards[-eval_every:]
+                    print(f"Episode {finished}/{self.training_episodes}: Mean Reward: {sum(recent) / len(recent):.1f}, "
+                          f"Greedy Reward: {self.evaluate():.1f}, {finished / elapsed:.1f} episodes/s")
+                if checkpoint_every and finished % checkpoint_every == 0:
+                    QTable(self.encoder, self.actions, shared.copy()).save(checkpoint_path)
+                    print(f"Checkpoint saved to {checkpoint_path}")
+            for worker in workers:
+                worker.join()
+        finally:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+            if shared is not None:
+                local_table.values[:] = shared
+            self.q_table = local_table
+            self.epsilon = epsilon.value
+            # Unlinked first so the segment is freed even if a stray view keeps close() from succeeding
+            shm.unlink()
+            shared = None
+            shm.close()
+
+        elapsed = time.perf_counter() - start_time
+        print(f"Trained {len(rewards)} episodes ({steps} steps) in {elapsed:.2f}s with {num_workers} workers, "
+              f"{len(rewards) / elapsed:.1f} episodes/s")
+        if save:
+            self.q_table.save(Q_TABLE_FILE)
+            print(f"Q-table saved to {Q_TABLE_FILE}")
+        return rewards
+
+    def _scatter_update(self, states, actions, targets):
+        """
+        Q-learning update of many (state, action) pairs at once. Pairs repeated within the
+        batch share one ALPHA-sized step towards their mean target, so many lanes in the same
+        state cannot overshoot.
+        """
+        values = self.q_table.values
+        pairs = states * values.shape[1] + actions
+        _, inverse, counts = np.unique(pairs, return_inverse=True, return_counts=True)
+        step = np.float32(ALPHA) * (targets.astype(np.float32) - values[states, actions]) / counts[inverse]
+        np.add.at(values, (states, actions), step.astype(np.float32))
+        self.q_table.mark_dirty(states)
+
+    def train_batched(self, num_envs=256, max_episode_steps=BATCHED_MAX_EPISODE_STEPS, seed=None):
+        """
+        Train on many episodes in lock-step (see VectorEnvironment), with the rewards and
+        bonus of train(). Each lane starts a new episode as soon as its last one ends, and
+        epsilon decays per finished episode as in train().
+        Args:
+            num_envs (int): Episodes stepped together.
+            max_episode_steps (int): Cap on the steps of one episode, None for none as in train().
+            seed (int): Seed of the exploration RNG.
+        """
+        print(f"Q-table: {self.encoder.describe(len(self.actions))}")
+        rng = np.random.default_rng(seed)
+        vector = VectorEnvironment(self.environment, num_envs, self.actions, self.encoder.task_ids)
+        values = self.q_table.values
+
+        def encode(lanes):
+            xs, ys = vector.positions(lanes)
+            return self.encoder.encode_batch(xs, ys, vector.features(lanes, self.encoder.features))
+
+        def best_values(states, valid):
+            """Max Q over the valid actions, 0 where none is."""
+            return np.where(valid.any(axis=1), np.where(valid, values[states], -np.inf).max(axis=1, initial=-np.inf), 0.0)
+
+        started = min(num_envs, self.training_episodes)
+        active = np.zeros(num_envs, dtype=bool)
+        active[:started] = True
+        vector.reset(np.arange(started))
+        # Encoded state of each lane, carried over from the step that entered it as in train()
+        current = np.zeros(num_envs, dtype=np.int64)
+        current[:started] = encode(np.arange(started))
+        totals = np.zeros(num_envs, dtype=np.int64)
+        lengths = np.zeros(num_envs, dtype=np.int64)
+        finished_rewards = []
+        steps = 0
+        start_time = time.perf_counter()
+
+        while active.any():
+            lanes = np.flatnonzero(active)
+            layout = vector.layout(lanes)
+            valid = vector.valid_actions(lanes, layout)
+            # Lanes with nowhere to go end their episode, as in train()
+            stuck = ~valid.any(axis=1)
+            done = lanes[stuck]
+            lanes, valid = lanes[~stuck], valid[~stuck]
+            layout = tuple(part[~stuck] for part in layout)
+
+            if len(lanes):
+                states = current[lanes]
+                actions = self.q_table.greedy(states, valid)
+                explore = rng.random(len(lanes)) < self.epsilon
+                random_actions = np.argmax(rng.random(valid.shape) * valid, axis=1)
+                actions = np.where(explore, random_actions, actions)
+
+                rewards = vector.step(lanes, actions)
+                next_states = encode(lanes)
+                current[lanes] = next_states
+                # The next state's moves are judged by the zones the move was made under
+                targets = rewards + GAMMA * best_values(next_states, vector.valid_actions(lanes, layout))
+                self._scatter_update(states, actions, targets)
+                totals[lanes] += rewards
+                lengths[lanes] += 1
+                steps += len(lanes)
+                vector.advance_time(lanes)
+
+                delivered = vector.finished(lanes)
+                bonus_lanes = lanes[delivered]
+                if len(bonus_lanes):
+                    bonus_states, bonus_actions = next_states[delivered], actions[delivered]
+                    bonus_targets = 1000 + GAMMA * best_values(bonus_states, vector.valid_actions(bonus_lanes))
+                    self._scatter_update(bonus_states, bonus_actions, bonus_targets)
+                    totals[bonus_lanes] += 1000
+                capped = lengths[lanes] >= max_episode_steps if max_episode_steps else np.zeros(len(lanes), dtype=bool)
+                done = np.concatenate([done, lanes[delivered | capped]])
+
+            respawned = []
+            for lane in np.sort(done).tolist():
+                total_reward = int(totals[lane])
+                finished_rewards.append(total_reward)
+                self.decay_epsilon(total_reward)
+                totals[lane] = lengths[lane] = 0
+                if started < self.training_episodes:
+                    respawned.append(lane)
+                    started += 1
+                else:
+                    active[lane] = False
+
+                if len(finished_rewards) % num_envs == 0 or len(finished_rewards) == self.training_episodes:
+                    elapsed = time.perf_counter() - start_time
+                    recent = finished_rewards[-num_envs:]
+                    print(f"Episode {len(finished_rewards)}/{self.training_episodes}: "
+                          f"Mean Reward: {sum(recent) / len(recent):.1f}, {steps / elapsed:.0f} steps/s")
+            if respawned:
+                vector.reset(respawned)
+                current[respawned] = encode(np.array(respawned))
+
+        elapsed = time.perf_counter() - start_time
+        print(f"Trained {len(finished_rewards)} episodes ({steps} steps) in {elapsed:.2f}s, {steps / elapsed:.0f} steps/s")
+        self.q_table.save(Q_TABLE_FILE)
         print(f"Q-table saved to {Q_TABLE_FILE}")
+        return finished_rewards
+
+    def get_goal(self):
+        """Cell the distance shaping rewards moving towards, or None."""
+        if self.environment.is_carrying_package:
+            return self.locations_manager.get_drop_off_points().get(self.environment.current_delivery)
+        return self.get_closest_pick_up_point()
 
     def get_closest_pick_up_point(self):
         """Get the closest pick-up point."""
-        pick_up_points = self.locations_manager.get_pick_up_points()
-        if not pick_up_points:
-            return None
-        current_pos = self.environment.drone_pos
-        return min(
-            pick_up_points.keys(),
-            key=lambda p: abs(current_pos[0] - p[0]) + abs(current_pos[1] - p[1])
-        )
+        closest = self.locations_manager.nearest_pick_up_points(self.environment.drone_pos)
+        return closest[0] if closest else None
+
+def benchmark_parallel(worker_counts=(1, 2, 4, 8), episodes=200, state_features=STATE_FEATURES):
+    """
+    Time train_parallel() from a fresh table for each worker count.
+    Returns:
+        dict: Worker count -> episodes per second.
+    """
+    throughput = {}
+    for num_workers in worker_counts:
+        trainer = QLearningTrainer(state_features)
+        trainer.training_episodes = episodes
+        start_time = time.perf_counter()
+        trainer.train_parallel(num_workers, eval_every=0, checkpoint_every=0, seed=0, save=False)
+        throughput[num_workers] = episodes / (time.perf_counter() - start_time)
+    base = throughput[worker_counts[0]]
+    for num_workers, rate in throughput.items():
+        print(f"{num_workers:>3} workers: {rate:8.1f} episodes/s ({rate / base:.2f}x)")
+    return throughput
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the tabular Q-learning delivery agent.")
+    parser.add_argument("--episodes", type=int, default=None, help="Total training episodes.")
+    parser.add_argument("--checkpoint-every", type=int, default=0,
+                        help="Episodes between background checkpoints (0 disables them).")
+    parser.add_argument("--checkpoint-path", default=None,
+                        help=f"Prefix of the checkpoint files (default: {Q_TABLE_FILE}.ckpt).")
+    parser.add_argument("--resume", action="store_true", help="Continue from the last checkpoint.")
+    args = parser.parse_args()
     trainer = QLearningTrainer()
-    trainer.train()
+    if args.episodes is not None:
+        trainer.training_episodes = args.episodes
+    trainer.train(args.checkpoint_every, args.checkpoint_path, args.resume)
     pygame.quit()
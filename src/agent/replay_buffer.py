@@ -0,0 +1,105 @@
+import numpy as np
+
+
+class ReplayBuffer:
+    def __init__(self, capacity):
+        """
+        Fixed-size ring of transitions over encoded states, preallocated as NumPy arrays;
+        once full, each new transition overwrites the oldest.
+        Args:
+            capacity (int): Number of transitions kept.
+        """
+        self.capacity = capacity
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.next_valid = np.zeros(capacity, dtype=np.uint8)  # bit per action available in s'
+        self.size = 0
+        self.position = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, states, actions, rewards, next_states, dones, next_valid):
+        """
+        Store a batch of transitions in order, overwriting the oldest once full.
+        Args:
+            states (np.ndarray): Row indices of s.
+            actions (np.ndarray): Column indices of a.
+            rewards (np.ndarray): Rewards of the moves.
+            next_states (np.ndarray): Row indices of s'.
+            dones (np.ndarray): Whether s' ends the episode (no bootstrapping from it).
+            next_valid (np.ndarray): Bitmasks of the action columns available in s'.
+        """
+        columns = (states, actions, rewards, next_states, dones, next_valid)
+        count = len(states)
+        if count > self.capacity:  # only the newest transitions survive
+            columns = tuple(column[-self.capacity:] for column in columns)
+            self.position = (self.position + count - self.capacity) % self.capacity
+            count = self.capacity
+        slots = (self.position + np.arange(count)) % self.capacity
+        arrays = (self.states, self.actions, self.rewards, self.next_states, self.dones, self.next_valid)
+        for array, column in zip(arrays, columns):
+            array[slots] = column
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    def sample(self, rng, batch_size):
+        """
+        Draw transitions uniformly with replacement.
+        Args:
+            rng (np.random.Generator): Source of the sample.
+        Returns:
+            tuple: (states, actions, rewards, next states, dones, next valid bitmasks) arrays.
+        """
+        i = rng.integers(0, self.size, batch_size)
+        return self.states[i], self.actions[i], self.rewards[i], self.next_states[i], self.dones[i], self.next_valid[i]
+
+
+class TabularModel:
+    def __init__(self, num_states, num_actions):
+        """
+        Deterministic Dyna model remembering the last outcome of every (state, action) tried.
+        The arrays are zero-filled, so pages of pairs never tried are not touched.
+        Args:
+            num_states (int): Rows of the Q-table.
+            num_actions (int): Columns of the Q-table.
+        """
+        self.num_actions = num_actions
+        pairs = num_states * num_actions
+        self.known = np.zeros(pairs, dtype=bool)
+        self.rewards = np.zeros(pairs, dtype=np.float32)
+        self.next_states = np.zeros(pairs, dtype=np.int64)
+        self.dones = np.zeros(pairs, dtype=bool)
+        self.next_valid = np.zeros(pairs, dtype=np.uint8)
+        self.seen = np.zeros(1024, dtype=np.int64)  # pair indices tried so far
+        self.num_seen = 0
+
+    def update(self, states, actions, rewards, next_states, dones, next_valid):
+        """Remember the outcomes of a batch of transitions (arguments as in ReplayBuffer.add)."""
+        pairs = states * self.num_actions + actions
+        order = np.argsort(pairs, kind="stable")
+        ordered = pairs[order]
+        last = order[np.append(ordered[1:] != ordered[:-1], True)]  # a repeated pair keeps its last outcome
+        pairs = pairs[last]
+        fresh = pairs[~self.known[pairs]]
+        if len(fresh):
+            while self.num_seen + len(fresh) > len(self.seen):
+                self.seen = np.concatenate([self.seen, np.zeros_like(self.seen)])
+            self.seen[self.num_seen:self.num_seen + len(fresh)] = fresh
+            self.num_seen += len(fresh)
+            self.known[fresh] = True
+        self.rewards[pairs], self.next_states[pairs] = rewards[last], next_states[last]
+        self.dones[pairs], self.next_valid[pairs] = dones[last], next_valid[last]
+
+    def sample(self, rng, batch_size):
+        """
+        Simulate transitions from (state, action) pairs tried before, drawn uniformly.
+        Returns:
+            tuple: Arrays shaped like ReplayBuffer.sample().
+        """
+        pairs = self.seen[rng.integers(0, self.num_seen, batch_size)]
+        states, actions = np.divmod(pairs, self.num_actions)
+        return states, actions, self.rewards[pairs], self.next_states[pairs], self.dones[pairs], self.next_valid[pairs]
@@ -0,0 +1,66 @@
+import numpy as np
+
+try:
+    from scipy import ndimage
+except ImportError:  # scipy is optional; the NumPy union-find below gives the same labels
+    ndimage = None
+
+
+def label_components(blocked):
+    """
+    Label the 4-connected components of passable cells.
+    Args:
+        blocked (np.ndarray): Bool (width x height) mask of impassable cells.
+    Returns:
+        np.ndarray: int32 labels, 0 for blocked cells and 1..k for the components.
+    """
+    passable = ~np.asarray(blocked, dtype=bool)
+    if ndimage is not None:
+        labels, _ = ndimage.label(passable)
+        return labels.astype(np.int32)
+
+    width, height = passable.shape
+    ids = np.arange(width * height).reshape(width, height)
+    # Edges between horizontally and vertically adjacent passable cells
+    right = passable[:-1, :] & passable[1:, :]
+    down = passable[:, :-1] & passable[:, 1:]
+    a = np.concatenate([ids[:-1, :][right], ids[:, :-1][down]])
+    b = np.concatenate([ids[1:, :][right], ids[:, 1:][down]])
+
+    # Vectorized union-find: hook larger roots under smaller ones, then pointer-jump
+    parent = ids.ravel().copy()
+    while a.size:
+        root_a, root_b = parent[a], parent[b]
+        differ = root_a != root_b
+        if not differ.any():
+            break
+        np.minimum.at(parent, np.maximum(root_a, root_b)[differ], np.minimum(root_a, root_b)[differ])
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+    _, labels = np.unique(parent[passable.ravel()], return_inverse=True)
+    result = np.zeros(width * height, dtype=np.int32)
+    result[passable.ravel()] = labels + 1
+    return result.reshape(width, height)
+
+
+def shares_component(labels, start, goal):
+    """
+    Whether goal can be reached from start in a labelling.
+    A start cell inside a zone (the zone appeared under the drone) may still leave it, so its
+    passable neighbours are used instead.
+    """
+    goal_label = labels[goal]
+    if goal_label == 0:
+        return False
+    if labels[start] != 0:
+        return labels[start] == goal_label
+    width, height = labels.shape
+    x, y = start
+    for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+        if 0 <= nx < width and 0 <= ny < height and labels[nx, ny] == goal_label:
+            return True
+    return False
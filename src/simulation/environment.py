@@ -1,3 +1,7 @@
+import numpy as np
+from .connectivity import label_components, shares_component
+
+
 class Environment:
     def __init__(self, grid_size, cell_size, time_step=10):
         """Initialize the environment."""
@@ -16,11 +20,19 @@ class Environment:
         self.future_no_fly_zones = {}
         self.event_simulator = None
         self.locations_manager = None
+        self.zone_epoch = 0  # Bumped whenever the active obstacle/no-fly layout changes
+        self.last_zone_changes = set()
+        self._zone_masks = None
+        self._component_labels = None
+        self._slot_labels = {}
+        self._slot_labels_key = None
+        self._zone_key = None  # (pattern slot, open pickups, open dropoffs) the zones were built for
         self.reset()
 
     def set_event_simulator(self, event_simulator):
         """Set the event simulator reference."""
         self.event_simulator = event_simulator
+        self._zone_key = None
 
     def set_locations_manager(self, locations_manager):
         """Set the locations manager reference."""
@@ -35,18 +47,30 @@ class Environment:
             pick_up_points = self.grid_with_priority("pickup")
             drop_off_points = self.grid_with_priority("dropoff")
 
+            # The zones only depend on the pattern and the open points; skip rebuilding them
+            # (O(zone cells)) on the many steps where neither changed
+            key = (
+                self.event_simulator.get_pattern_index(self.current_time),
+                frozenset(pick_up_points),
+                frozenset(drop_off_points),
+            )
+            if key == self._zone_key:
+                return
+            self._zone_key = key
+
             # Merge event zones while giving priority to pickup/dropoff
-            self.obstacles = {
+            obstacles = {
                 tuple(pos): "obstacle"
                 for pos in self.event_simulator.get_obstacles()
                 if tuple(pos) not in pick_up_points and tuple(pos) not in drop_off_points
             }
 
-            self.no_fly_zones = {
+            no_fly_zones = {
                 tuple(pos): "no-fly-zone"
                 for pos in self.event_simulator.get_no_fly_zones()
                 if tuple(pos) not in pick_up_points and tuple(pos) not in drop_off_points
             }
+            self._set_zones(obstacles, no_fly_zones)
 
             self.future_obstacles = {
                 tuple(pos): "future-obstacle"
@@ -60,6 +84,106 @@ class Environment:
                 if tuple(pos) not in pick_up_points and tuple(pos) not in drop_off_points
             }
 
+    def _set_zones(self, obstacles, no_fly_zones):
+        """Install the active zones, starting a new zone epoch if the layout changed."""
+        changed = (obstacles.keys() ^ self.obstacles.keys()) | (no_fly_zones.keys() ^ self.no_fly_zones.keys())
+        self.obstacles = obstacles
+        self.no_fly_zones = no_fly_zones
+        if changed:
+            self.zone_epoch += 1
+            self.last_zone_changes = changed
+            self._zone_masks = None
+            self._component_labels = None
+
+    def get_zone_masks(self):
+        """
+        Return boolean (grid_size x grid_size) masks of the active zones, indexed [x, y].
+        The masks are built once per zone epoch and must be treated as read-only.
+        Returns:
+            tuple: (obstacle_mask, no_fly_mask) as NumPy bool arrays.
+        """
+        if self._zone_masks is None:
+            obstacle_mask = np.zeros((self.grid_size, self.grid_size), dtype=bool)
+            no_fly_mask = np.zeros((self.grid_size, self.grid_size), dtype=bool)
+            if self.obstacles:
+                obstacle_mask[tuple(np.array(list(self.obstacles)).T)] = True
+            if self.no_fly_zones:
+                no_fly_mask[tuple(np.array(list(self.no_fly_zones)).T)] = True
+            self._zone_masks = (obstacle_mask, no_fly_mask)
+        return self._zone_masks
+
+    def get_component_labels(self):
+        """Connected components of cells outside the active zones, labelled once per zone epoch."""
+        if self._component_labels is None:
+            obstacle_mask, no_fly_mask = self.get_zone_masks()
+            self._component_labels = label_components(obstacle_mask | no_fly_mask)
+        return self._component_labels
+
+    def is_reachable(self, start, goal):
+        """Whether goal can be reached from start without entering an active zone."""
+        return shares_component(self.get_component_labels(), tuple(start), tuple(goal))
+
+    def next_reachable_time(self, start, goal):
+        """
+        Find when goal next becomes reachable from start while the drone waits in place.
+        Each pattern slot of the day is labelled once (per set of open pickup/dropoff points).
+        Returns:
+            int: The current time if goal is reachable now, else the start time of the first
+            later slot in which it is, or None if it is unreachable all day.
+        """
+        if self.is_reachable(start, goal):
+            return self.current_time
+        if not self.event_simulator:
+            return None
+
+        protected = frozenset(self.grid_with_priority("pickup")) | frozenset(self.grid_with_priority("dropoff"))
+        if self._slot_labels_key != protected:
+            self._slot_labels = {}
+            self._slot_labels_key = protected
+
+        patterns = self.event_simulator.event_patterns
+        current_slot = self.get_zone_slot()
+        first = 0 if current_slot is None else current_slot + 1
+        for offset in range(len(patterns)):
+            slot = (first + offset) % len(patterns)
+            if slot == current_slot:
+                break
+            if slot not in self._slot_labels:
+                obstacle_mask, no_fly_mask = self.get_slot_zone_masks(slot)
+                self._slot_labels[slot] = label_components(obstacle_mask | no_fly_mask)
+            if shares_component(self._slot_labels[slot], tuple(start), tuple(goal)):
+                return patterns[slot]["time_range"][0]
+        return None
+
+    def get_zone_slot(self):
+        """Return the index of the event pattern active at the current time, or None."""
+        if not self.event_simulator:
+            return None
+        return self.event_simulator.get_pattern_index(self.current_time)
+
+    def get_slot_zone_masks(self, slot, apply_priority=True):
+        """
+        Build zone masks for any pattern slot without moving the simulation clock.
+        Args:
+            slot (int): Index of the event pattern.
+            apply_priority (bool): Whether remaining pickup/dropoff cells override the zones,
+                as they do for the live masks.
+        Returns:
+            tuple: (obstacle_mask, no_fly_mask) as NumPy bool arrays indexed [x, y].
+        """
+        pattern = self.event_simulator.event_patterns[slot]
+        protected = set()
+        if apply_priority:
+            protected = self.grid_with_priority("pickup") | self.grid_with_priority("dropoff")
+        masks = []
+        for key in ("obstacles", "no_fly_zones"):
+            mask = np.zeros((self.grid_size, self.grid_size), dtype=bool)
+            cells = [tuple(pos) for pos in pattern.get(key, []) if tuple(pos) not in protected]
+            if cells:
+                mask[tuple(np.array(cells).T)] = True
+            masks.append(mask)
+        return tuple(masks)
+
     def grid_with_priority(self, point_type):
         """Retrieve grid points based on priority."""
         if not self.locations_manager:
@@ -79,14 +203,76 @@ class Environment:
         self.package_count = 0
         self.current_delivery = None
         self.current_time = 0
-        self.obstacles = {}
-        self.no_fly_zones = {}
+        self._set_zones({}, {})
+        self._zone_key = None
 
     def advance_time(self):
         """Advance the simulation time by the time step."""
         self.current_time = (self.current_time + self.time_step) % (24 * 60)
         self.update_dynamic_events()  # Update dynamic events when time advances
 
+    def get_zone_change_times(self):
+        """Return the sorted minutes of the day at which the event patterns switch."""
+        if not self.event_simulator:
+            return []
+        times = set()
+        for pattern in self.event_simulator.event_patterns:
+            start, end = pattern.get("time_range", (0, 0))
+            times.update((start % (24 * 60), end % (24 * 60)))
+        return sorted(times)
+
+    def advance_to(self, target_time, reward_per_step=0):
+        """
+        Jump the clock forward to a time of day in a single update, as if advance_time()
+        had been called once per step.
+        Args:
+            target_time (int): Minute of the day to stop at (rounded up to whole steps).
+            reward_per_step (float): Reward accrued for every skipped step.
+        Returns:
+            tuple: (steps skipped, total reward of those steps).
+        """
+        minutes = (target_time - self.current_time) % (24 * 60)
+        steps = -(-minutes // self.time_step)
+        self.current_time = (self.current_time + steps * self.time_step) % (24 * 60)
+        self.update_dynamic_events()
+        return steps, steps * reward_per_step
+
+    def advance_to_next_change(self, reward_per_step=0):
+        """
+        Jump the clock to the next event pattern boundary, the next time the zones can change.
+        Returns:
+            tuple: (steps skipped, total reward of those steps); (0, 0) without events.
+        """
+        times = self.get_zone_change_times()
+        if not times:
+            return 0, 0
+        later = [t for t in times if t > self.current_time]
+        return self.advance_to(later[0] if later else times[0], reward_per_step)
+
+    def advance_until(self, predicate, reward_per_step=0):
+        """
+        Jump from one pattern boundary to the next until predicate(environment) holds.
+        The zones only change at the boundaries, so no step in between is simulated.
+        Args:
+            predicate (callable): Environment -> bool, checked now and after each jump.
+            reward_per_step (float): Reward accrued for every skipped step.
+        Returns:
+            tuple: (steps skipped, total reward of those steps), or None, with the clock left
+            unchanged, if predicate does not hold at any boundary of the next day.
+        """
+        if predicate(self):
+            return 0, 0
+        start_time = self.current_time
+        total_steps = 0
+        for _ in self.get_zone_change_times():
+            steps, _ = self.advance_to_next_change()
+            total_steps += steps
+            if predicate(self):
+                return total_steps, total_steps * reward_per_step
+        self.current_time = start_time
+        self.update_dynamic_events()
+        return None
+
     def get_formatted_time(self):
         """Return the current simulation time in HH:MM format."""
         hours = self.current_time // 60
@@ -5,12 +5,14 @@ import os
 pattern = "patterns1"
 
 class EventSimulator:
-    def __init__(self, grid_size, config_path):
+    def __init__(self, grid_size, config_path=None, event_patterns=None):
         """
         Initializes the EventSimulator to generate obstacles and no-fly zones.
         Args:
             grid_size (int): The size of the grid (number of cells).
             config_path (str): Path to the event patterns configuration file.
+            event_patterns (list): Patterns to use instead of reading config_path, in the
+                same format (e.g. from src.utils.map_generator).
         """
         self.grid_size = grid_size
         self.obstacles = []
@@ -18,6 +20,10 @@ class EventSimulator:
         self.future_obstacles = []
         self.future_no_fly_zones = []
 
+        if event_patterns is not None:
+            self.event_patterns = event_patterns
+            return
+
         # Load event patterns
         config_path = os.path.join(os.path.dirname(__file__), "../configs", os.path.basename(config_path))
         with open(config_path, 'r') as file:
@@ -62,6 +68,20 @@ class EventSimulator:
                 return self.event_patterns[i + 1] if i + 1 < len(self.event_patterns) else {}
         return {}
 
+    def get_pattern_index(self, current_time):
+        """
+        Get the index of the pattern (zone slot) active at the given time.
+        Args:
+            current_time (int): The current time in the simulation (in minutes).
+        Returns:
+            int: Index into the event patterns, or None if no pattern covers the time.
+        """
+        for i, pattern in enumerate(self.event_patterns):
+            start, end = pattern.get("time_range", (0, 0))
+            if start <= current_time < end:
+                return i
+        return None
+
     def update_events(self, current_time):
         """
         Update current and future obstacles/no-fly zones based on time.
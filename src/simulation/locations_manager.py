@@ -1,22 +1,27 @@
 import json
 import os
+from .spatial_index import GridBucketIndex
 
 # deliveries config key
 deliveries = "deliveries1"
 
 class LocationsManager:
-    def __init__(self, config_path="pick_up_drop_off_config.json"):
+    def __init__(self, config_path="pick_up_drop_off_config.json", delivery_tasks=None):
         """
         Initialize the LocationsManager with a configuration file.
         Args:
             config_path (str): Path to the pickup/dropoff configuration file.
+            delivery_tasks (list): Tasks to use instead of reading config_path, in the same
+                format (e.g. from src.utils.map_generator).
         """
-        config_path = os.path.join(os.path.dirname(__file__), "../configs", os.path.basename(config_path))
-        with open(config_path, "r") as file:
-            self.delivery_tasks = json.load(file).get(deliveries, [])
+        if delivery_tasks is not None:
+            self.delivery_tasks = delivery_tasks
+        else:
+            config_path = os.path.join(os.path.dirname(__file__), "../configs", os.path.basename(config_path))
+            with open(config_path, "r") as file:
+                self.delivery_tasks = json.load(file).get(deliveries, [])
 
-        self.pick_up_points = {tuple(task["pick_up"]): task["id"] for task in self.delivery_tasks}
-        self.drop_off_points = {tuple(task["drop_off"]): task["id"] for task in self.delivery_tasks}
+        self.reset()
 
     def get_pick_up_points(self):
         """Return a dictionary of pickup points with their IDs."""
@@ -26,7 +31,50 @@ class LocationsManager:
         """Return a dictionary of dropoff points with their IDs."""
         return self.drop_off_points
 
+    def pick_up(self, position):
+        """
+        Remove an open pickup point once its package has been collected.
+        Returns:
+            The task ID of the pickup point, or None if there is no open pickup there.
+        """
+        self.pick_up_index.remove(position)
+        return self.pick_up_points.pop(position, None)
+
+    def drop_off(self, position):
+        """
+        Remove an open dropoff point once its package has been delivered.
+        Returns:
+            The task ID of the dropoff point, or None if there is no open dropoff there.
+        """
+        self.drop_off_index.remove(position)
+        return self.drop_off_points.pop(position, None)
+
+    def nearest_pick_up_points(self, position, k=1):
+        """Return up to k open pickup points closest (Manhattan) to position."""
+        return self.pick_up_index.k_nearest(position, k)
+
+    def nearest_drop_off_points(self, position, k=1, task_id=None):
+        """Return up to k open dropoff points closest to position, optionally only for one task."""
+        accept = None if task_id is None else (lambda point: self.drop_off_points[point] == task_id)
+        return self.drop_off_index.k_nearest(position, k, accept)
+
+    def pick_up_points_within(self, position, radius):
+        """Return the open pickup points within a Manhattan radius of position."""
+        return self.pick_up_index.within_radius(position, radius)
+
+    def drop_off_points_within(self, position, radius):
+        """Return the open dropoff points within a Manhattan radius of position."""
+        return self.drop_off_index.within_radius(position, radius)
+
     def reset(self):
         """Reset pickup/dropoff points to their initial state."""
         self.pick_up_points = {tuple(task["pick_up"]): task["id"] for task in self.delivery_tasks}
         self.drop_off_points = {tuple(task["drop_off"]): task["id"] for task in self.delivery_tasks}
+
+        # Spatial indexes over the open points, kept in step by pick_up()/drop_off()
+        self.pick_up_index = GridBucketIndex()
+        self.drop_off_index = GridBucketIndex()
+        for point in self.pick_up_points:
+            self.pick_up_index.insert(point)
+        for point in self.drop_off_points:
+            self.drop_off_index.insert(point)
@@ -0,0 +1,71 @@
+import numpy as np
+
+DAY_MINUTES = 24 * 60
+
+
+class SafeIntervalTable:
+    def __init__(self, environment, horizon=2 * DAY_MINUTES):
+        """
+        Per-cell safe (zone-free) time intervals derived from the event timeline.
+        Times are minutes counted from midnight. The table only depends on the event patterns
+        and the open pickup/dropoff points, so one table answers queries at any time of day.
+        Args:
+            environment (Environment): Supplies the event patterns and the open pickup/dropoff
+                points (which always stay safe).
+            horizon (int): Minutes after the query time covered by intervals().
+        """
+        self.horizon = horizon
+        end_time = DAY_MINUTES + horizon
+        patterns = environment.event_simulator.event_patterns if environment.event_simulator else []
+
+        # Blocked mask of every slot, and the absolute segments during which each slot applies
+        self.blocked = np.zeros((max(len(patterns), 1), environment.grid_size, environment.grid_size), dtype=bool)
+        for slot in range(len(patterns)):
+            obstacle_mask, no_fly_mask = environment.get_slot_zone_masks(slot)
+            self.blocked[slot] = obstacle_mask | no_fly_mask
+        self.segments = []  # (start, end, slot)
+        for day in range(end_time // DAY_MINUTES + 1):
+            for slot, pattern in enumerate(patterns):
+                start, end = pattern.get("time_range", (0, 0))
+                start, end = day * DAY_MINUTES + start, day * DAY_MINUTES + end
+                if start < end_time:
+                    self.segments.append((start, min(end, end_time), slot))
+        self.segments.sort()
+        self._blocked_segments = {}  # cell -> segments during which a zone covers it
+        self._now = None
+        self._cache = {}
+
+    def intervals(self, cell, now, occupied=False):
+        """
+        Safe intervals of one cell from a time of day on.
+        Args:
+            cell (tuple): (x, y) cell.
+            now (int): Minute of the day the intervals start at; they end horizon minutes later.
+            occupied (bool): The drone is already in the cell, so a zone covering it right now
+                does not force it out before it chooses to leave.
+        Returns:
+            list: Sorted, disjoint (start, end) half-open intervals.
+        """
+        if now != self._now:
+            self._now, self._cache = now, {}
+        key = (cell, occupied)
+        if key not in self._cache:
+            if cell not in self._blocked_segments:
+                blocked_slots = self.blocked[:, cell[0], cell[1]]
+                self._blocked_segments[cell] = [
+                    (start, end) for start, end, slot in self.segments if blocked_slots[slot]]
+            end_time = now + self.horizon
+            free = []
+            cursor = now
+            for start, end in self._blocked_segments[cell]:
+                if start >= end_time:
+                    break
+                if end <= now or (occupied and start <= now):
+                    continue
+                if start > cursor:
+                    free.append((cursor, start))
+                cursor = max(cursor, end)
+            if cursor < end_time:
+                free.append((cursor, end_time))
+            self._cache[key] = free
+        return self._cache[key]
@@ -0,0 +1,103 @@
+import itertools
+from collections import defaultdict
+
+
+class GridBucketIndex:
+    def __init__(self, bucket_size=8):
+        """
+        Spatial index over grid points using square buckets and Manhattan distance.
+        Ties are broken by insertion order, matching a linear scan over an insertion-ordered dict.
+        Args:
+            bucket_size (int): Side length of a bucket in cells.
+        """
+        self.bucket_size = bucket_size
+        self.buckets = defaultdict(dict)  # (bx, by) -> {point: insertion order}
+        self.points = {}  # point -> bucket
+        self._order = itertools.count()
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, point):
+        return point in self.points
+
+    def _bucket(self, point):
+        """Return the bucket key of a point."""
+        return point[0] // self.bucket_size, point[1] // self.bucket_size
+
+    def insert(self, point):
+        """Add a point (no-op if it is already indexed)."""
+        if point in self.points:
+            return
+        bucket = self._bucket(point)
+        self.buckets[bucket][point] = next(self._order)
+        self.points[point] = bucket
+
+    def remove(self, point):
+        """Remove a point if it is indexed."""
+        bucket = self.points.pop(point, None)
+        if bucket is None:
+            return
+        del self.buckets[bucket][point]
+        if not self.buckets[bucket]:
+            del self.buckets[bucket]
+
+    def _ring(self, center, radius):
+        """Yield the occupied buckets at Chebyshev bucket distance radius from center."""
+        cx, cy = center
+        if radius == 0:
+            candidates = [center]
+        else:
+            candidates = [(cx + dx, cy + dy) for dx in range(-radius, radius + 1) for dy in (-radius, radius)]
+            candidates += [(cx + dx, cy + dy) for dx in (-radius, radius) for dy in range(-radius + 1, radius)]
+        for bucket in candidates:
+            if bucket in self.buckets:
+                yield bucket
+
+    def k_nearest(self, position, k=1, accept=None):
+        """
+        Find the k points closest to position.
+        Args:
+            position (tuple): (x, y) query position.
+            k (int): Number of points to return.
+            accept (callable): Optional point -> bool filter.
+        Returns:
+            list: Up to k points ordered by (distance, insertion order).
+        """
+        if k <= 0:
+            return []
+        center = self._bucket(position)
+        found = []
+        examined = 0
+        radius = 0
+        while examined < len(self.points):
+            for bucket in self._ring(center, radius):
+                for point, order in self.buckets[bucket].items():
+                    examined += 1
+                    if accept is None or accept(point):
+                        distance = abs(point[0] - position[0]) + abs(point[1] - position[1])
+                        found.append((distance, order, point))
+            found.sort()
+            del found[k:]
+            # Anything in a farther ring is at least radius * bucket_size + 1 away
+            if len(found) == k and found[-1][0] <= radius * self.bucket_size:
+                break
+            radius += 1
+        return [point for _, _, point in found]
+
+    def within_radius(self, position, radius):
+        """
+        Find every point within a Manhattan radius of position.
+        Returns:
+            list: Points ordered by (distance, insertion order).
+        """
+        center = self._bucket(position)
+        reach = -(-radius // self.bucket_size)
+        found = []
+        for bucket_radius in range(reach + 1):
+            for bucket in self._ring(center, bucket_radius):
+                for point, order in self.buckets[bucket].items():
+                    distance = abs(point[0] - position[0]) + abs(point[1] - position[1])
+                    if distance <= radius:
+                        found.append((distance, order, point))
+        return [point for _, _, point in sorted(found)]
@@ -0,0 +1,222 @@
+import numpy as np
+
+DAY_MINUTES = 24 * 60
+# (dx, dy) of every move
+ACTION_OFFSETS = {"UP": (0, -1), "DOWN": (0, 1), "LEFT": (-1, 0), "RIGHT": (1, 0)}
+# Open pickups/dropoffs are kept as bits of one int64 per lane
+MAX_POINTS = 62
+# Largest (open pickup sets x cells x pickups) nearest-pickup table precomputed; beyond it
+# the nearest pickup is searched every step
+NEAREST_TABLE_LIMIT = 1 << 22
+
+
+class VectorEnvironment:
+    def __init__(self, environment, num_envs, actions, task_ids=()):
+        """
+        Many copies of the delivery episode stepped together as NumPy arrays.
+        Each lane follows the rules of QLearningTrainer.train(): moves into active zones are
+        unavailable, pickup/dropoff cells still open override the zones, and the zones follow
+        the event pattern of the lane's own clock.
+        Args:
+            environment (Environment): Template supplying the grid, event patterns and tasks.
+            num_envs (int): Number of lanes.
+            actions (list): Action names (keys of ACTION_OFFSETS), in the Q-table's order.
+            task_ids (list): Task order used for the "delivery"/"remaining" features.
+        """
+        self.grid_size = environment.grid_size
+        self.time_step = environment.time_step
+        self.num_envs = num_envs
+        self.actions = list(actions)
+        self.offsets = np.array([ACTION_OFFSETS[action] for action in self.actions], dtype=np.int64)
+        self.task_index = {task_id: i for i, task_id in enumerate(task_ids)}
+        num_cells = self.grid_size * self.grid_size
+
+        # Zone layout of every slot, plus an empty last one for times no pattern covers
+        simulator = environment.event_simulator
+        patterns = simulator.event_patterns if simulator else []
+        slot_blocked = np.zeros((len(patterns) + 1, self.grid_size, self.grid_size), dtype=bool)
+        for slot in range(len(patterns)):
+            obstacle_mask, no_fly_mask = environment.get_slot_zone_masks(slot, apply_priority=False)
+            slot_blocked[slot] = obstacle_mask | no_fly_mask
+        slots = [simulator.get_pattern_index(tick * self.time_step) if simulator else None
+                 for tick in range(DAY_MINUTES // self.time_step)]
+        self.tick_slots = np.array([len(patterns) if slot is None else slot for slot in slots], dtype=np.int64)
+        self.tick_features = np.array([0 if slot is None else slot for slot in slots], dtype=np.int64)
+
+        # Pickup and dropoff entries in the order the LocationsManager dicts keep them
+        locations_manager = environment.locations_manager
+        locations_manager.reset()
+        pick_ups = list(locations_manager.get_pick_up_points().items())
+        drop_offs = list(locations_manager.get_drop_off_points().items())
+        if max(len(pick_ups), len(drop_offs)) > MAX_POINTS:
+            raise ValueError(f"VectorEnvironment supports up to {MAX_POINTS} pickups and dropoffs")
+        pick_ids = [task_id for _, task_id in pick_ups]
+        self.pick_cells = np.array([cell for cell, _ in pick_ups], dtype=np.int64).reshape(-1, 2)
+        # Encoder task index of each pickup entry, with a trailing -1 for "none"
+        self.pick_tasks = np.array([self.task_index.get(task_id, -1) for task_id in pick_ids] + [-1], dtype=np.int64)
+        drop_cells = np.array([cell for cell, _ in drop_offs], dtype=np.int64).reshape(-1, 2)
+        # Pickup entry of the delivery each dropoff entry completes (-1 if none)
+        self.drop_deliveries = np.array(
+            [pick_ids.index(task_id) if task_id in pick_ids else -1 for _, task_id in drop_offs], dtype=np.int64
+        )
+        self.all_picks = (1 << len(pick_ups)) - 1
+        self.all_drops = (1 << len(drop_offs)) - 1
+
+        # Entry index of the pickup/dropoff at every cell, -1 where there is none
+        self.pick_at = np.full(num_cells, -1, dtype=np.int64)
+        self.pick_at[self.pick_cells[:, 0] * self.grid_size + self.pick_cells[:, 1]] = np.arange(len(pick_ups))
+        self.drop_at = np.full(num_cells, -1, dtype=np.int64)
+        self.drop_at[drop_cells[:, 0] * self.grid_size + drop_cells[:, 1]] = np.arange(len(drop_offs))
+
+        # Per (slot, cell, action): whether the move is open ignoring pickup/dropoff priority,
+        # and whether it enters a zone cell that an open pickup/dropoff would unblock
+        xs, ys = np.indices((self.grid_size, self.grid_size))
+        nx = xs.ravel()[:, None] + self.offsets[None, :, 0]
+        ny = ys.ravel()[:, None] + self.offsets[None, :, 1]
+        inside = (0 <= nx) & (nx < self.grid_size) & (0 <= ny) & (ny < self.grid_size)
+        nx, ny = np.clip(nx, 0, self.grid_size - 1), np.clip(ny, 0, self.grid_size - 1)
+        self.move_targets = nx * self.grid_size + ny
+        self.target_pick = self.pick_at[self.move_targets]
+        self.target_drop = self.drop_at[self.move_targets]
+        blocked = slot_blocked[:, nx, ny]
+        self.open_moves = inside[None] & ~blocked
+        self.guarded_moves = inside[None] & blocked & ((self.target_pick >= 0) | (self.target_drop >= 0))[None]
+
+        # Manhattan distance from every cell to every pickup, and the nearest open pickup of
+        # every (open pickup set, cell) when that table is small enough
+        self.pick_distance = (np.abs(xs.ravel()[:, None] - self.pick_cells[None, :, 0])
+                              + np.abs(ys.ravel()[:, None] - self.pick_cells[None, :, 1]))
+        self.nearest_table = None
+        if (self.all_picks + 1) * num_cells * max(len(pick_ups), 1) <= NEAREST_TABLE_LIMIT:
+            masks = np.arange(self.all_picks + 1, dtype=np.int64)
+            nearest = self._nearest(np.repeat(masks, num_cells), np.tile(np.arange(num_cells), len(masks)))
+            self.nearest_table = nearest.reshape(len(masks), num_cells)
+        self.start = environment.drone_pos[0] * self.grid_size + environment.drone_pos[1]
+
+        self.cells = np.zeros(num_envs, dtype=np.int64)  # x * grid_size + y
+        self.ticks = np.zeros(num_envs, dtype=np.int64)
+        self.carrying = np.zeros(num_envs, dtype=bool)
+        self.delivery = np.full(num_envs, -1, dtype=np.int64)  # pickup entry being delivered
+        self.pick_open = np.zeros(num_envs, dtype=np.int64)  # bit per open pickup entry
+        self.drop_open = np.zeros(num_envs, dtype=np.int64)  # bit per open dropoff entry
+
+    def positions(self, lanes):
+        """(xs, ys) of the lanes."""
+        return np.divmod(self.cells[lanes], self.grid_size)
+
+    def reset(self, lanes):
+        """Start new episodes in the given lanes."""
+        self.cells[lanes] = self.start
+        self.ticks[lanes] = 0
+        self.carrying[lanes] = False
+        self.delivery[lanes] = -1
+        self.pick_open[lanes] = self.all_picks
+        self.drop_open[lanes] = self.all_drops
+
+    def layout(self, lanes):
+        """Snapshot of what decides the zones of the lanes: (zone slot, open pickups, open dropoffs)."""
+        return self.tick_slots[self.ticks[lanes]], self.pick_open[lanes], self.drop_open[lanes]
+
+    def valid_actions(self, lanes, layout=None):
+        """
+        (lanes x actions) bool mask of the moves available at the lanes' positions.
+        Args:
+            layout (tuple): A layout() snapshot to judge the zones by instead of the current one.
+        """
+        slots, pick_open, drop_open = layout if layout is not None else self.layout(lanes)
+        cells = self.cells[lanes]
+        valid = self.open_moves[slots, cells]
+        # Open pickup/dropoff cells take priority over the zones
+        rows, columns = np.nonzero(self.guarded_moves[slots, cells])
+        if len(rows):
+            picks = self.target_pick[cells[rows], columns]
+            drops = self.target_drop[cells[rows], columns]
+            valid[rows, columns] = (((picks >= 0) & ((pick_open[rows] >> np.maximum(picks, 0)) & 1).astype(bool))
+                                    | ((drops >= 0) & ((drop_open[rows] >> np.maximum(drops, 0)) & 1).astype(bool)))
+        return valid
+
+    def _nearest(self, pick_open, cells):
+        """Nearest open pickup entry (first in dict order on ties) of each (open set, cell), -1 if none."""
+        if not len(self.pick_cells):
+            return np.full(len(cells), -1, dtype=np.int64)
+        is_open = ((pick_open[:, None] >> np.arange(len(self.pick_cells))) & 1).astype(bool)
+        distances = np.where(is_open, self.pick_distance[cells], np.iinfo(np.int64).max)
+        return np.where(pick_open > 0, distances.argmin(axis=1), -1)
+
+    def nearest_pick_up(self, lanes):
+        """Index of the open pickup entry closest to each lane, -1 if none is open."""
+        if self.nearest_table is not None:
+            return self.nearest_table[self.pick_open[lanes], self.cells[lanes]]
+        return self._nearest(self.pick_open[lanes], self.cells[lanes])
+
+    def features(self, lanes, names):
+        """
+        StateEncoder features of the lanes.
+        Args:
+            names (tuple): Features to compute.
+        Returns:
+            dict: Feature name -> (lanes,) values.
+        """
+        values = {}
+        for name in names:
+            if name == "carrying":
+                values[name] = self.carrying[lanes].astype(np.int64)
+            elif name == "delivery":
+                values[name] = self.pick_tasks[self.delivery[lanes]] + 1
+            elif name == "remaining":
+                pick_open = self.pick_open[lanes]
+                remaining = np.zeros(len(lanes), dtype=np.int64)
+                for entry, task in enumerate(self.pick_tasks[:-1].tolist()):
+                    if task >= 0:
+                        remaining |= ((pick_open >> entry) & 1) << task
+                values[name] = remaining
+            elif name == "next_target":
+                target = np.where(self.carrying[lanes], self.delivery[lanes], self.nearest_pick_up(lanes))
+                values[name] = self.pick_tasks[target] + 1
+            elif name == "time_slot":
+                values[name] = self.tick_features[self.ticks[lanes]]
+        return values
+
+    def step(self, lanes, actions):
+        """
+        Move the lanes and handle pickups/dropoffs, with the rewards of train(): +50 for a
+        pickup, +100 for a dropoff, and +10/-5 for moving closer to/away from the nearest open
+        pickup. Like train(), no shaping is given while carrying. The clock is not advanced.
+        Args:
+            lanes (np.ndarray): Lane indices.
+            actions (np.ndarray): Action column of each lane (must be valid).
+        Returns:
+            np.ndarray: (lanes,) rewards.
+        """
+        old_cells = self.cells[lanes]
+        cells = self.move_targets[old_cells, actions]
+        self.cells[lanes] = cells
+        carrying, delivery = self.carrying[lanes], self.delivery[lanes]
+        pick_open, drop_open = self.pick_open[lanes], self.drop_open[lanes]
+
+        picked, dropped = self.pick_at[cells], self.drop_at[cells]
+        picking = (picked >= 0) & ((pick_open >> np.maximum(picked, 0)) & 1).astype(bool) & ~carrying
+        dropping = ((dropped >= 0) & ((drop_open >> np.maximum(dropped, 0)) & 1).astype(bool) & carrying
+                    & (self.drop_deliveries[np.maximum(dropped, 0)] == delivery) & ~picking)
+        self.pick_open[lanes] = np.where(picking, pick_open & ~(1 << np.maximum(picked, 0)), pick_open)
+        self.drop_open[lanes] = np.where(dropping, drop_open & ~(1 << np.maximum(dropped, 0)), drop_open)
+        carrying = (carrying | picking) & ~dropping
+        self.carrying[lanes] = carrying
+        self.delivery[lanes] = np.where(picking, picked, np.where(dropping, -1, delivery))
+        rewards = 50 * picking + 100 * dropping
+
+        if not len(self.pick_cells):
+            return rewards
+        goal = self.nearest_pick_up(lanes)
+        shaped = ~carrying & (goal >= 0)
+        goal = np.maximum(goal, 0)
+        closer = self.pick_distance[cells, goal] < self.pick_distance[old_cells, goal]
+        return rewards + np.where(shaped, np.where(closer, 10, -5), 0)
+
+    def advance_time(self, lanes):
+        """Advance the lanes' clocks by one time step."""
+        self.ticks[lanes] = (self.ticks[lanes] + 1) % len(self.tick_slots)
+
+    def finished(self, lanes):
+        """Whether each lane has delivered everything."""
+        return (self.pick_open[lanes] == 0) & ~self.carrying[lanes]
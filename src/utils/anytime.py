@@ -0,0 +1,122 @@
+import heapq
+import itertools
+import time
+
+
+class AnytimeSearch:
+    def __init__(self, start, goal, successors, heuristic, initial_epsilon=3.0, epsilon_step=0.5):
+        """
+        ARA*: weighted A* whose inflation factor shrinks towards 1 while time allows.
+        The search state persists between calls, so each search() resumes where the
+        previous budget ran out.
+        Args:
+            start (tuple): Start node.
+            goal (tuple): Goal node.
+            successors (callable): (node, g) -> iterable of (neighbor, step cost).
+            heuristic (callable): node -> consistent lower bound on the cost to goal.
+            initial_epsilon (float): Heuristic inflation of the first search.
+            epsilon_step (float): Amount epsilon is lowered after each completed search.
+        """
+        self.start = start
+        self.goal = goal
+        self.successors = successors
+        self.heuristic = heuristic
+        self.epsilon = initial_epsilon
+        self.epsilon_step = epsilon_step
+        self.expansions = 0
+
+        self.g_score = {start: 0}
+        self.came_from = {}
+        self.open = {start}
+        self.closed = set()
+        self.incons = set()
+        self._tie = itertools.count()
+        self._queue = [(self._key(start), next(self._tie), start)]
+
+        self.best_path = None
+        self.best_cost = float("inf")
+        self.bound = float("inf")  # best_cost / optimal cost is at most this
+        self.done = False
+
+    def _key(self, node):
+        """Inflated f-value used to order OPEN."""
+        return self.g_score[node] + self.epsilon * self.heuristic(node)
+
+    def search(self, time_budget=None, expansion_budget=None):
+        """
+        Continue the search until it is optimal or a budget runs out.
+        Args:
+            time_budget (float): Wall-clock seconds this call may spend.
+            expansion_budget (int): Node expansions this call may perform.
+        Returns:
+            tuple: (best path found so far excluding start or None, suboptimality bound).
+        """
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        expansion_limit = None if expansion_budget is None else self.expansions + expansion_budget
+
+        while not self.done:
+            if not self._improve_path(deadline, expansion_limit):
+                break  # Out of budget; keep the state for the next call
+            self._publish_solution()
+            if self.bound <= 1 or not self.open and not self.incons:
+                self.done = True
+                break
+            # Tighten epsilon and reopen every inconsistent node under the new keys
+            self.epsilon = max(1.0, self.epsilon - self.epsilon_step)
+            self.open |= self.incons
+            self.incons = set()
+            self.closed = set()
+            self._queue = [(self._key(node), next(self._tie), node) for node in self.open]
+            heapq.heapify(self._queue)
+        return self.best_path, self.bound
+
+    def _improve_path(self, deadline, expansion_limit):
+        """Expand nodes for the current epsilon. Returns False if a budget ran out first."""
+        while self._queue:
+            key, _, node = self._queue[0]
+            if node not in self.open or key != self._key(node):
+                heapq.heappop(self._queue)  # Stale entry
+                continue
+            if self.g_score.get(self.goal, float("inf")) <= key:
+                return True
+            if (expansion_limit is not None and self.expansions >= expansion_limit) or (
+                deadline is not None and time.perf_counter() >= deadline
+            ):
+                return False
+
+            heapq.heappop(self._queue)
+            self.open.discard(node)
+            self.closed.add(node)
+            self.expansions += 1
+            g = self.g_score[node]
+            for neighbor, cost in self.successors(node, g):
+                tentative = g + cost
+                if tentative < self.g_score.get(neighbor, float("inf")):
+                    self.g_score[neighbor] = tentative
+                    self.came_from[neighbor] = node
+                    if neighbor in self.closed:
+                        self.incons.add(neighbor)
+                    else:
+                        self.open.add(neighbor)
+                        heapq.heappush(self._queue, (self._key(neighbor), next(self._tie), neighbor))
+        return True
+
+    def _publish_solution(self):
+        """Record the goal path and the bound proven by the search that just completed."""
+        goal_cost = self.g_score.get(self.goal, float("inf"))
+        if goal_cost == float("inf"):
+            return
+        if goal_cost < self.best_cost or self.best_path is None:
+            path = []
+            current = self.goal
+            while current != self.start:
+                path.append(current)
+                current = self.came_from[current]
+            path.reverse()
+            self.best_path = path
+            self.best_cost = goal_cost
+
+        # Every node that may still improve lies in OPEN or INCONS
+        frontier = [self.g_score[node] + self.heuristic(node) for node in self.open | self.incons]
+        lower_bound = min(frontier, default=goal_cost)
+        self.bound = min(self.epsilon, self.best_cost / lower_bound) if lower_bound > 0 else 1.0
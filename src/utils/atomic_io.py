@@ -0,0 +1,19 @@
+import json
+import os
+
+
+def atomic_write_json(path, data, indent=None):
+    """
+    Write data as JSON to path so readers see either the old file or the complete new one:
+    the JSON goes to a temporary file that is synced and then renamed over path.
+    Args:
+        path (str): File to (re)place.
+        data: JSON-serializable value.
+        indent (int): Optional json.dump indentation.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,92 @@
+from collections import OrderedDict
+import numpy as np
+from .grid_search import dijkstra_grid
+from .reward_function import NO_FLY_COST, OBSTACLE_COST
+
+# Action names and (dx, dy) moves, in the order used by the Q-learning agents
+ACTIONS = ["UP", "DOWN", "LEFT", "RIGHT"]
+ACTION_OFFSETS = np.array([(0, -1), (0, 1), (-1, 0), (1, 0)])
+
+
+class FlowFieldService:
+    def __init__(self, environment, max_fields=32, obstacle_cost=OBSTACLE_COST, no_fly_cost=NO_FLY_COST):
+        """
+        Goal-conditioned distance fields shared by every agent heading to the same goal.
+        One reverse Dijkstra per (goal, zone epoch) gives the cost-to-go of every cell, after
+        which choosing a move is an array lookup.
+        Args:
+            environment (Environment): Source of the zone masks and zone epoch.
+            max_fields (int): Number of fields kept before the least recently used is evicted.
+            obstacle_cost (float): Cost of entering an obstacle cell (np.inf to forbid it).
+            no_fly_cost (float): Cost of entering a no-fly cell (np.inf to forbid it).
+        """
+        self.environment = environment
+        self.max_fields = max_fields
+        self.obstacle_cost = obstacle_cost
+        self.no_fly_cost = no_fly_cost
+        self.fields = OrderedDict()  # (goal, zone epoch) -> (cost grid, distance field)
+        self.hits = 0
+        self.misses = 0
+
+    def get_field(self, goal):
+        """
+        Return (cost_grid, distance_field) for goal under the current zones.
+        distance_field[x, y] is the cost of the cheapest route from (x, y) to goal.
+        """
+        key = (tuple(goal), self.environment.zone_epoch)
+        if key in self.fields:
+            self.hits += 1
+            self.fields.move_to_end(key)
+            return self.fields[key]
+
+        self.misses += 1
+        obstacle_mask, no_fly_mask = self.environment.get_zone_masks()
+        cost_grid = np.where(obstacle_mask, float(self.obstacle_cost), np.where(no_fly_mask, float(self.no_fly_cost), 1.0))
+        entry = (cost_grid, dijkstra_grid(cost_grid, tuple(goal), reverse=True))
+        self.fields[key] = entry
+        if len(self.fields) > self.max_fields:
+            self.fields.popitem(last=False)
+        return entry
+
+    def distance(self, position, goal):
+        """Cost-to-go from position to goal (np.inf if unreachable)."""
+        return float(self.get_field(goal)[1][tuple(position)])
+
+    def next_actions(self, positions, goal):
+        """
+        Best action index for many positions at once.
+        Args:
+            positions (array-like): (N, 2) array of (x, y) positions.
+            goal (tuple): The shared (x, y) goal.
+        Returns:
+            np.ndarray: (N,) indices into ACTIONS, -1 where the drone is at the goal or stuck.
+        """
+        cost_grid, field = self.get_field(goal)
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+        # Cost of a move is entering the neighbour plus its cost-to-go; pad so edges cost inf
+        to_go = np.pad(cost_grid + field, 1, constant_values=np.inf)
+        neighbors = positions[:, None, :] + ACTION_OFFSETS[None, :, :] + 1
+        values = to_go[neighbors[..., 0], neighbors[..., 1]]
+        actions = np.argmin(values, axis=1)
+        stuck = ~np.isfinite(values[np.arange(len(positions)), actions])
+        at_goal = (positions == np.asarray(goal)).all(axis=1)
+        return np.where(stuck | at_goal, -1, actions)
+
+    def next_action(self, position, goal):
+        """Best action name from one position, or None at the goal or with no route."""
+        action = int(self.next_actions([position], goal)[0])
+        return ACTIONS[action] if action >= 0 else None
+
+    def path(self, start, goal):
+        """Follow the field from start to goal. Returns the cells after start, or None."""
+        _, field = self.get_field(goal)
+        if not np.isfinite(field[tuple(start)]):
+            return None
+        path = []
+        position = tuple(start)
+        while position != tuple(goal):
+            action = int(self.next_actions([position], goal)[0])
+            dx, dy = ACTION_OFFSETS[action]
+            position = (position[0] + int(dx), position[1] + int(dy))
+            path.append(position)
+        return path
@@ -0,0 +1,136 @@
+import heapq
+import numpy as np
+
+# 4-connected moves shared by every grid planner
+NEIGHBOR_OFFSETS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+
+def dijkstra_grid(cost_grid, source, reverse=False, region=None):
+    """
+    Exact single-source shortest distances over a 4-connected weighted grid.
+    Entering a cell costs cost_grid[x, y]; np.inf marks an impassable cell.
+    Args:
+        cost_grid (np.ndarray): (width x height) array of per-cell entry costs.
+        source (tuple): (x, y) cell the search starts from.
+        reverse (bool): If True, return distances *to* source instead of from it.
+        region (tuple): Optional (x0, y0, x1, y1) half-open bounds the search may not leave.
+    Returns:
+        np.ndarray: float64 distances over the region (the whole grid by default), indexed
+        relative to its corner, with np.inf where the cell cannot be reached.
+    """
+    width, height = cost_grid.shape
+    x0, y0, x1, y1 = region if region is not None else (0, 0, width, height)
+    costs = cost_grid[x0:x1, y0:y1].tolist()
+    dist = np.full((x1 - x0, y1 - y0), np.inf)
+    best = {source: 0.0}
+    queue = [(0.0, source)]
+
+    while queue:
+        d, current = heapq.heappop(queue)
+        if d > best[current]:
+            continue
+        x, y = current
+        dist[x - x0, y - y0] = d
+        leave_cost = costs[x - x0][y - y0]
+        for dx, dy in NEIGHBOR_OFFSETS:
+            nx, ny = x + dx, y + dy
+            if not (x0 <= nx < x1 and y0 <= ny < y1):
+                continue
+            enter_cost = costs[nx - x0][ny - y0]
+            step = leave_cost if reverse else enter_cost
+            # Never route through impassable cells, in either direction
+            if step == np.inf or enter_cost == np.inf:
+                continue
+            nd = d + step
+            neighbor = (nx, ny)
+            if nd < best.get(neighbor, np.inf):
+                best[neighbor] = nd
+                heapq.heappush(queue, (nd, neighbor))
+    return dist
+
+
+def astar_grid(cost_grid, start, goal, region=None):
+    """
+    A* over a 4-connected weighted grid with a Manhattan heuristic.
+    Args:
+        cost_grid (np.ndarray): (width x height) array of per-cell entry costs (all >= 1).
+        start (tuple): (x, y) start cell.
+        goal (tuple): (x, y) goal cell.
+        region (tuple): Optional (x0, y0, x1, y1) half-open bounds the search may not leave.
+    Returns:
+        tuple: (path excluding start, cost), or (None, np.inf) if goal cannot be reached.
+    """
+    width, height = cost_grid.shape
+    x0, y0, x1, y1 = region if region is not None else (0, 0, width, height)
+    costs = cost_grid[x0:x1, y0:y1].tolist()
+    gx, gy = goal
+    came_from = {}
+    g_score = {start: 0.0}
+    queue = [(abs(start[0] - gx) + abs(start[1] - gy), start)]
+
+    while queue:
+        _, current = heapq.heappop(queue)
+        if current == goal:
+            path = []
+            while current in came_from:
+                path.append(current)
+                current = came_from[current]
+            path.reverse()
+            return path, g_score[goal]
+        x, y = current
+        g = g_score[current]
+        for dx, dy in NEIGHBOR_OFFSETS:
+            nx, ny = x + dx, y + dy
+            if not (x0 <= nx < x1 and y0 <= ny < y1) or costs[nx - x0][ny - y0] == np.inf:
+                continue
+            tentative = g + costs[nx - x0][ny - y0]
+            neighbor = (nx, ny)
+            if tentative < g_score.get(neighbor, np.inf):
+                g_score[neighbor] = tentative
+                came_from[neighbor] = current
+                heapq.heappush(queue, (tentative + abs(nx - gx) + abs(ny - gy), neighbor))
+    return None, np.inf
+
+
+def bfs_grid_pairs(blocked, sources, targets):
+    """
+    Unit-cost distance from each source to its own target, all pairs searched at once.
+    Every cell holds a bitset of the searches that have reached it (64 per uint64 word),
+    so one wavefront step costs a few whole-grid operations per 64 pairs. The search stops
+    as soon as every target is reached or no wavefront can grow.
+    Args:
+        blocked (np.ndarray): Bool (width x height) mask of impassable cells.
+        sources (list): (x, y) cells to search from (a blocked source can still be left).
+        targets (list): (x, y) cell to reach from each source.
+    Returns:
+        np.ndarray: float64 (len(sources),) step counts, np.inf if unreachable.
+    """
+    width, height = blocked.shape
+    sources = np.asarray(sources, dtype=np.int64).reshape(-1, 2)
+    targets = np.asarray(targets, dtype=np.int64).reshape(-1, 2)
+    words, bits = np.divmod(np.arange(len(sources)), 64)
+    bits = np.left_shift(np.uint64(1), bits.astype(np.uint64))
+    passable = np.where(np.asarray(blocked, dtype=bool), np.uint64(0), np.iinfo(np.uint64).max)
+    frontier = np.zeros(((len(sources) + 63) // 64, width, height), dtype=np.uint64)
+    np.bitwise_or.at(frontier, (words, sources[:, 0], sources[:, 1]), bits)
+    seen = frontier.copy()
+    dist = np.full(len(sources), np.inf)
+    pending = np.ones(len(sources), dtype=bool)
+    step = 0
+    while True:
+        reached = pending & (frontier[words, targets[:, 0], targets[:, 1]] & bits != 0)
+        dist[reached] = step
+        pending &= ~reached
+        if not pending.any():
+            break
+        grown = np.zeros_like(frontier)
+        grown[:, 1:, :] |= frontier[:, :-1, :]
+        grown[:, :-1, :] |= frontier[:, 1:, :]
+        grown[:, :, 1:] |= frontier[:, :, :-1]
+        grown[:, :, :-1] |= frontier[:, :, 1:]
+        frontier = grown & passable & ~seen
+        if not frontier.any():
+            break
+        seen |= frontier
+        step += 1
+    return dist
@@ -0,0 +1,228 @@
+import heapq
+import itertools
+import numpy as np
+from .grid_search import astar_grid, dijkstra_grid
+
+# Border runs at least this long get an entrance at each end instead of one in the middle
+ENTRANCE_SPLIT_LENGTH = 6
+
+
+class HierarchicalPlanner:
+    def __init__(self, cost_grid, cluster_size=10):
+        """
+        HPA* planner: partitions the grid into square clusters joined by entrance cells.
+        Args:
+            cost_grid (np.ndarray): (width x height) per-cell entry costs, indexed [x, y].
+            cluster_size (int): Side length of a cluster in cells.
+        """
+        self.cost_grid = np.array(cost_grid, dtype=np.float64)
+        self.cluster_size = cluster_size
+        width, height = self.cost_grid.shape
+        self.num_clusters = (-(-width // cluster_size), -(-height // cluster_size))
+        self.transitions = {}  # (cluster, neighbor cluster) -> [(cell, neighbor cell), ...]
+        self.nodes = {}  # cluster -> entrance cells inside it
+        self.intra_edges = {}  # cluster -> {cell: {cell: cost}} within the cluster
+        self.inter_edges = {}  # cell -> {cell: cost} across a cluster border
+        self.refined = {}  # (cluster, cell, cell) -> cached low-level path
+        self.build()
+
+    def cluster_of(self, cell):
+        """Return the (cx, cy) cluster containing a cell."""
+        return cell[0] // self.cluster_size, cell[1] // self.cluster_size
+
+    def region(self, cluster):
+        """Return the half-open (x0, y0, x1, y1) bounds of a cluster."""
+        width, height = self.cost_grid.shape
+        x0, y0 = cluster[0] * self.cluster_size, cluster[1] * self.cluster_size
+        return x0, y0, min(x0 + self.cluster_size, width), min(y0 + self.cluster_size, height)
+
+    def build(self):
+        """Precompute every entrance and every intra-cluster entrance-to-entrance cost."""
+        self.transitions, self.nodes, self.intra_edges, self.inter_edges, self.refined = {}, {}, {}, {}, {}
+        clusters = list(itertools.product(range(self.num_clusters[0]), range(self.num_clusters[1])))
+        for border in {border for cluster in clusters for border in self._borders(cluster)}:
+            self._build_border(border)
+        for cluster in clusters:
+            self.nodes[cluster] = self._collect_nodes(cluster)
+            self._build_cluster(cluster)
+
+    def update(self, cost_grid, changed_cells=None):
+        """
+        Bring the abstract graph in line with a new cost grid, rebuilding only affected clusters.
+        Args:
+            cost_grid (np.ndarray): The new per-cell entry costs.
+            changed_cells (iterable): (x, y) cells whose cost may have changed. If None they
+                are found by comparing against the previous grid.
+        Returns:
+            set: The clusters that were rebuilt.
+        """
+        cost_grid = np.asarray(cost_grid, dtype=np.float64)
+        if changed_cells is None:
+            changed_cells = zip(*np.nonzero(cost_grid != self.cost_grid))
+        self.cost_grid = np.array(cost_grid)
+
+        width, height = self.cost_grid.shape
+        touched = {self.cluster_of(cell) for cell in changed_cells if 0 <= cell[0] < width and 0 <= cell[1] < height}
+        borders = {border for cluster in touched for border in self._borders(cluster)}
+        for border in borders:
+            self._build_border(border)
+
+        # Neighbours only need new intra edges if their entrance cells moved
+        rebuilt = set(touched)
+        for cluster in {cluster for border in borders for cluster in border}:
+            nodes = self._collect_nodes(cluster)
+            if nodes != self.nodes.get(cluster):
+                self.nodes[cluster] = nodes
+                rebuilt.add(cluster)
+        for cluster in rebuilt:
+            self._build_cluster(cluster)
+        return rebuilt
+
+    def _borders(self, cluster):
+        """Return the (lower cluster, upper cluster) keys of every border around a cluster."""
+        cx, cy = cluster
+        borders = []
+        for other in ((cx - 1, cy), (cx + 1, cy), (cx, cy - 1), (cx, cy + 1)):
+            if 0 <= other[0] < self.num_clusters[0] and 0 <= other[1] < self.num_clusters[1]:
+                borders.append((min(cluster, other), max(cluster, other)))
+        return borders
+
+    def _build_border(self, border):
+        """Place entrances along the shared border of two adjacent clusters."""
+        for cell_a, cell_b in self.transitions.get(border, []):
+            self.inter_edges[cell_a].pop(cell_b, None)
+            self.inter_edges[cell_b].pop(cell_a, None)
+
+        lower, upper = border
+        x0, y0, x1, y1 = self.region(lower)
+        if upper[0] != lower[0]:
+            pairs = [((x1 - 1, y), (x1, y)) for y in range(y0, y1)]
+        else:
+            pairs = [((x, y1 - 1), (x, y1)) for x in range(x0, x1)]
+
+        # Split the border into runs of passable pairs with the same crossing cost
+        transitions = []
+        run = []
+        for pair in pairs + [None]:
+            key = None if pair is None else self.cost_grid[pair[0]] + self.cost_grid[pair[1]]
+            if run and (key is None or key == np.inf or key != run[-1][1]):
+                if len(run) >= ENTRANCE_SPLIT_LENGTH:
+                    transitions += [run[0][0], run[-1][0]]
+                else:
+                    transitions.append(run[len(run) // 2][0])
+                run = []
+            if key is not None and key != np.inf:
+                run.append((pair, key))
+
+        for cell_a, cell_b in transitions:
+            self.inter_edges.setdefault(cell_a, {})[cell_b] = self.cost_grid[cell_b]
+            self.inter_edges.setdefault(cell_b, {})[cell_a] = self.cost_grid[cell_a]
+        self.transitions[border] = transitions
+
+    def _collect_nodes(self, cluster):
+        """Return the entrance cells lying inside a cluster."""
+        nodes = set()
+        for border in self._borders(cluster):
+            for pair in self.transitions.get(border, []):
+                nodes.update(cell for cell in pair if self.cluster_of(cell) == cluster)
+        return nodes
+
+    def _build_cluster(self, cluster):
+        """Recompute entrance-to-entrance costs inside one cluster."""
+        x0, y0, x1, y1 = region = self.region(cluster)
+        edges = {}
+        for node in self.nodes.get(cluster, ()):
+            dist = dijkstra_grid(self.cost_grid, node, region=region)
+            edges[node] = {
+                other: float(dist[other[0] - x0, other[1] - y0])
+                for other in self.nodes[cluster]
+                if other != node and np.isfinite(dist[other[0] - x0, other[1] - y0])
+            }
+        self.intra_edges[cluster] = edges
+        self.refined = {key: path for key, path in self.refined.items() if key[0] != cluster}
+
+    def abstract_path(self, start, goal):
+        """
+        Search the abstract graph of entrances.
+        Returns:
+            tuple: ([start, entrance, ..., goal], cost), or (None, np.inf) if unreachable.
+        """
+        if start == goal:
+            return [start], 0.0
+        start_cluster, goal_cluster = self.cluster_of(start), self.cluster_of(goal)
+        if max(abs(start_cluster[0] - goal_cluster[0]), abs(start_cluster[1] - goal_cluster[1])) <= 1:
+            # Entrances make short hops across a border detour badly, so search nearby goals directly
+            x0, y0, _, _ = self.region((min(start_cluster[0], goal_cluster[0]), min(start_cluster[1], goal_cluster[1])))
+            _, _, x1, y1 = self.region((max(start_cluster[0], goal_cluster[0]), max(start_cluster[1], goal_cluster[1])))
+            path, cost = astar_grid(self.cost_grid, start, goal, region=(x0, y0, x1, y1))
+            if path is not None:
+                return [start] + path, cost
+        sx0, sy0, _, _ = start_region = self.region(start_cluster)
+        gx0, gy0, _, _ = goal_region = self.region(goal_cluster)
+        from_start = dijkstra_grid(self.cost_grid, start, region=start_region)
+        to_goal = dijkstra_grid(self.cost_grid, goal, reverse=True, region=goal_region)
+
+        # Temporarily splice start and goal into the graph
+        start_edges = {node: from_start[node[0] - sx0, node[1] - sy0] for node in self.nodes[start_cluster]}
+        if start_cluster == goal_cluster:
+            start_edges[goal] = from_start[goal[0] - sx0, goal[1] - sy0]
+        goal_edges = {node: to_goal[node[0] - gx0, node[1] - gy0] for node in self.nodes[goal_cluster]}
+
+        tie = itertools.count()
+        queue = [(0.0, next(tie), start)]
+        g_score = {start: 0.0}
+        came_from = {}
+        closed = set()
+        while queue:
+            _, _, current = heapq.heappop(queue)
+            if current in closed:
+                continue
+            if current == goal:
+                path = [goal]
+                while path[-1] != start:
+                    path.append(came_from[path[-1]])
+                path.reverse()
+                return path, g_score[goal]
+            closed.add(current)
+
+            if current == start:
+                successors = list(start_edges.items())
+                # A start on an entrance also keeps its own edges, including the border crossing
+                successors += self.intra_edges[start_cluster].get(start, {}).items()
+                successors += self.inter_edges.get(start, {}).items()
+            else:
+                successors = list(self.intra_edges[self.cluster_of(current)].get(current, {}).items())
+                successors += self.inter_edges.get(current, {}).items()
+                if current in goal_edges:
+                    successors.append((goal, goal_edges[current]))
+            for neighbor, cost in successors:
+                tentative = g_score[current] + cost
+                if tentative < g_score.get(neighbor, np.inf):
+                    g_score[neighbor] = tentative
+                    came_from[neighbor] = current
+                    estimate = abs(neighbor[0] - goal[0]) + abs(neighbor[1] - goal[1])
+                    heapq.heappush(queue, (tentative + estimate, next(tie), neighbor))
+        return None, np.inf
+
+    def iter_path(self, abstract_path):
+        """Lazily refine an abstract path into grid cells (excluding its first cell)."""
+        for current, target in zip(abstract_path, abstract_path[1:]):
+            cluster = self.cluster_of(current)
+            if cluster != self.cluster_of(target):
+                yield target
+                continue
+            key = (cluster, current, target)
+            path = self.refined.get(key)
+            if path is None:
+                path, _ = astar_grid(self.cost_grid, current, target, region=self.region(cluster))
+                # Only entrance-to-entrance segments are reused by later queries
+                if current in self.nodes[cluster] and target in self.nodes[cluster]:
+                    self.refined[key] = path
+            yield from path
+
+    def find_path(self, start, goal):
+        """Return the refined path from start to goal (excluding start), or None."""
+        abstract_path, _ = self.abstract_path(start, goal)
+        if abstract_path is None:
+            return None
+        return list(self.iter_path(abstract_path))
@@ -0,0 +1,60 @@
+import numpy as np
+from .grid_search import dijkstra_grid
+
+
+class LandmarkHeuristic:
+    def __init__(self, cost_grid, num_landmarks=4):
+        """
+        Precompute an ALT (A*, Landmarks, Triangle inequality) heuristic for one cost grid.
+        Args:
+            cost_grid (np.ndarray): (grid_size x grid_size) per-cell entry costs, indexed [x, y].
+            num_landmarks (int): Number of landmark cells to select.
+        """
+        self.cost_grid = np.asarray(cost_grid, dtype=np.float64)
+        self.landmarks = []
+        self.distances = np.empty((0,) + self.cost_grid.shape)
+        self._select_landmarks(num_landmarks)
+
+    def _select_landmarks(self, num_landmarks):
+        """Pick landmarks by farthest-point selection, storing exact distances from each."""
+        # Seed from the corner, then repeatedly take the cell farthest from all chosen landmarks
+        closest = dijkstra_grid(self.cost_grid, (0, 0))
+        distances = []
+        for _ in range(num_landmarks):
+            reachable = np.where(np.isfinite(closest), closest, -1)
+            landmark = tuple(int(i) for i in np.unravel_index(np.argmax(reachable), reachable.shape))
+            if landmark in self.landmarks:
+                break
+            dist = dijkstra_grid(self.cost_grid, landmark)
+            self.landmarks.append(landmark)
+            distances.append(dist)
+            closest = dist if len(distances) == 1 else np.minimum(closest, dist)
+        if distances:
+            self.distances = np.stack(distances)
+
+    def estimate(self, position, goal):
+        """Lower bound on the cost of reaching goal from position."""
+        return float(self.heuristic_field(goal)[position])
+
+    def heuristic_field(self, goal):
+        """
+        Lower bounds on the cost to reach goal from every cell.
+        Entry costs make distances asymmetric, but d(v, L) = d(L, v) - c(v) + c(L) for any
+        path, so one Dijkstra per landmark bounds both triangle-inequality directions.
+        Returns:
+            np.ndarray: (grid_size x grid_size) admissible estimates.
+        """
+        xs, ys = np.indices(self.cost_grid.shape)
+        manhattan = np.abs(xs - goal[0]) + np.abs(ys - goal[1])
+        if not self.landmarks:
+            return manhattan.astype(np.float64)
+
+        d_lv = self.distances
+        d_lt = self.distances[:, goal[0], goal[1]][:, None, None]
+        with np.errstate(invalid="ignore"):
+            forward = d_lt - d_lv
+            backward = d_lv - d_lt - self.cost_grid + self.cost_grid[goal]
+            bounds = np.maximum(forward, backward)
+        # Landmarks that cannot see both cells give no information
+        bounds = np.where(np.isfinite(bounds), bounds, 0)
+        return np.maximum(manhattan, bounds.max(axis=0))
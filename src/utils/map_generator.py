@@ -0,0 +1,82 @@
+import json
+import random
+
+DAY_MINUTES = 24 * 60
+MIN_ZONE_SIZE = 2
+
+
+def _place_zones(rng, grid_size, target_cells, max_zone_size, taken):
+    """Scatter square blocks until they cover about target_cells cells, avoiding `taken`."""
+    cells = set()
+    attempts = 0
+    while len(cells) < target_cells and attempts < target_cells * 4 + 100:
+        attempts += 1
+        size = rng.randint(MIN_ZONE_SIZE, max_zone_size)
+        x0 = rng.randrange(0, grid_size - size + 1)
+        y0 = rng.randrange(0, grid_size - size + 1)
+        block = {(x, y) for x in range(x0, x0 + size) for y in range(y0, y0 + size)}
+        if block & taken:
+            continue
+        cells |= block
+    return cells
+
+
+def generate_map(grid_size, num_tasks=8, num_patterns=12, zone_density=0.04, max_zone_size=None, seed=None):
+    """
+    Generate a random map in the format of the config files, for grids of any size.
+    Each pattern covers an equal share of the day with fresh square obstacle and no-fly
+    blocks; the drone's start cell (0, 0) is never covered.
+    Args:
+        grid_size (int): Cells per side.
+        num_tasks (int): Delivery tasks, each with its own pickup and dropoff cell.
+        num_patterns (int): Event patterns the day is split into.
+        zone_density (float): Share of the cells covered by zones in each pattern, split
+            evenly between obstacles and no-fly zones.
+        max_zone_size (int): Largest block side (defaults to grid_size // 16, at least 3).
+        seed (int): Seed of the layout.
+    Returns:
+        dict: {"grid_size": ..., "event_patterns": [...], "delivery_tasks": [...]}, with the
+            patterns and tasks ready for EventSimulator and LocationsManager.
+    """
+    rng = random.Random(seed)
+    max_zone_size = min(max_zone_size or max(grid_size // 16, 3), grid_size)
+    target_cells = int(grid_size * grid_size * zone_density / 2)
+    minutes = DAY_MINUTES // num_patterns
+    start = {(0, 0)}
+
+    event_patterns = []
+    for i in range(num_patterns):
+        obstacles = _place_zones(rng, grid_size, target_cells, max_zone_size, start)
+        no_fly_zones = _place_zones(rng, grid_size, target_cells, max_zone_size, start | obstacles)
+        end = DAY_MINUTES if i == num_patterns - 1 else (i + 1) * minutes
+        event_patterns.append({
+            "time_range": [i * minutes, end],
+            "obstacles": [list(cell) for cell in sorted(obstacles)],
+            "no_fly_zones": [list(cell) for cell in sorted(no_fly_zones)],
+        })
+
+    # Open pickup/dropoff cells override zones, so they may fall anywhere but the start
+    points = set()
+    while len(points) < min(2 * num_tasks, grid_size * grid_size - 1):
+        point = (rng.randrange(grid_size), rng.randrange(grid_size))
+        if point not in start:
+            points.add(point)
+    points = sorted(points)
+    rng.shuffle(points)
+    delivery_tasks = [
+        {"pick_up": list(points[2 * i]), "drop_off": list(points[2 * i + 1]), "id": i + 1}
+        for i in range(len(points) // 2)
+    ]
+    return {"grid_size": grid_size, "event_patterns": event_patterns, "delivery_tasks": delivery_tasks}
+
+
+def save_map(map_data, path):
+    """Write a generated map to a JSON file."""
+    with open(path, "w") as file:
+        json.dump(map_data, file)
+
+
+def load_map(path):
+    """Read a map written by save_map()."""
+    with open(path, "r") as file:
+        return json.load(file)
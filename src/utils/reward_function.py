@@ -1,3 +1,9 @@
+# Penalties of entering a cell, also used as step costs by the planners
+OBSTACLE_COST = 10
+NO_FLY_COST = 20
+MOVE_COST = 1
+
+
 class RewardFunction:
     def __init__(self):
         self.total_reward = 0
@@ -12,16 +18,16 @@ class RewardFunction:
         # Check the type from the action result
         action_type = action_result.get("type")
         if action_type == "obstacle":
-            reward -= 10
+            reward -= OBSTACLE_COST
         elif action_type == "no-fly-zone":
-            reward -= 20
+            reward -= NO_FLY_COST
         elif action_type == "pick-up":
             reward += 10 if action_result["success"] else -1
         elif action_type == "drop-off":
             reward += 50 if action_result["success"] else -1
         else:
             # Default penalty for moving to a neutral tile
-            reward -= 1
+            reward -= MOVE_COST
 
         self.total_reward += reward
         return reward
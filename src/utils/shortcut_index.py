@@ -0,0 +1,275 @@
+import heapq
+import os
+from collections import OrderedDict
+import numpy as np
+from .grid_search import NEIGHBOR_OFFSETS
+
+# Bump when the on-disk layout changes so stale cache files are rebuilt
+INDEX_FORMAT_VERSION = 1
+# Settled-node limit of each witness search; a miss only costs a redundant shortcut
+WITNESS_SETTLE_LIMIT = 60
+# Answered queries kept for repeated point-to-point lookups
+QUERY_CACHE_SIZE = 4096
+
+
+class ContractionHierarchy:
+    def __init__(self, cost_grid, core_cells=()):
+        """
+        Contraction hierarchy over a 4-connected grid with per-cell entry costs.
+        Edge weights exclude both endpoint cells, and a cell's own cost is added when a
+        search enters it, so the costs of uncontracted core cells can be supplied per query.
+        Args:
+            cost_grid (np.ndarray): (width x height) per-cell entry costs, indexed [x, y].
+            core_cells (iterable): (x, y) cells that are never contracted, e.g. pickup and
+                dropoff points whose cost depends on which deliveries remain.
+        """
+        self.shape = cost_grid.shape
+        self.costs = np.asarray(cost_grid, dtype=np.float64).ravel().tolist()
+        self.core = {self._index(cell) for cell in core_cells}
+        self.rank = [0] * len(self.costs)
+        self.up_edges = [dict() for _ in self.costs]  # node -> {higher node: weight}
+        self.down_edges = [dict() for _ in self.costs]  # node -> {higher node: weight} (reversed)
+        self.middle = {}  # (from node, to node) -> contracted node a shortcut skips
+        self.query_cache = OrderedDict()
+        self._contract()
+
+    def _index(self, cell):
+        """Flat node id of a cell."""
+        return cell[0] * self.shape[1] + cell[1]
+
+    def _cell(self, node):
+        """Cell of a flat node id."""
+        return divmod(node, self.shape[1])
+
+    def _contract(self):
+        """Contract every non-core node in edge-difference order."""
+        width, height = self.shape
+        out_edges = [dict() for _ in self.costs]
+        in_edges = [dict() for _ in self.costs]
+        for x in range(width):
+            for y in range(height):
+                for dx, dy in NEIGHBOR_OFFSETS:
+                    if 0 <= x + dx < width and 0 <= y + dy < height:
+                        node, other = self._index((x, y)), self._index((x + dx, y + dy))
+                        out_edges[node][other] = 0.0
+                        in_edges[other][node] = 0.0
+
+        contracted = [False] * len(self.costs)
+        queue = [(self._priority(node, out_edges, in_edges, contracted), node)
+                 for node in range(len(self.costs)) if node not in self.core]
+        heapq.heapify(queue)
+        order = 0
+        while queue:
+            _, node = heapq.heappop(queue)
+            # Lazy update: re-queue if the node got worse since it was pushed
+            priority = self._priority(node, out_edges, in_edges, contracted)
+            if queue and priority > queue[0][0]:
+                heapq.heappush(queue, (priority, node))
+                continue
+
+            for (source, target), weight in self._shortcuts(node, out_edges, in_edges, contracted):
+                if weight < out_edges[source].get(target, np.inf):
+                    out_edges[source][target] = weight
+                    in_edges[target][source] = weight
+                    self.middle[(source, target)] = node
+            self.rank[node] = order
+            order += 1
+            contracted[node] = True
+
+        # Core nodes share the top rank, so every edge among them counts as upward
+        for node in self.core:
+            self.rank[node] = order
+        for node in range(len(self.costs)):
+            for other, weight in out_edges[node].items():
+                if self.rank[other] > self.rank[node] or (node in self.core and other in self.core):
+                    self.up_edges[node][other] = weight
+                if self.rank[other] < self.rank[node] or (node in self.core and other in self.core):
+                    self.down_edges[other][node] = weight
+
+    def _priority(self, node, out_edges, in_edges, contracted):
+        """Edge difference plus contracted-neighbour count (lower contracts first)."""
+        shortcuts = len(self._shortcuts(node, out_edges, in_edges, contracted))
+        removed = sum(1 for other in out_edges[node] if not contracted[other])
+        removed += sum(1 for other in in_edges[node] if not contracted[other])
+        neighbors = sum(1 for other in out_edges[node] if contracted[other])
+        return shortcuts - removed + neighbors
+
+    def _shortcuts(self, node, out_edges, in_edges, contracted):
+        """Shortcuts needed to preserve distances if node were contracted."""
+        shortcuts = []
+        targets = {other: weight for other, weight in out_edges[node].items() if not contracted[other]}
+        for source, in_weight in in_edges[node].items():
+            if contracted[source]:
+                continue
+            candidates = {
+                target: in_weight + self.costs[node] + weight
+                for target, weight in targets.items() if target != source
+            }
+            if not candidates:
+                continue
+            witness = self._witness_search(source, node, candidates, out_edges, contracted)
+            for target, weight in candidates.items():
+                if witness.get(target, np.inf) > weight:
+                    shortcuts.append(((source, target), weight))
+        return shortcuts
+
+    def _witness_search(self, source, skip, candidates, out_edges, contracted):
+        """Interior path costs from source avoiding skip, contracted nodes and the core."""
+        limit = max(candidates.values())
+        best = {source: 0.0}
+        reached = {}
+        queue = [(0.0, source)]
+        settled = 0
+        while queue and settled < WITNESS_SETTLE_LIMIT:
+            dist, node = heapq.heappop(queue)
+            if dist > best[node] or dist > limit:
+                continue
+            settled += 1
+            # Core costs may change later, so a witness may end at a core node but never cross it
+            if node != source and node in self.core:
+                continue
+            for other, weight in out_edges[node].items():
+                if other == skip or contracted[other]:
+                    continue
+                interior = dist + weight
+                if other in candidates and interior < reached.get(other, np.inf):
+                    reached[other] = interior
+                arrival = interior + self.costs[other]
+                if arrival < best.get(other, np.inf):
+                    best[other] = arrival
+                    heapq.heappush(queue, (arrival, other))
+        return reached
+
+    def query(self, start, goal, cost_grid=None):
+        """
+        Shortest path by bidirectional upward search.
+        Args:
+            start (tuple): (x, y) start cell.
+            goal (tuple): (x, y) goal cell.
+            cost_grid (np.ndarray): Current costs, read only for core cells. Defaults to the
+                costs the index was built with.
+        Returns:
+            tuple: (path excluding start, cost), or (None, np.inf) if goal cannot be reached.
+        """
+        core_costs = ()
+        if cost_grid is not None and self.core:
+            core_costs = tuple((node, float(cost_grid[self._cell(node)])) for node in sorted(self.core))
+
+        key = (start, goal, core_costs)
+        if key in self.query_cache:
+            self.query_cache.move_to_end(key)
+            path, cost = self.query_cache[key]
+            return (None if path is None else list(path)), cost
+        costs = self.costs
+        if core_costs:
+            costs = list(costs)
+            for node, cost in core_costs:
+                costs[node] = cost
+        path, cost = self._search(self._index(start), self._index(goal), costs)
+        self.query_cache[key] = (path, cost)
+        if len(self.query_cache) > QUERY_CACHE_SIZE:
+            self.query_cache.popitem(last=False)
+        return (None if path is None else list(path)), cost
+
+    def _search(self, source, target, costs):
+        """Bidirectional Dijkstra over the upward and reversed-downward graphs."""
+        forward, backward = {source: 0.0}, {target: 0.0}
+        forward_parent, backward_parent = {}, {}
+        queues = [[(0.0, source)], [(0.0, target)]]
+        best, meeting = np.inf, None
+        while any(queue and queue[0][0] < best for queue in queues):
+            side = 0 if queues[0] and (not queues[1] or queues[0][0] <= queues[1][0]) else 1
+            dist, node = heapq.heappop(queues[side])
+            labels, other_labels = (forward, backward) if side == 0 else (backward, forward)
+            if dist > labels[node]:
+                continue
+            if node in other_labels and dist + other_labels[node] < best:
+                best, meeting = dist + other_labels[node], node
+            if side == 0:
+                for other, weight in self.up_edges[node].items():
+                    arrival = dist + weight + costs[other]
+                    if arrival < forward.get(other, np.inf):
+                        forward[other] = arrival
+                        forward_parent[other] = node
+                        heapq.heappush(queues[0], (arrival, other))
+            else:
+                for other, weight in self.down_edges[node].items():
+                    arrival = dist + weight + costs[node]
+                    if arrival < backward.get(other, np.inf):
+                        backward[other] = arrival
+                        backward_parent[other] = node
+                        heapq.heappush(queues[1], (arrival, other))
+        if meeting is None:
+            return None, np.inf
+
+        nodes = [meeting]
+        while nodes[0] != source:
+            nodes.insert(0, forward_parent[nodes[0]])
+        while nodes[-1] != target:
+            nodes.append(backward_parent[nodes[-1]])
+        path = []
+        for node, other in zip(nodes, nodes[1:]):
+            path += self._unpack(node, other)
+        return [self._cell(node) for node in path], best
+
+    def _unpack(self, node, other):
+        """Expand an edge, recursively replacing shortcuts by the nodes they skip."""
+        middle = self.middle.get((node, other))
+        if middle is None:
+            return [other]
+        return self._unpack(node, middle) + self._unpack(middle, other)
+
+    def save(self, path):
+        """Write the index to a .npz file."""
+        edges = [(node, other, weight) for node, edges in enumerate(self.up_edges) for other, weight in edges.items()]
+        edges += [(other, node, weight) for node, edges in enumerate(self.down_edges) for other, weight in edges.items()]
+        middle = np.array([(a, b, m) for (a, b), m in self.middle.items()], dtype=np.int64).reshape(-1, 3)
+        edge_array = np.array(edges, dtype=np.float64).reshape(-1, 3)
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            version=INDEX_FORMAT_VERSION,
+            costs=np.array(self.costs).reshape(self.shape),
+            core=np.array(sorted(self.core), dtype=np.int64),
+            rank=np.array(self.rank, dtype=np.int64),
+            edges=edge_array,
+            middle=middle,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, cost_grid=None, core_cells=None):
+        """
+        Read an index written by save().
+        Args:
+            path (str): The .npz file.
+            cost_grid (np.ndarray): If given, the index is rejected unless it was built for it.
+            core_cells (iterable): If given, the index is rejected unless it has the same core.
+        Returns:
+            ContractionHierarchy: The index, or None if the file is missing or stale.
+        """
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            if int(data["version"]) != INDEX_FORMAT_VERSION:
+                return None
+            if cost_grid is not None and not np.array_equal(data["costs"], cost_grid):
+                return None
+            index = cls.__new__(cls)
+            index.shape = data["costs"].shape
+            if core_cells is not None and set(data["core"].tolist()) != {index._index(c) for c in core_cells}:
+                return None
+            index.costs = data["costs"].ravel().tolist()
+            index.core = set(data["core"].tolist())
+            index.rank = data["rank"].tolist()
+            index.up_edges = [dict() for _ in index.costs]
+            index.down_edges = [dict() for _ in index.costs]
+            for node, other, weight in data["edges"].tolist():
+                node, other = int(node), int(other)
+                if index.rank[other] > index.rank[node] or (node in index.core and other in index.core):
+                    index.up_edges[node][other] = weight
+                if index.rank[other] < index.rank[node] or (node in index.core and other in index.core):
+                    index.down_edges[other][node] = weight
+            index.middle = {(int(a), int(b)): int(m) for a, b, m in data["middle"].tolist()}
+            index.query_cache = OrderedDict()
+        return index
@@ -0,0 +1,198 @@
+from collections import OrderedDict
+import numpy as np
+
+# (dx, dy) of every move; the action order is chosen by each agent
+ACTION_OFFSETS = {"UP": (0, -1), "DOWN": (0, 1), "LEFT": (-1, 0), "RIGHT": (1, 0)}
+
+
+class SparseTransitions:
+    def __init__(self, indptr, indices, data):
+        """
+        Transition matrix of one action in CSR form: row s holds the successor states of s
+        (indices) and their probabilities (data). A state the action cannot be taken in has
+        an empty row.
+        """
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    def dot(self, values):
+        """
+        Expected value of the successor state of every state.
+        Args:
+            values (np.ndarray): (..., states) values, leading axes are batched.
+        Returns:
+            np.ndarray: (..., states) expectations, 0 on empty rows.
+        """
+        values = np.asarray(values)
+        out_shape = values.shape[:-1] + (len(self.indptr) - 1,)
+        if not len(self.indices):
+            return np.zeros(out_shape)
+        contributions = self.data * values[..., self.indices]
+        # A zero sentinel keeps every start a valid index, so trailing empty rows need no
+        # clipping (clipping them would cut the last non-empty row short)
+        sentinel = np.zeros(contributions.shape[:-1] + (1,))
+        contributions = np.concatenate([contributions, sentinel], axis=-1)
+        sums = np.add.reduceat(contributions, self.indptr[:-1], axis=-1)
+        return np.where(self.indptr[1:] > self.indptr[:-1], sums, 0.0)
+
+    def row(self, state):
+        """(successor indices, probabilities) of one state."""
+        start, end = self.indptr[state], self.indptr[state + 1]
+        return self.indices[start:end], self.data[start:end]
+
+
+class TransitionModel:
+    def __init__(self, width, height, actions, blocked=None, slip=0.0, wind=None):
+        """
+        Per-action sparse transition matrices of the 4-connected grid, built once.
+        States are flattened as x * height + y, matching ravel() of an [x, y] array.
+        Args:
+            width (int): Grid width.
+            height (int): Grid height.
+            actions (list): Action names (keys of ACTION_OFFSETS), in the caller's order.
+            blocked (np.ndarray): Optional bool (width x height) mask of cells that cannot be
+                entered; an action into one is unavailable, a drift into one stays in place.
+            slip (float): Probability of sliding sideways instead, split between the two
+                perpendicular moves.
+            wind (tuple): Optional ((dx, dy), probability) drift replacing the intended move.
+        """
+        self.width = width
+        self.height = height
+        self.actions = list(actions)
+        self.num_states = width * height
+        blocked = np.zeros((width, height), dtype=bool) if blocked is None else np.asarray(blocked, dtype=bool)
+        xs, ys = np.indices((width, height))
+        states = (xs * height + ys).ravel()
+
+        def target(dx, dy):
+            """Flat successor of every state for a move, and whether the move is possible."""
+            nx, ny = xs + dx, ys + dy
+            inside = (0 <= nx) & (nx < width) & (0 <= ny) & (ny < height)
+            possible = inside & ~blocked[np.clip(nx, 0, width - 1), np.clip(ny, 0, height - 1)]
+            return np.where(possible, nx * height + ny, xs * height + ys).ravel(), possible.ravel()
+
+        wind_offset, wind_probability = wind if wind else ((0, 0), 0.0)
+        self.valid = np.zeros((len(self.actions), width, height), dtype=bool)
+        self.matrices = {}
+        self.intended = {}
+        for a, action in enumerate(self.actions):
+            dx, dy = ACTION_OFFSETS[action]
+            intended, possible = target(dx, dy)
+            self.valid[a] = possible.reshape(width, height)
+            self.intended[action] = intended
+            # (probability, successor) of every outcome; impossible drifts stay in place
+            outcomes = [(1.0 - slip - wind_probability, intended)]
+            if slip:
+                outcomes += [(slip / 2, target(dy, dx)[0]), (slip / 2, target(-dy, -dx)[0])]
+            if wind_probability:
+                outcomes.append((wind_probability, target(*wind_offset)[0]))
+
+            rows = np.concatenate([states[possible]] * len(outcomes))
+            cols = np.concatenate([successor[possible] for _, successor in outcomes])
+            probabilities = np.concatenate([np.full(possible.sum(), p) for p, _ in outcomes])
+            # Merge outcomes landing on the same successor, then lay the rows out as CSR
+            keys, inverse = np.unique(rows * self.num_states + cols, return_inverse=True)
+            data = np.bincount(inverse, weights=probabilities)
+            keep = data > 0
+            keys, data = keys[keep], data[keep]
+            indptr = np.searchsorted(keys // self.num_states, np.arange(self.num_states + 1))
+            self.matrices[action] = SparseTransitions(indptr, keys % self.num_states, data)
+        self._neighbors = {}
+        self._adjacency = None
+
+    def expected(self, values):
+        """
+        Expected successor value of every (action, state).
+        Args:
+            values (np.ndarray): (..., width, height) values.
+        Returns:
+            np.ndarray: (actions, ..., width, height), -inf where the action is unavailable.
+        """
+        flat = np.asarray(values).reshape(values.shape[:-2] + (self.num_states,))
+        result = np.stack([self.matrices[action].dot(flat) for action in self.actions]).reshape(
+            (len(self.actions),) + values.shape
+        )
+        valid = self.valid.reshape(self.valid.shape[:1] + (1,) * (values.ndim - 2) + self.valid.shape[1:])
+        return np.where(valid, result, float('-inf'))
+
+    def neighbors(self, state):
+        """{action: intended (x, y)} of the actions available in state, in action order."""
+        if state not in self._neighbors:
+            x, y = state
+            self._neighbors[state] = {
+                action: divmod(int(self.intended[action][x * self.height + y]), self.height)
+                for a, action in enumerate(self.actions)
+                if self.valid[a, x, y]
+            }
+        return self._neighbors[state]
+
+
+    def adjacency(self):
+        """
+        Successor and predecessor lists of every state as plain Python lists, built once per
+        model for per-state backups (prioritized sweeping).
+        Returns:
+            tuple: (successors, predecessors); successors[s] holds one [(successor, probability),
+            ...] list per action available in s, predecessors[s] the states with s as a successor.
+        """
+        if self._adjacency is None:
+            successors = [[] for _ in range(self.num_states)]
+            predecessors = [set() for _ in range(self.num_states)]
+            for action in self.actions:
+                matrix = self.matrices[action]
+                indptr, indices, data = matrix.indptr.tolist(), matrix.indices.tolist(), matrix.data.tolist()
+                for state in range(self.num_states):
+                    start, end = indptr[state], indptr[state + 1]
+                    if start < end:
+                        successors[state].append(list(zip(indices[start:end], data[start:end])))
+                        for successor in indices[start:end]:
+                            predecessors[successor].add(state)
+            self._adjacency = (successors, [sorted(states) for states in predecessors])
+        return self._adjacency
+
+
+class TransitionModelCache:
+    def __init__(self, environment, actions, block_zones=False, slip=0.0, wind=None, max_models=16):
+        """
+        Transition models of an environment, looked up again only when its zone epoch changes.
+        Args:
+            environment (Environment): Source of the grid size, zone masks and zone epoch.
+            actions (list): Action order of the models.
+            block_zones (bool): Treat the active obstacles and no-fly zones as impassable.
+            slip (float): See TransitionModel.
+            wind (tuple): See TransitionModel.
+            max_models (int): Number of models kept before the least recently used is evicted.
+        """
+        self.environment = environment
+        self.actions = list(actions)
+        self.block_zones = block_zones
+        self.slip = slip
+        self.wind = wind
+        self.max_models = max_models
+        self.models = OrderedDict()  # (grid size, blocked layout or None) -> TransitionModel
+        self._current = None
+        self._current_epoch = None
+
+    def get(self):
+        """Return the model for the environment's current zones."""
+        epoch = self.environment.zone_epoch
+        size = self.environment.grid_size
+        if self._current is not None and self._current_epoch == epoch and self._current.width == size:
+            return self._current
+
+        blocked = None
+        key = (size, None)
+        if self.block_zones:
+            obstacle_mask, no_fly_mask = self.environment.get_zone_masks()
+            blocked = obstacle_mask | no_fly_mask
+            # Keyed by layout rather than epoch, so a layout that comes back reuses its model
+            key = (size, blocked.tobytes())
+        if key in self.models:
+            self.models.move_to_end(key)
+        else:
+            self.models[key] = TransitionModel(size, size, self.actions, blocked, self.slip, self.wind)
+            if len(self.models) > self.max_models:
+                self.models.popitem(last=False)
+        self._current, self._current_epoch = self.models[key], epoch
+        return self._current
@@ -0,0 +1,87 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pickle
+import random
+import time
+import numpy as np
+from src.agent.checkpoint import CheckpointWriter
+from src.agent.q_table import PositionEncoder, QTable, StateEncoder
+from src.agent.q_train_agent import QLearningTrainer
+
+ACTIONS = ["UP", "DOWN", "LEFT", "RIGHT"]
+
+
+def train(episodes, **kwargs):
+    trainer = QLearningTrainer()
+    trainer.training_episodes = episodes
+    trainer.train(**kwargs)
+    return trainer
+
+
+def test_resume_reproduces_the_uninterrupted_run(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    checkpoint_path = str(tmp_path / "run.ckpt")
+    random.seed(0)
+    uninterrupted = train(8)
+
+    random.seed(0)
+    train(4, checkpoint_every=4, checkpoint_path=checkpoint_path)
+    random.seed(1)  # Replaced by the checkpointed RNG state
+    resumed = train(8, checkpoint_path=checkpoint_path, resume=True)
+
+    assert np.array_equal(resumed.q_table.values, uninterrupted.q_table.values)
+    assert resumed.epsilon == uninterrupted.epsilon
+
+
+def test_restore_reads_the_buffer_the_state_names(tmp_path):
+    path = str(tmp_path / "table.ckpt")
+    encoder = StateEncoder(4, ("carrying",))
+    table = QTable(encoder, ACTIONS)
+    writer = CheckpointWriter(path, table)
+    for checkpoint in range(3):
+        table.update((checkpoint, 1, 0), "UP", 10.0 + checkpoint, 1.0)
+        while not writer.checkpoint({"checkpoint": checkpoint}):
+            time.sleep(0.01)
+    writer.close()
+    # Buffers 0 and 1 were written in full, then buffer 0 was patched with the rows changed since
+    assert CheckpointWriter.read_state(path)["buffer"] == 0
+
+    # A crash while writing the other buffer must not affect the restore
+    with open(writer.table_path(1), "wb") as f:
+        f.write(b"torn")
+    restored = QTable(encoder, ACTIONS)
+    writer = CheckpointWriter(path, restored)
+    assert writer.restore() == {"checkpoint": 2}
+    writer.close()
+    assert np.array_equal(restored.values, table.values)
+
+
+def test_q_table_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "q.qtable")
+    encoder = StateEncoder(5, ("carrying", "delivery"), task_ids=[3, 7])
+    table = QTable(encoder, ACTIONS, np.random.default_rng(0).random((encoder.num_states, 4), dtype=np.float32))
+    table.save(path)
+
+    for mmap in (False, True):
+        loaded = QTable.load(path, mmap=mmap)
+        assert loaded.actions == ACTIONS
+        assert loaded.encoder.config() == encoder.config()
+        assert np.array_equal(loaded.values, table.values)
+
+
+def test_load_converts_a_legacy_pickled_table(tmp_path):
+    path = str(tmp_path / "q_table.pkl")
+    with open(path, "wb") as f:
+        pickle.dump({(0, 0): {"UP": 1.5, "RIGHT": -2.0}, (3, 2): {"DOWN": 4.0}}, f)
+
+    table = QTable.load(path)
+
+    assert isinstance(table.encoder, PositionEncoder)
+    assert table.encoder.grid_size == 4
+    assert table.value((0, 0), "UP") == 1.5
+    assert table.value((0, 0), "RIGHT") == -2.0
+    assert table.value((3, 2), "DOWN") == 4.0
+    assert np.count_nonzero(table.values) == 3
+    assert QTable.load(path, grid_size=20).encoder.grid_size == 20
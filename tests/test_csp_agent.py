@@ -0,0 +1,49 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from src.agent.csp_agent import CSPAgent
+from src.simulation.safe_intervals import SafeIntervalTable
+
+
+def make_agent(**kwargs):
+    agent = CSPAgent(render=False, **kwargs)
+    agent.environment.reset()
+    agent.locations_manager.reset()
+    agent.environment.update_dynamic_events()
+    return agent
+
+
+def test_anytime_budget_exhaustion_is_not_reported_as_no_path():
+    agent = make_agent(expansion_budget=3)
+    results = [agent.find_path((0, 0), (15, 15)) for _ in range(3)]
+    assert results[0] is None  # Out of budget, not proven unreachable
+    search = agent.anytime_search
+    while (path := agent.find_path((0, 0), (15, 15))) is None:
+        assert agent.anytime_search is search  # Resumed, not restarted
+    assert path[-1] == (15, 15)
+    assert agent.environment.current_time == 0
+
+
+def test_run_completes_with_a_tight_budget():
+    agent = make_agent(expansion_budget=3)
+    agent.run()
+    assert not agent.locations_manager.get_pick_up_points()
+
+
+def test_sipp_reuses_its_safe_interval_table_until_the_open_points_change():
+    agent = make_agent(search_mode="sipp")
+    path = agent.find_path((0, 0), (15, 15))
+    table = agent.safe_intervals
+
+    agent.environment.current_time = 600
+    later = agent.find_path((0, 0), (15, 15))
+    assert agent.safe_intervals is table
+    agent.safe_intervals = SafeIntervalTable(agent.environment)
+    assert agent.find_path((0, 0), (15, 15)) == later  # Same as a fresh table
+    assert path[-1] == later[-1] == (15, 15)
+
+    table = agent.safe_intervals
+    agent.locations_manager.pick_up(next(iter(agent.locations_manager.get_pick_up_points())))
+    agent.find_path((0, 0), (15, 15))
+    assert agent.safe_intervals is not table
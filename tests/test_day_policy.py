@@ -0,0 +1,40 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pytest
+from src.agent.day_policy import DayPolicy
+from src.agent.mdp_agent import MDP_AGENT
+
+
+def make_agent(policy_path):
+    agent = MDP_AGENT(render=False, day_policy=True, policy_path=str(policy_path))
+    agent.environment.reset()
+    agent.locations_manager.reset()
+    agent.environment.update_dynamic_events()
+    return agent
+
+
+def test_saved_policy_is_reused_only_for_the_same_setup(tmp_path):
+    policy_path = tmp_path / "policy.npy"
+    solved = make_agent(policy_path).get_day_policy()
+
+    reloaded = make_agent(policy_path).get_day_policy()
+    assert reloaded.header == solved.header
+    assert np.array_equal(reloaded.actions, solved.actions)
+
+    # Different zone patterns make the saved policy stale, so it is solved again
+    agent = make_agent(policy_path)
+    agent.event_simulator.event_patterns[0]["obstacles"].append([0, 1])
+    header = DayPolicy.header(agent.environment, solved.targets)
+    assert DayPolicy.load(str(policy_path), header=header) is None
+    resolved = agent.get_day_policy()
+    assert resolved.header["patterns"] != solved.header["patterns"]
+    assert DayPolicy.load(str(policy_path)).header == resolved.header
+
+
+def test_unknown_target_raises(tmp_path):
+    policy = make_agent(tmp_path / "policy.npy").get_day_policy()
+    with pytest.raises(KeyError):
+        policy.action((-1, -1), (0, 0), 0)
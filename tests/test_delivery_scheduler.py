@@ -0,0 +1,100 @@
+import numpy as np
+from src.agent.delivery_scheduler import DeliveryScheduler
+from src.simulation.environment import Environment
+from src.simulation.event_simulator import EventSimulator
+from src.simulation.locations_manager import LocationsManager
+from src.utils.grid_search import bfs_grid_pairs, dijkstra_grid
+from src.utils.map_generator import generate_map
+
+TIME_STEP = 10
+
+
+def make_environment(grid_size, num_tasks, seed=0):
+    map_data = generate_map(grid_size, num_tasks, seed=seed)
+    environment = Environment(grid_size=grid_size, cell_size=1)
+    environment.set_event_simulator(EventSimulator(grid_size, event_patterns=map_data["event_patterns"]))
+    environment.set_locations_manager(LocationsManager(delivery_tasks=map_data["delivery_tasks"]))
+    environment.reset()
+    environment.update_dynamic_events()
+    return environment, map_data["delivery_tasks"]
+
+
+def manhattan(a, b):
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+def test_schedule_keeps_drones_deadlines_and_precedence():
+    environment, tasks = make_environment(20, 12)
+    ids = [task["id"] for task in tasks]
+    deadlines = {ids[0]: 600, ids[5]: 900}
+    precedence = [(ids[1], ids[2]), (ids[2], ids[3]), (ids[6], ids[0])]
+    scheduler = DeliveryScheduler(environment, tasks, num_drones=3, time_step=TIME_STEP,
+                                  deadlines=deadlines, precedence=precedence)
+
+    schedule, status = scheduler.solve(time_limit=10.0)
+
+    assert status == "solved"
+    assert sorted(entry["id"] for entry in schedule) == sorted(ids)
+    by_id = {task["id"]: task for task in tasks}
+    entries = {entry["id"]: entry for entry in schedule}
+    for entry in schedule:
+        task = by_id[entry["id"]]
+        assert 0 <= entry["drone"] < 3
+        assert entry["end"] - entry["start"] >= manhattan(task["pick_up"], task["drop_off"]) * TIME_STEP
+    for drone in range(3):
+        flights = [entry for entry in schedule if entry["drone"] == drone]
+        for first, second in zip(flights, flights[1:]):
+            hop = manhattan(by_id[first["id"]]["drop_off"], by_id[second["id"]]["pick_up"]) * TIME_STEP
+            assert first["end"] + hop <= second["start"]
+    for task_id, deadline in deadlines.items():
+        assert entries[task_id]["end"] <= deadline
+    for first, second in precedence:
+        assert entries[first]["end"] <= entries[second]["start"]
+
+
+def test_status_tells_infeasible_from_timeout():
+    environment, tasks = make_environment(40, 30)
+    # One drone cannot fly 30 deliveries across a 40x40 grid in a day
+    scheduler = DeliveryScheduler(environment, tasks, num_drones=1, time_step=TIME_STEP)
+    assert scheduler.solve() == (None, "infeasible")
+    assert scheduler.nodes == 0
+
+    environment, tasks = make_environment(20, 12)
+    scheduler = DeliveryScheduler(environment, tasks, num_drones=3, time_step=TIME_STEP)
+    assert scheduler.solve(time_limit=0.0) == (None, "timeout")
+    assert scheduler.solve(time_limit=10.0)[1] == "solved"
+
+
+def test_search_tries_values_beyond_the_lcv_candidates():
+    environment, tasks = make_environment(20, 3)
+    scheduler = DeliveryScheduler(environment, tasks[:3], num_drones=1, time_step=TIME_STEP)
+    # X fits early or late; Y and Z (55 ticks each) fill the drone until tick 110, so X's
+    # only feasible start (115) lies past its first LCV_CANDIDATES values
+    durations = np.full((3, scheduler.num_ticks), -1, dtype=np.int64)
+    durations[0, 0:10] = 1
+    durations[0, 115:125] = 1
+    durations[1:, 0:56] = 55
+    scheduler.durations = durations
+    scheduler.travel = np.zeros((3, 3), dtype=np.int64)
+
+    schedule, status = scheduler.solve(time_limit=10.0)
+
+    assert status == "solved"
+    ids = [task["id"] for task in tasks[:3]]
+    entries = {entry["id"]: entry for entry in schedule}
+    assert entries[ids[0]]["start"] == 115 * TIME_STEP
+    assert sorted((entries[i]["start"], entries[i]["end"]) for i in ids[1:]) == [
+        (0, 55 * TIME_STEP), (55 * TIME_STEP, 110 * TIME_STEP)]
+
+
+def test_bfs_grid_pairs_matches_dijkstra():
+    rng = np.random.default_rng(0)
+    blocked = rng.random((15, 12)) < 0.3
+    sources = np.stack([rng.integers(0, 15, 100), rng.integers(0, 12, 100)], axis=1)
+    targets = np.stack([rng.integers(0, 15, 100), rng.integers(0, 12, 100)], axis=1)
+    expected = []
+    for source, target in zip(map(tuple, sources), map(tuple, targets)):
+        cost_grid = np.where(blocked, np.inf, 1.0)
+        cost_grid[source] = 1.0  # A blocked source can still be left
+        expected.append(dijkstra_grid(cost_grid, source)[target])
+    np.testing.assert_array_equal(bfs_grid_pairs(blocked, sources, targets), expected)
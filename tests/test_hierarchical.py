@@ -0,0 +1,34 @@
+import numpy as np
+from src.utils.grid_search import dijkstra_grid
+from src.utils.hierarchical import HierarchicalPlanner
+
+
+def walled_grid():
+    """30x30 grid whose (0, 0) cluster is walled off except for the entrance (9, 5)."""
+    cost_grid = np.ones((30, 30))
+    cost_grid[9, :10] = np.inf
+    cost_grid[:10, 9] = np.inf
+    cost_grid[9, 5] = 1.0
+    return cost_grid
+
+
+def test_abstract_path_from_a_start_on_an_entrance():
+    cost_grid = walled_grid()
+    planner = HierarchicalPlanner(cost_grid, cluster_size=10)
+    start, goal = (9, 5), (25, 25)
+    assert start in planner.nodes[planner.cluster_of(start)]
+
+    path, cost = planner.abstract_path(start, goal)
+    assert path is not None and path[0] == start and path[-1] == goal
+    assert cost == dijkstra_grid(cost_grid, start)[goal]
+
+
+def test_find_path_out_of_a_walled_cluster_matches_dijkstra():
+    cost_grid = walled_grid()
+    planner = HierarchicalPlanner(cost_grid, cluster_size=10)
+    start, goal = (2, 2), (25, 25)
+
+    path = planner.find_path(start, goal)
+    assert path[-1] == goal
+    assert (9, 5) in path
+    assert sum(cost_grid[cell] for cell in path) == dijkstra_grid(cost_grid, start)[goal]
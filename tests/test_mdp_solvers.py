@@ -0,0 +1,36 @@
+import numpy as np
+from src.agent.mdp_solvers import bellman, solve
+from src.utils.transition_model import TransitionModel
+
+MOVES = ["RIGHT", "UP", "LEFT", "DOWN"]
+EPS = 0.1
+
+
+def grid_problem(size=20, slip=0.2):
+    model = TransitionModel(size, size, MOVES, slip=slip)
+    xs, ys = np.indices((size, size))
+    rewards = np.maximum(1, 25 - 0.5 * (np.abs(size // 2 - xs) + np.abs(size // 2 - ys)))
+    rewards[np.random.default_rng(0).random((size, size)) < 0.1] = -10
+    return model, 1 / model.valid.sum(axis=0), rewards
+
+
+def test_prioritized_sweeping_reports_the_bellman_error_left():
+    model, prob, rewards = grid_problem()
+    cold = np.full(rewards.shape, -np.inf)
+    expected, _ = solve("value_iteration", rewards, model, prob, cold, EPS)
+
+    util, stats = solve("prioritized_sweeping", rewards, model, prob, cold, EPS)
+
+    np.testing.assert_allclose(util, expected, atol=EPS)
+    assert stats.residuals[-1] == np.abs(bellman(util, rewards, model, prob) - util).max()
+    assert stats.residuals[-1] <= EPS
+
+
+def test_sweeping_graph_is_built_once_per_model():
+    model, prob, rewards = grid_problem(size=6, slip=0.0)
+    successors, predecessors = model.adjacency()
+    assert model.adjacency()[0] is successors
+    # An interior cell has one deterministic successor per move, and is read by its 4 neighbours
+    state = 2 * 6 + 3
+    assert sorted(outcomes[0][0] for outcomes in successors[state]) == [state - 6, state - 1, state + 1, state + 6]
+    assert predecessors[state] == [state - 6, state - 1, state + 1, state + 6]
@@ -0,0 +1,14 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pytest
+from src.agent.q_linear_agent import LinearQTrainer
+from src.utils.map_generator import generate_map
+
+
+@pytest.mark.parametrize("method", ["train_batched", "train_dyna", "train_parallel"])
+def test_dense_table_trainers_are_refused(method):
+    trainer = LinearQTrainer(generate_map(16, num_tasks=2, seed=0))
+    with pytest.raises(TypeError):
+        getattr(trainer, method)()
@@ -0,0 +1,14 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pytest
+from src.agent.q_pbt import PopulationTrainer
+
+
+@pytest.mark.parametrize("generations", [0, -1])
+def test_train_rejects_runs_without_generations(generations):
+    trainer = PopulationTrainer(population_size=1, seed=0)
+    with pytest.raises(ValueError):
+        trainer.train(generations=generations)
+    assert all(member["score"] is None for member in trainer.members)
@@ -0,0 +1,126 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pytest
+from multiprocessing import shared_memory
+from src.agent import q_train_agent
+from src.agent.q_table import QTable, StateEncoder
+from src.agent.q_train_agent import (ALPHA, EPSILON_DECAY, GAMMA, INITIAL_EPSILON, STATE_FEATURES,
+                                     QLearningTrainer)
+from src.agent.replay_buffer import ReplayBuffer, TabularModel
+from src.simulation.vector_environment import VectorEnvironment
+from src.utils.map_generator import generate_map
+
+
+def test_parallel_training_decays_one_shared_epsilon_per_episode():
+    episodes = 12
+    trainer = QLearningTrainer()
+    trainer.training_episodes = episodes
+
+    rewards = trainer.train_parallel(num_workers=2, eval_every=0, checkpoint_every=0, seed=0, save=False)
+
+    assert len(rewards) == episodes
+    # Every episode decays epsilon once by EPSILON_DECAY, or by 0.99 after a positive reward
+    expected = INITIAL_EPSILON
+    for _ in range(sum(reward > 0 for reward in rewards)):
+        expected *= 0.99
+    expected *= EPSILON_DECAY ** sum(reward <= 0 for reward in rewards)
+    assert abs(trainer.epsilon - expected) < 1e-9
+
+
+def test_parallel_workers_train_on_the_parents_map():
+    map_data = generate_map(30, num_tasks=1, zone_density=0.0, seed=0)
+    map_data["delivery_tasks"] = [{"pick_up": [29, 29], "drop_off": [29, 0], "id": 1}]
+    trainer = QLearningTrainer(STATE_FEATURES, map_data["grid_size"], map_data["event_patterns"],
+                               map_data["delivery_tasks"])
+    trainer.training_episodes = 4
+
+    trainer.train_parallel(num_workers=2, eval_every=0, checkpoint_every=0, seed=0, save=False)
+
+    # Every episode steps onto the pickup in the far corner, which a 20x20 worker never reaches
+    before_pick_up = [trainer.encoder.encode(cell + (0, 0, 1)) for cell in ((28, 29), (29, 28))]
+    assert np.abs(trainer.q_table.values[before_pick_up]).sum() > 0
+
+
+def test_q_table_rejects_values_of_another_shape():
+    encoder = StateEncoder(30, STATE_FEATURES, task_ids=[1, 2, 3])
+    with pytest.raises(ValueError):
+        QTable(encoder, ["UP", "DOWN", "LEFT", "RIGHT"], np.zeros((20 * 20, 4), dtype=np.float32))
+
+
+def test_vector_environment_rewards_match_run_episode():
+    map_data = generate_map(12, num_tasks=2, seed=1)
+    trainer = QLearningTrainer(STATE_FEATURES, map_data["grid_size"], map_data["event_patterns"],
+                               map_data["delivery_tasks"])
+    vector = VectorEnvironment(trainer.environment, 1, trainer.actions, trainer.encoder.task_ids)
+    lane = np.array([0])
+    vector.reset(lane)
+    rng = np.random.default_rng(0)
+    actions, rewards = [], []
+    while len(actions) < 400 and not vector.finished(lane)[0]:
+        action = rng.choice(np.flatnonzero(vector.valid_actions(lane)[0]))
+        actions.append(trainer.actions[action])
+        rewards.append(int(vector.step(lane, np.array([action]))[0]))
+        vector.advance_time(lane)
+    assert any(reward >= 50 for reward in rewards)  # Some package was picked up and carried
+
+    replayed = iter(actions)
+    trainer.choose_action = lambda state: next(replayed)
+    scalar_rewards = []
+    trainer.update_q_value = lambda state, action, reward, next_state: scalar_rewards.append(reward)
+    trainer.run_episode(max_steps=len(actions))
+    assert scalar_rewards[:len(actions)] == rewards
+
+
+@pytest.mark.parametrize("done, next_valid, best_next", [
+    (False, 0b0110, 7.0),  # only actions 1 and 2 can be taken in s'
+    (False, 0b0001, 9.0),
+    (True, 0b1111, 0.0),  # nothing is bootstrapped from a terminal s'
+    (False, 0b0000, 0.0),  # nor from a dead end
+])
+def test_dyna_updates_bootstrap_from_the_valid_actions_of_live_states(done, next_valid, best_next):
+    trainer = QLearningTrainer()
+    values = trainer.q_table.values
+    values[5] = [9.0, 2.0, 7.0, 11.0]
+    values[3, 2] = 1.0
+    trainer.replay = ReplayBuffer(1)
+    trainer.model = TabularModel(trainer.encoder.num_states, len(trainer.actions))
+    trainer.replay_updates, trainer.planning_updates = 4, 4
+    trainer.rng = np.random.default_rng(0)
+    trainer.pending = [(3, 2, 10.0, 5, done, next_valid)] * 2
+
+    trainer._dyna_updates()
+
+    assert trainer.pending == []
+    assert len(trainer.replay) == 1 and trainer.model.num_seen == 1
+    # The 16 replayed and simulated draws of the one transition share a single ALPHA step
+    expected = 1.0 + ALPHA * (10.0 + GAMMA * best_next - 1.0)
+    assert values[3, 2] == pytest.approx(expected, rel=1e-5)
+    assert values[5].tolist() == [9.0, 2.0, 7.0, 11.0]
+
+
+def test_parallel_training_frees_the_shared_table_when_setup_fails(monkeypatch):
+    created = []
+
+    class RecordingSharedMemory(shared_memory.SharedMemory):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            created.append(self.name)
+
+    def failing_process(*args, **kwargs):
+        raise OSError("no processes left")
+
+    monkeypatch.setattr(q_train_agent.shared_memory, "SharedMemory", RecordingSharedMemory)
+    monkeypatch.setattr(q_train_agent.multiprocessing, "Process", failing_process)
+    trainer = QLearningTrainer()
+    local_table = trainer.q_table
+
+    with pytest.raises(OSError):
+        trainer.train_parallel(num_workers=2, eval_every=0, checkpoint_every=0, seed=0, save=False)
+
+    assert trainer.q_table is local_table
+    assert len(created) == 1
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=created[0])
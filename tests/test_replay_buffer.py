@@ -0,0 +1,64 @@
+import numpy as np
+from src.agent.replay_buffer import ReplayBuffer, TabularModel
+
+
+def transitions(states, actions, rewards, next_states, dones, next_valid):
+    return (np.array(states, dtype=np.int64), np.array(actions, dtype=np.int64),
+            np.array(rewards, dtype=np.float32), np.array(next_states, dtype=np.int64),
+            np.array(dones, dtype=bool), np.array(next_valid, dtype=np.uint8))
+
+
+def test_replay_buffer_overwrites_the_oldest_transitions_once_full():
+    buffer = ReplayBuffer(3)
+    for batch in ([0, 1], [2, 3, 4]):
+        buffer.add(*transitions(batch, [i % 4 for i in batch], batch, [i + 10 for i in batch],
+                                [i == 4 for i in batch], [1 << (i % 4) for i in batch]))
+
+    assert len(buffer) == 3
+    assert buffer.position == 2
+    # Transitions 3 and 4 replaced 0 and 1 in slots 0 and 1; 2 is the oldest left
+    assert buffer.states.tolist() == [3, 4, 2]
+    assert buffer.next_states.tolist() == [13, 14, 12]
+    assert buffer.dones.tolist() == [False, True, False]
+
+    states, actions, rewards, next_states, dones, next_valid = buffer.sample(np.random.default_rng(0), 200)
+    assert set(states.tolist()) == {2, 3, 4}
+    assert (next_states == states + 10).all()
+    assert (rewards == states).all()
+    assert (actions == states % 4).all()
+    assert (dones == (states == 4)).all()
+    assert (next_valid == 1 << (states % 4)).all()
+
+    # A batch larger than the ring keeps only its newest transitions, in order
+    buffer.add(*transitions(range(20, 25), [0] * 5, [0] * 5, range(5), [False] * 5, [0] * 5))
+    assert len(buffer) == 3
+    assert buffer.position == 1
+    assert buffer.states.tolist() == [24, 22, 23]
+
+
+def test_tabular_model_grows_seen_and_keeps_the_last_outcome():
+    model = TabularModel(num_states=2000, num_actions=4)
+    capacity = len(model.seen)
+    states = list(range(capacity + 1))
+    # Pair (9, 1) is tried twice in its first batch but only counted once
+    model.update(*transitions(states[:10] + [9], [1] * 11, [1.0] * 11, [s + 1 for s in states[:10]] + [10],
+                              [False] * 11, [0b0011] * 11))
+    # Pairs tried before only have their outcome replaced; the last one in a batch wins
+    model.update(*transitions(states[5:] + [0, 0], [1] * (len(states) - 5) + [1, 1],
+                              [1.0] * (len(states) - 5) + [3.0, 5.0], [s + 1 for s in states[5:]] + [6, 7],
+                              [False] * (len(states) - 5) + [False, True],
+                              [0b0011] * (len(states) - 5) + [0b0010, 0b0100]))
+
+    assert model.num_seen == capacity + 1
+    assert len(model.seen) >= capacity + 1
+    assert sorted(model.seen[:model.num_seen].tolist()) == [state * 4 + 1 for state in states]
+
+    states, actions, rewards, next_states, dones, next_valid = model.sample(np.random.default_rng(0), 5000)
+    assert (actions == 1).all()
+    assert states.max() <= capacity
+    assert capacity in states  # the pair added after growing is drawn too
+    first = states == 0
+    assert first.any()
+    assert (rewards[first] == 5.0).all() and (next_states[first] == 7).all()
+    assert dones[first].all() and (next_valid[first] == 0b0100).all()
+    assert (next_states[~first] == states[~first] + 1).all() and not dones[~first].any()
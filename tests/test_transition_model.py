@@ -0,0 +1,30 @@
+import numpy as np
+from src.utils.transition_model import SparseTransitions, TransitionModel
+
+
+def dense(transitions, num_states):
+    matrix = np.zeros((num_states, num_states))
+    for state in range(num_states):
+        indices, data = transitions.row(state)
+        matrix[state, indices] += data
+    return matrix
+
+
+def test_dot_matches_dense_product_for_stochastic_model():
+    model = TransitionModel(4, 4, ["RIGHT", "UP", "LEFT", "DOWN"], slip=0.2)
+    values = np.random.default_rng(0).normal(size=(3, model.num_states))
+    for transitions in model.matrices.values():
+        expected = values @ dense(transitions, model.num_states).T
+        np.testing.assert_allclose(transitions.dot(values), expected, atol=1e-12)
+
+
+def test_dot_with_empty_rows_after_non_empty_ones():
+    # Rows 0 and 2 have entries, rows 1, 3 and 4 are empty (the last two trailing)
+    transitions = SparseTransitions(
+        np.array([0, 2, 2, 5, 5, 5]),
+        np.array([1, 2, 0, 3, 4]),
+        np.array([0.25, 0.75, 0.5, 0.3, 0.2]),
+    )
+    values = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+    np.testing.assert_allclose(transitions.dot(values), dense(transitions, 5) @ values)
+    np.testing.assert_allclose(transitions.dot(values), [2.75, 0.0, 2.7, 0.0, 0.0])